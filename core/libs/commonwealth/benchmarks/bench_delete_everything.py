@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""Benchmark for cleaning up a log folder with delete_everything.
+
+Compares the /proc based open files snapshot with one lsof process per file. Since lsof is slow, it runs over a sample
+of the files and the time for the full folder is extrapolated.
+
+Usage: python bench_delete_everything.py [--files 10000] [--lsof-sample 100]
+"""
+import argparse
+import pathlib
+import shutil
+import subprocess
+import tempfile
+import time
+
+from commonwealth.utils.general import delete_everything, file_is_open
+
+
+def create_files(folder: pathlib.Path, amount: int) -> None:
+    for index in range(amount):
+        # Spread files over sub folders, like log folders of different services
+        sub_folder = folder.joinpath(f"service-{index % 10}")
+        sub_folder.mkdir(exist_ok=True)
+        sub_folder.joinpath(f"log-{index}.log").write_text("log line\n")
+
+
+def lsof_is_open(path: pathlib.Path) -> bool:
+    # Previous implementation of file_is_open
+    result = subprocess.run(
+        ["lsof", "-t", "-n", "-P", "-S", "2", path.resolve()],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        check=False,
+        timeout=5,
+    )
+    return result.returncode == 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=10000, help="Number of files to be cleaned")
+    parser.add_argument("--lsof-sample", type=int, default=100, help="Number of files checked with lsof")
+    args = parser.parse_args()
+
+    folder = pathlib.Path(tempfile.mkdtemp(prefix="bench-delete-everything-"))
+    try:
+        create_files(folder, args.files)
+        # Keep one file open, it should not be deleted
+        with open(folder.joinpath("service-0", "log-0.log"), encoding="utf-8"):
+            start = time.perf_counter()
+            delete_everything(folder)
+            elapsed = time.perf_counter() - start
+            remaining = [path for path in folder.rglob("*") if path.is_file()]
+        print(f"delete_everything: {args.files} files in {elapsed:.3f}s, {len(remaining)} open file(s) kept")
+
+        sample = min(args.lsof_sample, args.files)
+        if shutil.which("lsof") is None or sample <= 0:
+            print("lsof is not available, skipping per file lsof comparison")
+            return
+        create_files(folder, sample)
+        files = [path for path in folder.rglob("*") if path.is_file()]
+        start = time.perf_counter()
+        for path in files:
+            lsof_is_open(path)
+        elapsed = time.perf_counter() - start
+        start = time.perf_counter()
+        for path in files:
+            file_is_open(path)
+        single_elapsed = time.perf_counter() - start
+        print(
+            f"lsof per file: {len(files)} files in {elapsed:.3f}s,"
+            f" estimated {elapsed / len(files) * args.files:.1f}s for {args.files} files"
+        )
+        print(f"file_is_open without snapshot: {len(files)} files in {single_elapsed:.3f}s")
+    finally:
+        shutil.rmtree(folder)
+
+
+if __name__ == "__main__":
+    main()
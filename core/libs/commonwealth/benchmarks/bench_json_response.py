@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""Micro-benchmark of the JSON response classes from commonwealth.utils.apis.
+
+Renders payloads shaped like our largest responses with PrettyJSONResponse and CompactJSONResponse, printing the
+response size and the CPU time per render. The compact response is measured with orjson (when installed) and with the
+stdlib fallback.
+
+Usage: python bench_json_response.py [--repeat 200]
+"""
+import argparse
+import time
+from typing import Any, Callable, Dict, List
+from unittest import mock
+
+from commonwealth.utils import apis
+
+
+def web_services_payload(services: int = 40) -> List[Dict[str, Any]]:
+    # Helper's /web_services
+    return [
+        {
+            "valid": True,
+            "title": f"Service {index}",
+            "documentation_url": f"/docs/service-{index}",
+            "versions": ["v1.0", "v1.1", "v2.0"],
+            "port": 9000 + index,
+            "path": None,
+            "metadata": {
+                "name": f"Service {index}",
+                "description": "Service description, with a few words explaining what it does for the vehicle.",
+                "icon": "mdi-information",
+                "company": "Blue Robotics",
+                "version": "1.2.3",
+                "webpage": "https://github.com/bluerobotics/BlueOS",
+                "route": None,
+                "new_page": False,
+                "extra_query": None,
+                "avoid_iframes": False,
+                "api": f"/service-{index}/docs",
+                "sanitized_name": f"service_{index}",
+                "works_in_relative_paths": True,
+                "extras": {"key": "value"},
+            },
+        }
+        for index in range(services)
+    ]
+
+
+def extensions_manifest_payload(extensions: int = 300) -> List[Dict[str, Any]]:
+    # Kraken's extensions manifest
+    return [
+        {
+            "identifier": f"company.extension{index}",
+            "name": f"Extension {index}",
+            "website": "https://example.com",
+            "docker": f"company/extension{index}",
+            "description": "Extension that does something useful ação",
+            "extension_logo": "https://example.com/logo.png",
+            "company_logo": "https://example.com/company.png",
+            "versions": {
+                f"1.{version}.0": {
+                    "permissions": {"HostConfig": {"Privileged": True, "NetworkMode": "host", "Binds": ["/dev:/dev"]}},
+                    "requirements": "core >= 1.1",
+                    "tag": f"1.{version}.0",
+                    "authors": [{"name": "Someone", "email": "someone@example.com"}],
+                    "filters": {"tags": ["tools", "positioning"]},
+                    "images": [{"architecture": "arm", "digest": "sha256:" + "f" * 64, "compressed_size": 123456}],
+                }
+                for version in range(5)
+            },
+        }
+        for index in range(extensions)
+    ]
+
+
+def measure(render: Callable[[Any], bytes], payload: Any, repeat: int) -> Dict[str, float]:
+    # Warm up
+    body = render(payload)
+    start = time.process_time()
+    for _ in range(repeat):
+        body = render(payload)
+    elapsed = time.process_time() - start
+    return {"bytes": len(body), "ms": elapsed / repeat * 1000}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=200, help="Number of renders for each measurement")
+    args = parser.parse_args()
+
+    def render_stdlib_compact(payload: Any) -> bytes:
+        with mock.patch.object(apis, "HAS_ORJSON", False):
+            return bytes(apis.CompactJSONResponse(payload).body)
+
+    renders: Dict[str, Callable[[Any], bytes]] = {
+        "PrettyJSONResponse": lambda payload: bytes(apis.PrettyJSONResponse(payload).body),
+        "CompactJSONResponse (stdlib)": render_stdlib_compact,
+    }
+    if apis.HAS_ORJSON:
+        renders["CompactJSONResponse (orjson)"] = lambda payload: bytes(apis.CompactJSONResponse(payload).body)
+
+    for name, payload in [("web_services", web_services_payload()), ("manifest", extensions_manifest_payload())]:
+        print(f"{name}:")
+        baseline = measure(renders["PrettyJSONResponse"], payload, args.repeat)
+        for render_name, render in renders.items():
+            result = measure(render, payload, args.repeat)
+            print(
+                f"  {render_name:<30} {result['bytes']:>9} bytes ({result['bytes'] / baseline['bytes']:.0%})"
+                f" {result['ms']:>8.3f} ms ({result['ms'] / baseline['ms']:.0%})"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,11 @@
 import asyncio
 import json
+import math
 import os
 import re
 import time
-from datetime import datetime
-from typing import Any, Dict, Optional
+from datetime import datetime, timezone
+from typing import Any, ClassVar, Dict, Iterable, List, Optional, Set, Tuple
 
 import aiohttp
 from loguru import logger
@@ -16,14 +17,34 @@ from commonwealth.mavlink_comm.exceptions import (
 )
 from commonwealth.mavlink_comm.typedefs import MavlinkVehicleType
 
+# (system_id, component_id, message_name)
+MessageKey = Tuple[int, int, str]
 
+
+# pylint: disable=too-many-instance-attributes
 class MavlinkMessenger:
+    # All messengers talk to the same mavlink2rest instance, so they share a single pool of keep-alive connections
+    # instead of paying a new TCP connection for every message sent or received.
+    MAX_CONNECTIONS = 8
+    KEEPALIVE_TIMEOUT = 30.0
+    _session: ClassVar[Optional[aiohttp.ClientSession]] = None
+    _session_loop: ClassVar[Optional[asyncio.AbstractEventLoop]] = None
+
     def __init__(self) -> None:
         self.system_id = int(os.environ.get("MAV_SYSTEM_ID", 1))
         self.component_id = int(os.environ.get("MAV_COMPONENT_ID_ONBOARD_COMPUTER4", 194))
         self.sequence = 0
         self.m2r_address = "localhost:6040"
 
+        self._subscribed_messages: Set[str] = set()
+        self._subscription_task: Optional["asyncio.Task[None]"] = None
+        self._subscription_connected = False
+        self._latest_messages: Dict[MessageKey, Dict[str, Any]] = {}
+        self._latest_messages_time: Dict[MessageKey, float] = {}
+        self._message_waiters: Dict[MessageKey, List["asyncio.Future[Dict[str, Any]]"]] = {}
+        # Time of the last HEARTBEAT received from each vehicle (not GCSs or other components), by system ID
+        self._vehicles_last_heartbeat: Dict[int, float] = {}
+
     def set_system_id(self, system_id: int) -> None:
         logger.info(f"system_id set to: {system_id}")
         self.system_id = system_id
@@ -43,16 +64,167 @@ class MavlinkMessenger:
     def m2r_rest_url(self) -> str:
         return f"http://{self.m2r_address}/mavlink"
 
+    @property
+    def m2r_ws_url(self) -> str:
+        return f"ws://{self.m2r_address}/ws/mavlink"
+
+    @classmethod
+    def session(cls) -> aiohttp.ClientSession:
+        """Shared HTTP session used to talk with mavlink2rest, created on demand for the running event loop."""
+        loop = asyncio.get_running_loop()
+        if cls._session is None or cls._session.closed or cls._session_loop is not loop:
+            connector = aiohttp.TCPConnector(
+                limit=cls.MAX_CONNECTIONS,
+                limit_per_host=cls.MAX_CONNECTIONS,
+                keepalive_timeout=cls.KEEPALIVE_TIMEOUT,
+            )
+            cls._session = aiohttp.ClientSession(connector=connector)
+            cls._session_loop = loop
+        return cls._session
+
+    @classmethod
+    async def close_session(cls) -> None:
+        """Close the shared HTTP session and its pooled connections."""
+        if cls._session is not None and not cls._session.closed:
+            await cls._session.close()
+        cls._session = None
+        cls._session_loop = None
+
+    def subscribe(self, message_names: Iterable[str]) -> None:
+        """Receive the given messages through mavlink2rest's websocket instead of polling its REST API.
+        The stream is started on demand, once there is a running event loop.
+
+        Args:
+            message_names (Iterable[str]): Name of the messages of interest, e.g: HEARTBEAT
+        """
+        new_messages = {name.upper() for name in message_names}.difference(self._subscribed_messages)
+        if not new_messages:
+            return
+        self._subscribed_messages.update(new_messages)
+        # The websocket filter is defined on connection, restart it to receive the new messages
+        if self._subscription_task is not None:
+            self._subscription_task.cancel()
+            self._subscription_task = None
+            self._subscription_connected = False
+
+    async def unsubscribe(self) -> None:
+        """Stop the websocket stream and drop all cached messages."""
+        self._subscribed_messages.clear()
+        if self._subscription_task is not None:
+            self._subscription_task.cancel()
+            self._subscription_task = None
+        self._subscription_connected = False
+        self._latest_messages.clear()
+        self._latest_messages_time.clear()
+        self._vehicles_last_heartbeat.clear()
+
+    def _is_subscribed(self, message_name: str) -> bool:
+        if message_name.upper() not in self._subscribed_messages:
+            return False
+        if self._subscription_task is None or self._subscription_task.done():
+            try:
+                self._subscription_task = asyncio.get_running_loop().create_task(self._run_subscription())
+            except RuntimeError:
+                # No running event loop yet, the stream will be started by the next caller
+                return False
+        return self._subscription_connected
+
+    async def _run_subscription(self) -> None:
+        message_filter = f"^({'|'.join(sorted(self._subscribed_messages))})$"
+        while True:
+            try:
+                async with self.session().ws_connect(
+                    self.m2r_ws_url, params={"filter": message_filter}, heartbeat=10.0
+                ) as websocket:
+                    logger.debug(f"Subscribed to mavlink2rest messages: {message_filter}")
+                    self._subscription_connected = True
+                    async for ws_message in websocket:
+                        if ws_message.type != aiohttp.WSMsgType.TEXT:
+                            continue
+                        self._handle_subscription_message(json.loads(ws_message.data))
+            except Exception as error:
+                logger.warning(f"Mavlink2rest websocket subscription failed: {error}")
+            finally:
+                self._subscription_connected = False
+            await asyncio.sleep(1.0)
+
+    def _handle_subscription_message(self, package: Dict[str, Any]) -> None:
+        header = package["header"]
+        message = package["message"]
+        key = (int(header["system_id"]), int(header["component_id"]), str(message["type"]))
+
+        # Keep the same format used by mavlink2rest REST API, so callers do not care about how it was received
+        previous_message = self._latest_messages.get(key)
+        counter = previous_message["status"]["time"]["counter"] + 1 if previous_message else 0
+        last_update = datetime.now(timezone.utc).isoformat()
+        new_message = {"message": message, "status": {"time": {"counter": counter, "last_update": last_update}}}
+        self._latest_messages[key] = new_message
+        self._latest_messages_time[key] = time.monotonic()
+        if key[2] == "HEARTBEAT":
+            self._register_vehicle(key[0], message)
+
+        for waiter in self._message_waiters.pop(key, []):
+            if not waiter.done():
+                waiter.set_result(new_message)
+
+    def _register_vehicle(self, system_id: int, heartbeat: Dict[str, Any]) -> None:
+        try:
+            vehicle_type = MavlinkVehicleType[heartbeat["mavtype"]["type"]]
+        except KeyError:
+            return
+        if vehicle_type.is_actually_a_vehicle():
+            self._vehicles_last_heartbeat[system_id] = time.monotonic()
+
+    def get_cached_mavlink_message(
+        self,
+        message_name: str,
+        vehicle: Optional[int] = None,
+        component: int = 1,
+        max_age: Optional[float] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """Latest message received through the websocket subscription, if any.
+
+        Args:
+            max_age (float, optional): Ignore the cached message if it was received more than max_age seconds ago.
+        """
+        if not self._is_subscribed(message_name):
+            return None
+        key = (vehicle or self.system_id, component, message_name.upper())
+        if max_age is not None and time.monotonic() - self._latest_messages_time.get(key, -math.inf) > max_age:
+            return None
+        return self._latest_messages.get(key)
+
+    async def wait_mavlink_message(
+        self, message_name: str, vehicle: Optional[int] = None, component: int = 1, timeout: float = 10.0
+    ) -> Dict[str, Any]:
+        """Wait for the next message received through the websocket subscription."""
+        if message_name.upper() not in self._subscribed_messages:
+            raise ValueError(f"Not subscribed to {message_name}.")
+        self._is_subscribed(message_name)
+
+        key = (vehicle or self.system_id, component, message_name.upper())
+        waiter: "asyncio.Future[Dict[str, Any]]" = asyncio.get_running_loop().create_future()
+        self._message_waiters.setdefault(key, []).append(waiter)
+        try:
+            return await asyncio.wait_for(waiter, timeout)
+        except asyncio.TimeoutError as error:
+            raise FetchUpdatedMessageFail(f"Did not receive an updated {message_name} before timeout.") from error
+        finally:
+            waiters = self._message_waiters.get(key, [])
+            if waiter in waiters:
+                waiters.remove(waiter)
+            if not waiters:
+                self._message_waiters.pop(key, None)
+
     async def get_all_mavlink(self) -> Any:
         request_timeout = 1.0
-        async with aiohttp.ClientSession() as session:
-            try:
-                async with session.get(self.m2r_rest_url, timeout=request_timeout) as response:
-                    if not response.status == 200:
-                        raise MavlinkMessageReceiveFail(f"Received status code of {response.status}.")
-                    message = await response.json()
-            except asyncio.exceptions.TimeoutError as error:
-                raise MavlinkMessageReceiveFail(f"Request timed out after {request_timeout} second.") from error
+        try:
+            async with self.session().get(self.m2r_rest_url, timeout=request_timeout) as response:
+                if not response.status == 200:
+                    raise MavlinkMessageReceiveFail(f"Received status code of {response.status}.")
+                message = await response.json()
+        except asyncio.exceptions.TimeoutError as error:
+            raise MavlinkMessageReceiveFail(f"Request timed out after {request_timeout} second.") from error
         return message
 
     async def get_mavlink_message(
@@ -63,22 +235,29 @@ class MavlinkMessenger:
             request_url += f"/{message_name.upper()}"
 
         request_timeout = 1.0
-        async with aiohttp.ClientSession() as session:
-            try:
-                async with session.get(request_url, timeout=request_timeout) as response:
-                    if not response.status == 200:
-                        raise MavlinkMessageReceiveFail(f"Received status code of {response.status}.")
-                    # if message is "None", try re-detecting systemid
-                    if await response.text() == "None":
-                        self.set_system_id(await self.get_most_recent_vehicle_id())
-                        raise MavlinkMessageReceiveFail("Received empty response")
-                    message = await response.json()
-            except asyncio.exceptions.TimeoutError as error:
-                raise MavlinkMessageReceiveFail(f"Request timed out after {request_timeout} second.") from error
+        try:
+            async with self.session().get(request_url, timeout=request_timeout) as response:
+                if not response.status == 200:
+                    raise MavlinkMessageReceiveFail(f"Received status code of {response.status}.")
+                # if message is "None", try re-detecting systemid
+                if await response.text() == "None":
+                    self.set_system_id(await self.get_most_recent_vehicle_id())
+                    raise MavlinkMessageReceiveFail("Received empty response")
+                message = await response.json()
+        except asyncio.exceptions.TimeoutError as error:
+            raise MavlinkMessageReceiveFail(f"Request timed out after {request_timeout} second.") from error
 
         return message
 
     async def get_most_recent_vehicle_id(self) -> int:
+        # Messengers subscribed to HEARTBEAT track the vehicles, so there is no need to download the entire mavlink2rest
+        # state. Otherwise, or until the subscription is up, we fallback to the full state scan.
+        if self._is_subscribed("HEARTBEAT") and self._vehicles_last_heartbeat:
+            vehicles_last_heartbeat = self._vehicles_last_heartbeat
+            tracked_vehicle_id = max(vehicles_last_heartbeat, key=lambda system_id: vehicles_last_heartbeat[system_id])
+            logger.debug(f"{tracked_vehicle_id} (detected)")
+            return tracked_vehicle_id
+
         json_data = await self.get_all_mavlink()
         most_recent_timestamp = datetime.min
         most_recent_vehicle_id = None
@@ -111,6 +290,14 @@ class MavlinkMessenger:
         component: int = 1,
         timeout: float = 10.0,
     ) -> Any:
+        if self._is_subscribed(message_name):
+            try:
+                return await self.wait_mavlink_message(message_name, vehicle, component, timeout / 2)
+            except FetchUpdatedMessageFail:
+                logger.warning(f"no new messages after {timeout/2} seconds, triggering system-id detection")
+                self.set_system_id(await self.get_most_recent_vehicle_id())
+                raise
+
         first_message = await self.get_mavlink_message(message_name, vehicle or self.system_id, component)
         first_message_counter = first_message["status"]["time"]["counter"]
         t0 = time.time()
@@ -134,13 +321,12 @@ class MavlinkMessenger:
         }
 
         request_timeout = 1.0
-        async with aiohttp.ClientSession() as session:
-            try:
-                async with session.post(
-                    self.m2r_rest_url, data=json.dumps(mavlink2rest_package), timeout=request_timeout
-                ) as response:
-                    if not response.status == 200:
-                        logger.warning(await response.text())
-                        raise MavlinkMessageSendFail(f"Received status code of {response.status}.")
-            except asyncio.exceptions.TimeoutError as error:
-                raise MavlinkMessageSendFail(f"Request timed out after {request_timeout} second.") from error
+        try:
+            async with self.session().post(
+                self.m2r_rest_url, data=json.dumps(mavlink2rest_package), timeout=request_timeout
+            ) as response:
+                if not response.status == 200:
+                    logger.warning(await response.text())
+                    raise MavlinkMessageSendFail(f"Received status code of {response.status}.")
+        except asyncio.exceptions.TimeoutError as error:
+            raise MavlinkMessageSendFail(f"Request timed out after {request_timeout} second.") from error
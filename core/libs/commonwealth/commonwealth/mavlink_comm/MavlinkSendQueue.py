@@ -0,0 +1,111 @@
+import asyncio
+import itertools
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Hashable, Iterable, Optional
+
+from loguru import logger
+
+from commonwealth.mavlink_comm.MavlinkComm import MavlinkMessenger
+
+
+@dataclass
+class SendQueueStatistics:
+    sent: int = 0
+    failed: int = 0
+    coalesced: int = 0
+    dropped: int = 0
+
+
+# pylint: disable=too-many-instance-attributes
+class MavlinkSendQueue:
+    """Bounded asynchronous queue used to send messages to mavlink2rest without blocking the producers.
+
+    Messages with a type listed in coalesce_types follow a "latest wins" policy: while a message of the same type is
+    still waiting to be sent, it is replaced by the newer one. When the queue is full the oldest pending message is
+    dropped. Pending messages are flushed in batches, concurrently, over the messenger's pooled session.
+    """
+
+    def __init__(
+        self,
+        messenger: MavlinkMessenger,
+        coalesce_types: Iterable[str] = (),
+        max_size: int = 32,
+    ) -> None:
+        if max_size <= 0:
+            raise ValueError("Queue size should be greater than zero.")
+        self.messenger = messenger
+        self.coalesce_types = {message_type.upper() for message_type in coalesce_types}
+        self.max_size = max_size
+        self.statistics = SendQueueStatistics()
+
+        self._pending: "OrderedDict[Hashable, Dict[str, Any]]" = OrderedDict()
+        self._unique_keys = itertools.count()
+        self._has_pending = asyncio.Event()
+        self._is_idle = asyncio.Event()
+        self._is_idle.set()
+        self._flush_task: Optional["asyncio.Task[None]"] = None
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def put(self, message: Dict[str, Any]) -> None:
+        """Schedule a message to be sent. Never blocks, must be called from the event loop thread.
+
+        Args:
+            message (Dict[str, Any]): Message in mavlink2rest format, e.g: {"type": "GPS_INPUT", ...}
+        """
+        message_type = str(message.get("type", "")).upper()
+        key: Hashable = message_type if message_type in self.coalesce_types else next(self._unique_keys)
+
+        if key in self._pending:
+            self._pending[key] = message
+            self.statistics.coalesced += 1
+        else:
+            if len(self._pending) >= self.max_size:
+                self._pending.popitem(last=False)
+                self.statistics.dropped += 1
+            self._pending[key] = message
+
+        self._is_idle.clear()
+        self._has_pending.set()
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.get_running_loop().create_task(self._flush_forever())
+
+    async def flush(self) -> None:
+        """Wait until all pending messages were sent."""
+        await self._is_idle.wait()
+
+    async def close(self) -> None:
+        """Stop sending messages, dropping the pending ones."""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        self.statistics.dropped += len(self._pending)
+        self._pending.clear()
+        self._has_pending.clear()
+        self._is_idle.set()
+
+    async def _send(self, message: Dict[str, Any]) -> None:
+        try:
+            await self.messenger.send_mavlink_message(message)
+            self.statistics.sent += 1
+        except Exception as error:
+            self.statistics.failed += 1
+            logger.warning(f"Failed to send {message.get('type')} message: {error}")
+
+    async def _flush_forever(self) -> None:
+        while True:
+            await self._has_pending.wait()
+            self._has_pending.clear()
+
+            batch = list(self._pending.values())
+            self._pending.clear()
+            await asyncio.gather(*[self._send(message) for message in batch])
+
+            if not self._pending:
+                self._is_idle.set()
@@ -13,11 +13,14 @@ from commonwealth.mavlink_comm.typedefs import (
 )
 
 MAV_MODE_FLAG_SAFETY_ARMED = 128
+# Heartbeats are sent at 1 Hz, a cached one younger than this is still a valid description of the vehicle state
+HEARTBEAT_MAX_AGE = 1.5
 
 
 class VehicleManager:
     def __init__(self) -> None:
         self.mavlink2rest = MavlinkMessenger()
+        self.mavlink2rest.subscribe(["HEARTBEAT"])
 
         self.target_system = 1
         self.target_component = 1
@@ -89,8 +92,15 @@ class VehicleManager:
             self.set_target_system(await self.mavlink2rest.get_most_recent_vehicle_id())
             raise ValueError("Failed to get autopilot version.") from Exception
 
+    async def get_heartbeat(self, allow_cached: bool = True) -> Any:
+        if allow_cached:
+            heartbeat_message = self.mavlink2rest.get_cached_mavlink_message("HEARTBEAT", max_age=HEARTBEAT_MAX_AGE)
+            if heartbeat_message is not None:
+                return heartbeat_message
+        return await self.mavlink2rest.get_updated_mavlink_message("HEARTBEAT")
+
     async def get_vehicle_type(self) -> MavlinkVehicleType:
-        heartbeat_message = await self.mavlink2rest.get_updated_mavlink_message("HEARTBEAT")
+        heartbeat_message = await self.get_heartbeat()
         return MavlinkVehicleType[heartbeat_message["message"]["mavtype"]["type"]]  # type: ignore
 
     async def get_firmware_vehicle_type(self) -> str:
@@ -113,8 +123,8 @@ class VehicleManager:
             logger.error(f"Failed to check heartbeat. {error}")
             return False
 
-    async def is_vehicle_armed(self) -> bool:
-        get_response = await self.mavlink2rest.get_updated_mavlink_message("HEARTBEAT")
+    async def is_vehicle_armed(self, allow_cached: bool = True) -> bool:
+        get_response = await self.get_heartbeat(allow_cached)
         base_mode_bits = get_response["message"]["base_mode"]["bits"]
         if not isinstance(base_mode_bits, int):
             raise ValueError("Got unexpected HEARTBEAT message from Autopilot.")
@@ -130,7 +140,7 @@ class VehicleManager:
         disarm_message = self.command_long_message("MAV_CMD_COMPONENT_ARM_DISARM", [])
 
         await self.mavlink2rest.send_mavlink_message(disarm_message)
-        if await self.is_vehicle_armed():
+        if await self.is_vehicle_armed(allow_cached=False):
             raise VehicleDisarmFail("Failed to disarm vehicle. Please try a manual disarm.")
 
     async def vehicle_is_safe(self) -> bool:
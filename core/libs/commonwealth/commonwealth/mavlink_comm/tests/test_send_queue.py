@@ -0,0 +1,58 @@
+import asyncio
+from typing import Any, Dict, List
+
+import pytest
+
+from ..MavlinkComm import MavlinkMessenger
+from ..MavlinkSendQueue import MavlinkSendQueue
+
+
+class SlowMessenger(MavlinkMessenger):
+    def __init__(self) -> None:
+        super().__init__()
+        self.sent: List[Dict[str, Any]] = []
+
+    async def send_mavlink_message(self, message: Dict[str, Any]) -> None:
+        await asyncio.sleep(0.05)
+        if message.get("fail"):
+            raise RuntimeError("mavlink2rest is not available")
+        self.sent.append(message)
+
+
+@pytest.mark.asyncio
+async def test_send_queue_coalesces_latest_message() -> None:
+    messenger = SlowMessenger()
+    queue = MavlinkSendQueue(messenger, coalesce_types=["GPS_INPUT"])
+
+    for index in range(10):
+        queue.put({"type": "GPS_INPUT", "lat": index})
+        queue.put({"type": "COMMAND_LONG", "param1": index})
+    await queue.flush()
+
+    gps_inputs = [message["lat"] for message in messenger.sent if message["type"] == "GPS_INPUT"]
+    commands = [message["param1"] for message in messenger.sent if message["type"] == "COMMAND_LONG"]
+    assert gps_inputs == [9]
+    assert sorted(commands) == list(range(10))
+    assert queue.statistics.coalesced == 9
+    assert queue.statistics.sent == 11
+    assert queue.statistics.dropped == 0
+    await queue.close()
+
+
+@pytest.mark.asyncio
+async def test_send_queue_is_bounded() -> None:
+    messenger = SlowMessenger()
+    queue = MavlinkSendQueue(messenger, max_size=4)
+
+    queue.put({"type": "HEARTBEAT", "index": -1})
+    await asyncio.sleep(0)
+    for index in range(10):
+        queue.put({"type": "HEARTBEAT", "index": index})
+    assert len(queue) == 4
+    queue.put({"type": "HEARTBEAT", "fail": True})
+    await queue.flush()
+
+    assert [message["index"] for message in messenger.sent] == [-1, 7, 8, 9]
+    assert queue.statistics.dropped == 7
+    assert queue.statistics.failed == 1
+    await queue.close()
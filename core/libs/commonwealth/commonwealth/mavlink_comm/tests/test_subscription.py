@@ -0,0 +1,75 @@
+import asyncio
+import json
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict
+
+import pytest
+from aiohttp import web
+
+from ..MavlinkComm import MavlinkMessenger
+
+
+def heartbeat_package(system_id: int) -> Dict[str, Any]:
+    return {
+        "header": {"system_id": system_id, "component_id": 1, "sequence": 0},
+        "message": {"type": "HEARTBEAT", "mavtype": {"type": "MAV_TYPE_SUBMARINE"}},
+    }
+
+
+@asynccontextmanager
+async def stub_mavlink2rest() -> AsyncIterator[Dict[str, Any]]:
+    """Stub of mavlink2rest websocket, sending a HEARTBEAT every few milliseconds"""
+    state: Dict[str, Any] = {"filters": []}
+
+    async def websocket_handler(request: web.Request) -> web.WebSocketResponse:
+        state["filters"].append(request.query.get("filter"))
+        websocket = web.WebSocketResponse()
+        await websocket.prepare(request)
+        while not websocket.closed:
+            await websocket.send_str(json.dumps(heartbeat_package(1)))
+            await asyncio.sleep(0.01)
+        return websocket
+
+    app = web.Application()
+    app.router.add_get("/ws/mavlink", websocket_handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    state["address"] = f"127.0.0.1:{runner.addresses[0][1]}"
+    try:
+        yield state
+    finally:
+        await runner.cleanup()
+
+
+@pytest.mark.asyncio
+async def test_subscription_receives_and_caches_messages() -> None:
+    async with stub_mavlink2rest() as mavlink2rest:
+        await check_subscription(mavlink2rest)
+
+
+async def check_subscription(mavlink2rest: Dict[str, Any]) -> None:
+    messenger = MavlinkMessenger()
+    messenger.set_m2r_address(mavlink2rest["address"])
+    messenger.subscribe(["heartbeat"])
+
+    # The stream is started by the first reader, nothing is cached before it connects
+    assert messenger.get_cached_mavlink_message("HEARTBEAT") is None
+    message = await messenger.wait_mavlink_message("HEARTBEAT", timeout=5)
+    assert message["message"]["type"] == "HEARTBEAT"
+    assert mavlink2rest["filters"] == ["^(HEARTBEAT)$"]
+
+    newer_message = await messenger.wait_mavlink_message("HEARTBEAT", timeout=5)
+    assert newer_message["status"]["time"]["counter"] > message["status"]["time"]["counter"]
+    cached = messenger.get_cached_mavlink_message("HEARTBEAT", max_age=5)
+    assert cached is not None and cached["message"] == message["message"]
+    assert messenger.get_cached_mavlink_message("HEARTBEAT", vehicle=2) is None
+    # Waiters are dropped once they are done
+    assert not messenger._message_waiters
+    # Vehicles are tracked from the subscribed HEARTBEATs, without using the REST API
+    assert await messenger.get_most_recent_vehicle_id() == 1
+
+    await messenger.unsubscribe()
+    assert messenger.get_cached_mavlink_message("HEARTBEAT") is None
+    await MavlinkMessenger.close_session()
@@ -13,6 +13,7 @@ from commonwealth.settings.exceptions import (
     MigrationFail,
     SettingsFromTheFuture,
 )
+from commonwealth.settings.files import write_file_atomically
 
 
 class PydanticSettings(BaseModel):
@@ -93,15 +94,9 @@ class PydanticSettings(BaseModel):
         Args:
             file_path (pathlib.Path): Path for the settings file
         """
-        # Path for settings file does not exist, lets ensure that it does
-        parent_path = file_path.parent.absolute()
-        parent_path.mkdir(parents=True, exist_ok=True)
-
-        with open(file_path, "w", encoding="utf-8") as settings_file:
-            logger.debug(f"Saving settings on: {file_path}")
-
-            json_data = self.dict()
-            json.dump(json_data, settings_file, indent=4)
+        content = json.dumps(self.dict(), indent=4)
+        if write_file_atomically(file_path, content):
+            logger.debug(f"Saved settings on: {file_path}")
 
     def reset(self) -> None:
         """Reset internal data to default values"""
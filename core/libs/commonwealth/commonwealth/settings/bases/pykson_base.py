@@ -13,6 +13,7 @@ from commonwealth.settings.exceptions import (
     MigrationFail,
     SettingsFromTheFuture,
 )
+from commonwealth.settings.files import write_file_atomically
 
 
 class PyksonSettings(pykson.JsonObject):
@@ -86,13 +87,9 @@ class PyksonSettings(pykson.JsonObject):
         Args:
             file_path (pathlib.Path): Path for the settings file
         """
-        # Path for settings file does not exist, lets ensure that it does
-        parent_path = file_path.parent.absolute()
-        parent_path.mkdir(parents=True, exist_ok=True)
-
-        with open(file_path, "w", encoding="utf-8") as settings_file:
-            logger.debug(f"Saving settings on: {file_path}")
-            settings_file.write(json.dumps(json.loads(Pykson().to_json(self)), indent=4))
+        content = Pykson().to_json(self, indent=4)
+        if write_file_atomically(file_path, content):
+            logger.debug(f"Saved settings on: {file_path}")
 
     def reset(self) -> None:
         """Reset internal data to default values"""
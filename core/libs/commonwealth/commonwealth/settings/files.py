@@ -0,0 +1,95 @@
+import hashlib
+import os
+import pathlib
+import tempfile
+from threading import Lock
+from typing import Dict, Optional, Tuple
+
+FileIdentity = Optional[Tuple[int, int, int]]
+
+# Content hash and file identity (inode, size, modification time) of the last write done to each settings file
+_written_files: Dict[pathlib.Path, Tuple[str, FileIdentity]] = {}
+_written_files_lock = Lock()
+
+
+def file_identity(file_path: pathlib.Path) -> FileIdentity:
+    """Cheap fingerprint of a file or folder, it changes when the file is replaced or modified.
+
+    Args:
+        file_path (pathlib.Path): Path for the file
+
+    Returns:
+        FileIdentity: Inode, size and modification time in nanoseconds, None if it does not exist
+    """
+    try:
+        stat = file_path.stat()
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+
+def file_mode(file_path: pathlib.Path) -> int:
+    """Permissions of an existing file, or the default permissions of a new file under the current umask.
+
+    Args:
+        file_path (pathlib.Path): Path for the file
+
+    Returns:
+        int: Permission bits of the file
+    """
+    try:
+        return file_path.stat().st_mode & 0o7777
+    except FileNotFoundError:
+        # The umask can only be read by replacing it
+        umask = os.umask(0)
+        os.umask(umask)
+        return 0o666 & ~umask
+
+
+def write_file_atomically(file_path: pathlib.Path, content: str) -> bool:
+    """Write content to file using a temporary file that replaces the original one, so the file is never left
+    partially written. The write is skipped if the file still holds the same content of our last write.
+
+    Args:
+        file_path (pathlib.Path): Path for the file
+        content (str): New content of the file
+
+    Returns:
+        bool: True if the file was written
+    """
+    file_path = file_path.absolute()
+    content_hash = hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+    with _written_files_lock:
+        last_write = _written_files.get(file_path)
+        if last_write is not None and last_write == (content_hash, file_identity(file_path)):
+            return False
+
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        mode = file_mode(file_path)
+        with tempfile.NamedTemporaryFile(
+            "w", encoding="utf-8", dir=file_path.parent, prefix=f".{file_path.name}.", suffix=".tmp", delete=False
+        ) as temporary_file:
+            try:
+                # Temporary files are only readable by the owner, keep the permissions of a regular file
+                os.fchmod(temporary_file.fileno(), mode)
+                temporary_file.write(content)
+                temporary_file.flush()
+                os.fsync(temporary_file.fileno())
+            except Exception:
+                os.unlink(temporary_file.name)
+                raise
+        os.replace(temporary_file.name, file_path)
+
+        # Make sure that the rename itself is persisted
+        try:
+            directory = os.open(file_path.parent, os.O_RDONLY)
+            try:
+                os.fsync(directory)
+            finally:
+                os.close(directory)
+        except OSError:
+            pass
+
+        _written_files[file_path] = (content_hash, file_identity(file_path))
+        return True
@@ -1,15 +1,21 @@
+import atexit
 import pathlib
 import re
-from typing import Any, Optional, Type
+from threading import Lock, RLock, Timer
+from typing import Any, Callable, Optional, Tuple, Type
 
 import appdirs
 from loguru import logger
 
 from commonwealth.settings.bases.pydantic_base import PydanticSettings
 from commonwealth.settings.exceptions import SettingsFromTheFuture
+from commonwealth.settings.files import FileIdentity, file_identity
+from commonwealth.settings.watcher import FolderWatcher
 
 
 class PydanticManager:
+    # pylint: disable=too-many-instance-attributes
+    # pylint: disable=too-many-arguments
     SETTINGS_NAME_PREFIX = "settings-"
 
     def __init__(
@@ -18,6 +24,7 @@ class PydanticManager:
         settings_type: Type[PydanticSettings],
         config_folder: Optional[pathlib.Path] = None,
         load: bool = True,
+        save_delay: float = 0.0,
     ) -> None:
         assert project_name, "project_name should be not empty"
         assert issubclass(settings_type, PydanticSettings), "settings_type should use PydanticSettings as subclass"
@@ -30,7 +37,18 @@ class PydanticManager:
         )
         self.config_folder.mkdir(parents=True, exist_ok=True)
         self.settings_type = settings_type
-        self._settings = None
+        self._static_version: Optional[int] = None
+        self._settings: Optional[PydanticSettings] = None
+        # When greater than zero, bursts of saves within this amount of seconds are coalesced in a single write
+        self.save_delay = save_delay
+        self._save_timer: Optional[Timer] = None
+        self._save_lock = Lock()
+        self._io_lock = RLock()
+        # Settings file used by the last load and the identities of it and its folder, used to skip unneeded loads
+        self._loaded_state: Optional[Tuple[pathlib.Path, FileIdentity, FileIdentity]] = None
+        self._watcher: Optional[FolderWatcher] = None
+        if save_delay > 0:
+            atexit.register(self.flush)
         logger.debug(
             f"Starting {project_name} settings with {settings_type.__name__}, configuration path: {config_folder}"
         )
@@ -69,8 +87,10 @@ class PydanticManager:
             pathlib.Path: Path for the settings file
         """
         # Due to the fact that the static version is created in the inheritance chain instantiation, we need to
-        # instantiate the class to get the static version
-        version = self.settings_type().STATIC_VERSION
+        # instantiate the class to get the static version, it does not change so we do it only once
+        if self._static_version is None:
+            self._static_version = self.settings_type().STATIC_VERSION
+        version = self._static_version
 
         return self.config_folder.joinpath(f"{PydanticManager.SETTINGS_NAME_PREFIX}{version}.json")
 
@@ -96,13 +116,53 @@ class PydanticManager:
 
         return settings_data
 
+    def _remember_loaded_file(self, file_path: pathlib.Path) -> None:
+        self._loaded_state = (file_path, file_identity(file_path), file_identity(self.config_folder))
+
+    def _is_loaded_file_unchanged(self) -> bool:
+        if self._settings is None or self._loaded_state is None:
+            return False
+        file_path, file_state, folder_state = self._loaded_state
+        # Folder modification time changes when settings files are created, renamed or removed
+        return file_identity(file_path) == file_state and file_identity(self.config_folder) == folder_state
+
+    def _write(self) -> None:
+        with self._io_lock:
+            file_path = self.settings_file_path()
+            self.settings.save(file_path)
+            self._remember_loaded_file(file_path)
+
     def save(self) -> None:
-        """Save settings"""
-        self.settings.save(self.settings_file_path())
+        """Save settings, if save_delay is set the write is postponed to coalesce multiple saves"""
+        if self.save_delay <= 0:
+            self._write()
+            return
+
+        with self._save_lock:
+            if self._save_timer is None:
+                self._save_timer = Timer(self.save_delay, self.flush)
+                self._save_timer.daemon = True
+                self._save_timer.start()
+
+    def flush(self) -> None:
+        """Write pending settings changes, if any"""
+        with self._save_lock:
+            if self._save_timer is None:
+                return
+            self._save_timer.cancel()
+            self._save_timer = None
+        self._write()
 
     def load(self) -> None:
-        """Load settings"""
+        """Load settings, does nothing if the settings file did not change since the last load or save"""
+        with self._io_lock:
+            # Do not lose changes that are still waiting to be written
+            self.flush()
+            if self._is_loaded_file_unchanged():
+                return
+            self._load()
 
+    def _load(self) -> None:
         def get_settings_version_from_filename(filename: pathlib.Path) -> int:
             result = re.search(f"{PydanticManager.SETTINGS_NAME_PREFIX}(\\d+)", filename.name)
             assert result
@@ -122,9 +182,38 @@ class PydanticManager:
             logger.debug(f"Checking {valid_file} for settings")
             try:
                 self._settings = PydanticManager.load_from_file(self.settings_type, valid_file)
+                self._remember_loaded_file(valid_file)
                 logger.debug(f"Using {valid_file} as settings source")
                 return
             except SettingsFromTheFuture as exception:
                 logger.debug("Invalid settings, going to try another file:", exception)
 
         self._settings = PydanticManager.load_from_file(self.settings_type, self.settings_file_path())
+        self._remember_loaded_file(self.settings_file_path())
+
+    def watch(self, callback: Callable[[Any], None], poll_interval: float = 5.0) -> None:
+        """Call callback with the new settings every time the settings file changes on disk.
+        Uses inotify when available, otherwise the settings folder is checked every poll_interval seconds.
+
+        Args:
+            callback (Callable[[Any], None]): Called from a background thread with the reloaded settings
+            poll_interval (float): Interval in seconds between checks when inotify is not available
+        """
+
+        def reload_if_changed() -> None:
+            with self._io_lock:
+                if self._is_loaded_file_unchanged():
+                    return
+                self.load()
+                settings = self._settings
+            callback(settings)
+
+        self.stop_watching()
+        self._watcher = FolderWatcher(self.config_folder, reload_if_changed, poll_interval)
+        self._watcher.start()
+
+    def stop_watching(self) -> None:
+        """Stop calling the callback registered with watch"""
+        if self._watcher is not None:
+            self._watcher.stop()
+            self._watcher = None
@@ -0,0 +1,27 @@
+import os
+import pathlib
+import tempfile
+
+from ..files import write_file_atomically
+
+
+def test_write_file_atomically_permissions() -> None:
+    with tempfile.TemporaryDirectory() as folder:
+        file_path = pathlib.Path(folder, "settings.json")
+        umask = os.umask(0o022)
+        try:
+            assert write_file_atomically(file_path, "first")
+        finally:
+            os.umask(umask)
+        assert file_path.read_text(encoding="utf-8") == "first"
+        assert file_path.stat().st_mode & 0o777 == 0o644
+
+        # Permissions of existing files are kept
+        file_path.chmod(0o640)
+        assert write_file_atomically(file_path, "second")
+        assert file_path.read_text(encoding="utf-8") == "second"
+        assert file_path.stat().st_mode & 0o777 == 0o640
+
+        # Same content is not written again
+        assert not write_file_atomically(file_path, "second")
+        assert not [path.name for path in pathlib.Path(folder).iterdir() if path.name.endswith(".tmp")]
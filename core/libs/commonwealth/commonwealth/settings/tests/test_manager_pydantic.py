@@ -1,7 +1,8 @@
 import os
 import pathlib
 import tempfile
-from typing import Any, Dict
+import time
+from typing import Any, Dict, List
 
 from ..bases.pydantic_base import PydanticSettings
 from ..managers.pydantic_manager import PydanticManager
@@ -173,3 +174,83 @@ def test_fallback_settings_save_load() -> None:
     assert settings_manager.settings.version_2_variable == 2
     assert settings_manager.settings.version_3_variable == 3
     assert settings_manager.settings.version_12_variable == 12
+
+
+def test_unchanged_settings_are_not_rewritten() -> None:
+    temporary_folder = tempfile.mkdtemp()
+    config_path = pathlib.Path(temporary_folder)
+
+    settings_manager = PydanticManager("ManagerTest", SettingsV1, config_path)
+    settings_file = settings_manager.settings_file_path()
+    modification_time = settings_file.stat().st_mtime_ns
+    inode = settings_file.stat().st_ino
+
+    time.sleep(0.01)
+    settings_manager.save()
+    assert settings_file.stat().st_mtime_ns == modification_time
+
+    settings_manager.settings.version_1_variable = 7
+    settings_manager.save()
+    # File is replaced, not rewritten in place
+    assert settings_file.stat().st_ino != inode
+    assert os.listdir(config_path.joinpath("managertest")) == [settings_file.name]
+    assert PydanticManager("ManagerTest", SettingsV1, config_path).settings.version_1_variable == 7
+
+
+def test_delayed_settings_save() -> None:
+    temporary_folder = tempfile.mkdtemp()
+    config_path = pathlib.Path(temporary_folder)
+
+    settings_manager = PydanticManager("ManagerTest", SettingsV1, config_path, save_delay=0.2)
+    for value in range(10):
+        settings_manager.settings.version_1_variable = value
+        settings_manager.save()
+
+    assert PydanticManager("ManagerTest", SettingsV1, config_path).settings.version_1_variable == 42
+    time.sleep(0.4)
+    assert PydanticManager("ManagerTest", SettingsV1, config_path).settings.version_1_variable == 9
+
+    settings_manager.settings.version_1_variable = 100
+    settings_manager.save()
+    settings_manager.flush()
+    assert PydanticManager("ManagerTest", SettingsV1, config_path).settings.version_1_variable == 100
+
+
+def test_load_skips_unchanged_settings_file() -> None:
+    temporary_folder = tempfile.mkdtemp()
+    config_path = pathlib.Path(temporary_folder)
+
+    settings_manager = PydanticManager("ManagerTest", SettingsV1, config_path)
+    settings = settings_manager.settings
+    settings_manager.load()
+    assert settings_manager.settings is settings
+
+    # Settings changed by someone else
+    other_manager = PydanticManager("ManagerTest", SettingsV1, config_path)
+    other_manager.settings.version_1_variable = 5
+    other_manager.save()
+
+    settings_manager.load()
+    assert settings_manager.settings is not settings
+    assert settings_manager.settings.version_1_variable == 5
+
+
+def test_watch_settings_changes() -> None:
+    temporary_folder = tempfile.mkdtemp()
+    config_path = pathlib.Path(temporary_folder)
+
+    settings_manager = PydanticManager("ManagerTest", SettingsV1, config_path)
+    changes: List[int] = []
+    settings_manager.watch(lambda settings: changes.append(settings.version_1_variable), poll_interval=0.05)
+    try:
+        other_manager = PydanticManager("ManagerTest", SettingsV1, config_path)
+        other_manager.settings.version_1_variable = 3
+        other_manager.save()
+
+        deadline = time.monotonic() + 2
+        while not changes and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert changes == [3]
+        assert settings_manager.settings.version_1_variable == 3
+    finally:
+        settings_manager.stop_watching()
@@ -0,0 +1,142 @@
+import ctypes
+import ctypes.util
+import os
+import pathlib
+import select
+import struct
+import threading
+from typing import Callable, List, Optional, Tuple
+
+from loguru import logger
+
+# Flags from sys/inotify.h
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF
+
+# struct inotify_event { int wd; uint32_t mask; uint32_t cookie; uint32_t len; char name[]; }
+INOTIFY_EVENT_HEADER = struct.Struct("iIII")
+
+
+class FolderWatcher:
+    """Call callback from a background thread when files inside folder are created, written, renamed or deleted.
+
+    Uses inotify when available. Otherwise the callback is called every poll_interval seconds, so it should be cheap
+    to call when nothing changed.
+    Files starting with a dot (e.g: temporary files used for atomic writes) are ignored.
+    """
+
+    # pylint: disable=too-many-instance-attributes
+    # pylint: disable=too-many-arguments
+
+    def __init__(
+        self,
+        folder: pathlib.Path,
+        callback: Callable[[], None],
+        poll_interval: float = 5.0,
+        debounce: float = 0.1,
+        mask: int = WATCH_MASK,
+    ) -> None:
+        self.folder = folder
+        # Files kept open while written (e.g: by daemons) only generate IN_MODIFY events
+        self.mask = mask
+        self.callback = callback
+        self.poll_interval = poll_interval
+        self.debounce = debounce
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._inotify_fd: Optional[int] = None
+        # Written on stop to wake up the thread blocked on inotify
+        self._wakeup_fds: Optional[Tuple[int, int]] = None
+
+    @property
+    def uses_inotify(self) -> bool:
+        return self._inotify_fd is not None
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._inotify_fd = self._create_inotify()
+        if self._inotify_fd is not None:
+            self._wakeup_fds = os.pipe()
+        self._thread = threading.Thread(target=self._run, name=f"watcher-{self.folder.name}", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._wakeup_fds is not None:
+            os.write(self._wakeup_fds[1], b"\0")
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        self._thread = None
+
+    def _create_inotify(self) -> Optional[int]:
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+            fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+            if fd < 0:
+                raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+            if libc.inotify_add_watch(fd, str(self.folder).encode(), self.mask) < 0:
+                error = ctypes.get_errno()
+                os.close(fd)
+                raise OSError(error, "inotify_add_watch failed")
+            return int(fd)
+        except (OSError, AttributeError) as error:
+            logger.debug(f"inotify is not available for {self.folder}, falling back to polling: {error}")
+            return None
+
+    def _read_events(self, fd: int) -> List[str]:
+        names: List[str] = []
+        while True:
+            try:
+                data = os.read(fd, 4096)
+            except BlockingIOError:
+                return names
+            offset = 0
+            while offset + INOTIFY_EVENT_HEADER.size <= len(data):
+                _wd, _mask, _cookie, length = INOTIFY_EVENT_HEADER.unpack_from(data, offset)
+                offset += INOTIFY_EVENT_HEADER.size
+                names.append(data[offset : offset + length].rstrip(b"\0").decode(errors="replace"))
+                offset += length
+
+    def _notify(self) -> None:
+        try:
+            self.callback()
+        except Exception as error:
+            logger.exception(f"Failed to handle changes on {self.folder}: {error}")
+
+    def _run(self) -> None:
+        fd = self._inotify_fd
+        try:
+            while not self._stop.is_set():
+                if fd is None:
+                    if not self._stop.wait(self.poll_interval):
+                        self._notify()
+                    continue
+
+                assert self._wakeup_fds is not None
+                readable, _, _ = select.select([fd, self._wakeup_fds[0]], [], [], self.poll_interval)
+                if fd not in readable or self._stop.is_set():
+                    continue
+                names = self._read_events(fd)
+                # Wait for bursts of events to settle before reacting
+                self._stop.wait(self.debounce)
+                names += self._read_events(fd)
+                # An empty name means that the event refers to the folder itself
+                if any(not name or not name.startswith(".") for name in names):
+                    self._notify()
+        finally:
+            if fd is not None:
+                os.close(fd)
+            if self._wakeup_fds is not None:
+                for wakeup_fd in self._wakeup_fds:
+                    os.close(wakeup_fd)
+            self._inotify_fd = None
+            self._wakeup_fds = None
@@ -3,13 +3,134 @@ import shutil
 import subprocess
 import time
 from ipaddress import IPv4Address, IPv4Interface, IPv4Network
-from typing import Any, List, Optional, Tuple, Union
+from threading import Lock
+from typing import Any, Dict, List, Optional, Tuple, Union
 
 import psutil
 from loguru import logger
+from pydantic import BaseModel
 
+from commonwealth.settings.files import FileIdentity, file_identity
+from commonwealth.settings.watcher import IN_MODIFY, WATCH_MASK, FolderWatcher
 
-# pylint: disable=too-many-arguments
+DHCP_SERVER_PORT = 67
+LEASES_FOLDER = pathlib.Path("/var/lib/misc")
+# Time waiting for dnsmasq to bind the DHCP socket, after that it is considered started if still running
+READY_TIMEOUT_SECONDS = 3.0
+READY_POLL_INTERVAL_SECONDS = 0.02
+
+
+class DHCPLease(BaseModel):
+    interface: str
+    mac: str
+    ip: str
+    hostname: Optional[str]
+    client_id: Optional[str]
+    # Unix time of the lease expiration, 0 for leases that never expire
+    expires: int
+
+    def is_expired(self, now: Optional[float] = None) -> bool:
+        return self.expires != 0 and self.expires < (time.time() if now is None else now)
+
+
+# pylint: disable=too-many-instance-attributes
+class DHCPLeaseTable:
+    """In memory table of the leases of a dnsmasq lease file, indexed by MAC and IP addresses.
+
+    The file is only parsed again when its identity (inode, size and modification time) changes, and only lines that
+    changed are parsed. Use watch to refresh the table when the file changes, so reading it never touches the disk.
+    """
+
+    def __init__(self, interface: str, lease_file: pathlib.Path) -> None:
+        self.interface = interface
+        self.lease_file = lease_file
+        self._identity: FileIdentity = None
+        self._lines: Dict[str, DHCPLease] = {}
+        self._by_mac: Dict[str, DHCPLease] = {}
+        self._by_ip: Dict[str, DHCPLease] = {}
+        self._lock = Lock()
+        self._watcher: Optional[FolderWatcher] = None
+
+    def _parse_line(self, line: str) -> Optional[DHCPLease]:
+        # <expiration time> <MAC address> <IP address> <hostname or *> <client id or *>
+        fields = line.split()
+        if len(fields) < 4 or fields[0] == "duid":
+            return None
+        try:
+            return DHCPLease(
+                interface=self.interface,
+                expires=int(fields[0]),
+                mac=fields[1].lower(),
+                ip=fields[2],
+                hostname=None if fields[3] == "*" else fields[3],
+                client_id=None if len(fields) < 5 or fields[4] == "*" else fields[4],
+            )
+        except ValueError as error:
+            logger.warning(f"Invalid DHCP lease entry '{line}': {error}")
+            return None
+
+    def refresh(self) -> None:
+        """Update the table with the content of the lease file, does nothing if the file did not change"""
+        with self._lock:
+            identity = file_identity(self.lease_file)
+            if identity == self._identity:
+                return
+            try:
+                lines = set(self.lease_file.read_text(encoding="utf-8").splitlines()) if identity else set()
+            except OSError as error:
+                logger.warning(f"Failed to read DHCP lease file {self.lease_file}: {error}")
+                return
+            self._identity = identity
+
+            removed = self._lines.keys() - lines
+            added = lines - self._lines.keys()
+            for line in removed:
+                lease = self._lines.pop(line)
+                if self._by_mac.get(lease.mac) is lease:
+                    del self._by_mac[lease.mac]
+                if self._by_ip.get(lease.ip) is lease:
+                    del self._by_ip[lease.ip]
+            for line in added:
+                new_lease = self._parse_line(line)
+                if new_lease is None:
+                    continue
+                self._lines[line] = new_lease
+                self._by_mac[new_lease.mac] = new_lease
+                self._by_ip[new_lease.ip] = new_lease
+
+    def watch(self, poll_interval: float = 5.0) -> None:
+        """Refresh the table every time the lease file changes"""
+        if self._watcher is not None:
+            return
+        self.lease_file.parent.mkdir(parents=True, exist_ok=True)
+        self.refresh()
+        self._watcher = FolderWatcher(self.lease_file.parent, self.refresh, poll_interval, mask=WATCH_MASK | IN_MODIFY)
+        self._watcher.start()
+
+    def stop_watching(self) -> None:
+        if self._watcher is not None:
+            self._watcher.stop()
+            self._watcher = None
+
+    def leases(self, include_expired: bool = False) -> List[DHCPLease]:
+        now = time.time()
+        # The watcher thread may be changing the table
+        with self._lock:
+            leases = list(self._by_mac.values())
+        return [lease for lease in leases if include_expired or not lease.is_expired(now)]
+
+    def by_mac(self, mac: str) -> Optional[DHCPLease]:
+        with self._lock:
+            lease = self._by_mac.get(mac.lower())
+        return lease if lease is not None and not lease.is_expired() else None
+
+    def by_ip(self, ip: str) -> Optional[DHCPLease]:
+        with self._lock:
+            lease = self._by_ip.get(ip)
+        return lease if lease is not None and not lease.is_expired() else None
+
+
+# pylint: disable=too-many-arguments,too-many-instance-attributes
 class Dnsmasq:
     def __init__(
         self,
@@ -18,8 +139,12 @@ class Dnsmasq:
         subnet_mask: Optional[IPv4Address] = None,
         lease_range: Tuple[int, int] = (101, 200),
         lease_time: str = "24h",
+        lease_file: Optional[pathlib.Path] = None,
     ) -> None:
         self._subprocess: Optional[Any] = None
+        if lease_file is None:
+            lease_file = LEASES_FOLDER.joinpath(f"dnsmasq-{interface}.leases")
+        self._lease_table = DHCPLeaseTable(interface, lease_file)
 
         if interface not in psutil.net_if_stats():
             raise ValueError(f"Interface '{interface}' not found. Available interfaces are {psutil.net_if_stats()}.")
@@ -64,11 +189,10 @@ class Dnsmasq:
         return self._binary
 
     def validate_binary(self) -> None:
+        # The binary itself is tested together with our configuration on validate_config
         if self.binary() is None:
             raise RuntimeError("Binary not available.")
 
-        subprocess.check_output([self.binary(), "--test"])
-
     def validate_config(self) -> None:
         if not (self._ipv4_lease_range[0] in self.ipv4_network and self._ipv4_lease_range[1] in self.ipv4_network):
             raise ValueError("Initial and final DHCP lease addresses must be in the gateway/subnet network.")
@@ -98,24 +222,45 @@ class Dnsmasq:
             "--no-poll",
             "--port=0",
             "--user=root",
+            f"--dhcp-leasefile={self._lease_table.lease_file}",
         ]
 
+    def _is_ready(self) -> bool:
+        assert self._subprocess is not None
+        try:
+            connections = psutil.Process(self._subprocess.pid).connections(kind="udp4")
+        except psutil.Error:
+            return False
+        return any(connection.laddr.port == DHCP_SERVER_PORT for connection in connections)
+
+    def _startup_finished(self) -> bool:
+        return not self.is_running() or self._is_ready()
+
     def start(self) -> None:
+        """Start dnsmasq and wait until it is ready to serve DHCP requests"""
         try:
             # pylint: disable=consider-using-with
             self._subprocess = subprocess.Popen(self.command_list(), shell=False, encoding="utf-8", errors="ignore")
-            time.sleep(3)
+            deadline = time.monotonic() + READY_TIMEOUT_SECONDS
+            while not self._startup_finished() and time.monotonic() < deadline:
+                time.sleep(READY_POLL_INTERVAL_SECONDS)
             if not self.is_running():
                 exit_code = self._subprocess.returncode
                 raise RuntimeError(f"Failed to initialize Dnsmasq ({exit_code}).")
+            if not self._is_ready():
+                logger.warning(f"Dnsmasq did not bind DHCP port after {READY_TIMEOUT_SECONDS} seconds.")
             logger.info("DHCP Server started.")
+            self._lease_table.watch()
         except Exception as error:
             raise RuntimeError("Unable to start DHCP Server.") from error
 
     def stop(self) -> None:
+        self._lease_table.stop_watching()
         if self.is_running():
             assert self._subprocess is not None
             self._subprocess.kill()
+            # Make sure the DHCP port is released before a possible restart
+            self._subprocess.wait()
             logger.info("DHCP Server stopped.")
         else:
             logger.info("Tried to stop DHCP Server, but it was already not running.")
@@ -139,6 +284,10 @@ class Dnsmasq:
     def ipv4_lease_range(self) -> tuple[IPv4Address, IPv4Address]:
         return self._ipv4_lease_range
 
+    @property
+    def lease_table(self) -> DHCPLeaseTable:
+        return self._lease_table
+
     @property
     def ipv4_network(self) -> IPv4Network:
         return IPv4Interface(f"{self._ipv4_gateway}/{self._subnet_mask}").network
@@ -1,4 +1,5 @@
 import json
+from contextvars import ContextVar
 from typing import Any, Callable, Coroutine, Dict, Optional
 
 from fastapi import HTTPException, Request, Response, status
@@ -6,8 +7,30 @@ from fastapi.routing import APIRoute
 from loguru import logger
 from starlette.responses import Response as StarletteResponse
 
+from commonwealth.utils import metrics
 from commonwealth.utils.logs import stack_trace_message
 
+try:
+    import orjson
+
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+# Set for each request handled by GenericErrorHandlingRoute, since responses are rendered without access to it
+pretty_json_requested: ContextVar[bool] = ContextVar("pretty_json_requested", default=False)
+
+
+def is_pretty_json_requested(request: Request) -> bool:
+    """Check if the client asked for indented JSON, with the 'pretty' query parameter or a 'pretty' Accept parameter.
+    E.g: '/endpoint?pretty=true' or 'Accept: application/json; pretty=true'
+    """
+    pretty = request.query_params.get("pretty")
+    if pretty is not None:
+        return pretty.lower() not in ("false", "0", "no")
+    accept = request.headers.get("accept", "").replace(" ", "").lower()
+    return "pretty=true" in accept or "pretty=1" in accept
+
 
 class PrettyJSONResponse(StarletteResponse):
     media_type = "application/json"
@@ -22,17 +45,35 @@ class PrettyJSONResponse(StarletteResponse):
         ).encode(self.charset)
 
 
+class CompactJSONResponse(PrettyJSONResponse):
+    """JSON response without whitespaces, serialized with orjson when available.
+    Indented output is still used when requested by the client, check is_pretty_json_requested.
+    """
+
+    def render(self, content: Any) -> bytes:
+        if pretty_json_requested.get():
+            return super().render(content)
+        if HAS_ORJSON:
+            return bytes(orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS))
+        return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode(self.charset)
+
+
 class GenericErrorHandlingRoute(APIRoute):
     def get_route_handler(self) -> Callable[[Request], Coroutine[Any, Any, Response]]:
         original_route_handler = super().get_route_handler()
 
         async def custom_route_handler(request: Request) -> Response:
+            pretty_json_requested.set(is_pretty_json_requested(request))
             try:
                 return await original_route_handler(request)
             except HTTPException as error:
                 logger.exception(error)
                 raise error
             except Exception as error:
+                # Converted to an HTTPException, so it is not seen as an exception by the metrics middleware
+                metrics.HTTP_REQUEST_EXCEPTIONS.inc(
+                    request.method, metrics.route_label(request.scope) or self.path_format
+                )
                 logger.error("Unhandled service exception.")
                 logger.exception(error)
                 error_msg = stack_trace_message(error)
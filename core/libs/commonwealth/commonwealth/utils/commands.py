@@ -1,32 +1,65 @@
 import os
+import re
 import subprocess
+import time
+import uuid
 from pathlib import Path
-from typing import List, Optional
+from threading import Lock
+from typing import Dict, List, NamedTuple, Optional
 
 from loguru import logger
 
+SSH_KEY_FILE = "/root/.config/.ssh/id_rsa"
+# Connections to the host are multiplexed over a persistent master connection, shared by all services in the
+# container, so only the first command pays for the SSH handshake.
+SSH_CONTROL_PATH = "/tmp/blueos-ssh-%C"
+SSH_CONTROL_PERSIST_SECONDS = 300
+SSH_OPTIONS = [
+    "-o",
+    "StrictHostKeyChecking=no",
+    "-o",
+    "ControlMaster=auto",
+    "-o",
+    f"ControlPath={SSH_CONTROL_PATH}",
+    "-o",
+    f"ControlPersist={SSH_CONTROL_PERSIST_SECONDS}",
+]
+
 
 class KeyNotFound(Exception):
     """Raised when the SSH key is not found."""
 
 
-def run_command_with_password(command: str, check: bool = True) -> "subprocess.CompletedProcess['str']":
-    # attempt to run the command with sshpass
-    # used as a fallback if the ssh key is not found
+class CachedHostFile(NamedTuple):
+    # inode, size and modification time of the file in the host computer
+    signature: str
+    content: str
+    validated_at: float
+
+
+# Content of files read from the host computer, validated against the file signature before being used
+_host_files: Dict[str, CachedHostFile] = {}
+_host_files_lock = Lock()
+
+
+def ssh_command_with_password(command: str) -> List[str]:
     user = os.environ.get("SSH_USER", "pi")
     password = os.environ.get("SSH_PASSWORD", "raspberry")
+    return ["sshpass", "-p", password, "ssh", *SSH_OPTIONS, f"{user}@localhost", command]
+
 
+def ssh_command_with_ssh_key(command: str) -> List[str]:
+    user = os.environ.get("SSH_USER", "pi")
+    if not Path(SSH_KEY_FILE).exists():
+        raise KeyNotFound
+    return ["sshpass", "ssh", "-i", SSH_KEY_FILE, *SSH_OPTIONS, f"{user}@localhost", command]
+
+
+def run_command_with_password(command: str, check: bool = True) -> "subprocess.CompletedProcess['str']":
+    # attempt to run the command with sshpass
+    # used as a fallback if the ssh key is not found
     return subprocess.run(
-        [
-            "sshpass",
-            "-p",
-            password,
-            "ssh",
-            "-o",
-            "StrictHostKeyChecking=no",
-            f"{user}@localhost",
-            command,
-        ],
+        ssh_command_with_password(command),
         check=check,
         text=True,
         stdout=subprocess.PIPE,
@@ -36,22 +69,8 @@ def run_command_with_password(command: str, check: bool = True) -> "subprocess.C
 
 def run_command_with_ssh_key(command: str, check: bool = True) -> "subprocess.CompletedProcess['str']":
     # attempt to run the command with the ssh key
-    user = os.environ.get("SSH_USER", "pi")
-    id_file = "/root/.config/.ssh/id_rsa"
-    if not Path(id_file).exists():
-        raise KeyNotFound
-
     return subprocess.run(
-        [
-            "sshpass",
-            "ssh",
-            "-i",
-            id_file,
-            "-o",
-            "StrictHostKeyChecking=no",
-            f"{user}@localhost",
-            command,
-        ],
+        ssh_command_with_ssh_key(command),
         check=check,
         text=True,
         stdout=subprocess.PIPE,
@@ -59,25 +78,78 @@ def run_command_with_ssh_key(command: str, check: bool = True) -> "subprocess.Co
     )
 
 
-def run_command(command: str, check: bool = True, log_output: bool = True) -> "subprocess.CompletedProcess['str']":
-    # runs the given command on the host computer.
+def _run_on_host(command: str, check: bool, description: str) -> "subprocess.CompletedProcess['str']":
     # we first try with the ssh key, which is the default behavior.
     # we need to fallback to sshpass as some systems will try to call this function before the ssh key is generated.
     # this is the case for the first boot of this image after updating.
     # not including the sshpass step causes blueos_startup_update to fail hard. crashing BlueOS as a whole.
     try:
-        ret = run_command_with_ssh_key(command, check)
+        return run_command_with_ssh_key(command, check)
     except Exception as error:
-        logger.warning(f"Failed to run command with SSH key. {error}, trying with sshpass:\n{command}")
-        ret = run_command_with_password(command, check)
-    logger.info(f"Host: '{command}' : returned {ret.returncode}")
+        logger.warning(f"Failed to run command with SSH key. {error}, trying with sshpass:\n{description}")
+        return run_command_with_password(command, check)
+
+
+def run_command(command: str, check: bool = True, log_output: bool = True) -> "subprocess.CompletedProcess['str']":
+    # runs the given command on the host computer.
+    ret = _run_on_host(command, check, command)
+    _log_command_result(ret, log_output)
+    return ret
+
+
+def _log_command_result(ret: "subprocess.CompletedProcess['str']", log_output: bool) -> None:
+    logger.info(f"Host: '{ret.args[-1]}' : returned {ret.returncode}")
     if not log_output:
-        return ret
+        return
     if ret.stdout:
         logger.info(f"stdout: {ret.stdout}")
     if ret.stderr:
         logger.error(f"stderr: {ret.stderr}")
-    return ret
+
+
+def _batch_script(commands: List[str], marker: str) -> str:
+    # every command runs in its own subshell, followed by a marker with its return code in stdout and a marker in
+    # stderr, so the output of each command can be split apart afterwards.
+    return "\n".join(
+        f"(\n{command}\n)\nprintf '\\n{marker} %d\\n' $?\nprintf '\\n{marker}\\n' >&2" for command in commands
+    )
+
+
+def _split_batch_result(
+    ret: "subprocess.CompletedProcess['str']", commands: List[str], marker: str
+) -> Optional[List["subprocess.CompletedProcess['str']"]]:
+    stdout_parts = re.split(f"\n{marker} (\\d+)\n", ret.stdout)
+    stderr_parts = ret.stderr.split(f"\n{marker}\n")
+    if len(stdout_parts) != 2 * len(commands) + 1 or len(stderr_parts) != len(commands) + 1:
+        return None
+    return [
+        subprocess.CompletedProcess(
+            [*ret.args[:-1], command], int(stdout_parts[2 * i + 1]), stdout_parts[2 * i], stderr_parts[i]
+        )
+        for i, command in enumerate(commands)
+    ]
+
+
+def run_commands(
+    commands: List[str], check: bool = True, log_output: bool = True
+) -> List["subprocess.CompletedProcess['str']"]:
+    # runs all the given commands on the host computer, in order, using a single SSH session.
+    # returns one result per command, as if each one had been called with run_command.
+    if not commands:
+        return []
+    marker = f"blueos-batch-{uuid.uuid4().hex}"
+    # the generated script is not logged, only each of the commands
+    batch_result = _run_on_host(_batch_script(commands, marker), False, f"batch of {len(commands)} commands")
+    results = _split_batch_result(batch_result, commands, marker)
+    if results is None:
+        # the batch itself failed (e.g: connection problems), run each command on its own
+        logger.warning("Failed to run batch of commands on host, running them one by one.")
+        return [run_command(command, check, log_output) for command in commands]
+    for ret in results:
+        _log_command_result(ret, log_output)
+        if check:
+            ret.check_returncode()
+    return results
 
 
 def upload_file_with_password(
@@ -94,8 +166,7 @@ def upload_file_with_password(
             "-p",
             password,
             "scp",
-            "-o",
-            "StrictHostKeyChecking=no",
+            *SSH_OPTIONS,
             source,
             f"{user}@localhost:{destination}",
         ],
@@ -109,17 +180,15 @@ def upload_file_with_password(
 def upload_file_with_ssh_key(source: str, destination: str, check: bool = True) -> "subprocess.CompletedProcess['str']":
     # attempt to upload the file with the ssh key
     user = os.environ.get("SSH_USER", "pi")
-    id_file = "/root/.config/.ssh/id_rsa"
-    if not Path(id_file).exists():
+    if not Path(SSH_KEY_FILE).exists():
         raise KeyNotFound
 
     return subprocess.run(
         [
             "scp",
             "-i",
-            id_file,
-            "-o",
-            "StrictHostKeyChecking=no",
+            SSH_KEY_FILE,
+            *SSH_OPTIONS,
             source,
             f"{user}@localhost:{destination}",
         ],
@@ -130,9 +199,50 @@ def upload_file_with_ssh_key(source: str, destination: str, check: bool = True)
     )
 
 
-def load_file(file_name: str) -> str:
-    command = f'cat "{file_name}"'
-    return run_command(command, False).stdout
+def _cached_host_file(file_name: str) -> Optional[CachedHostFile]:
+    with _host_files_lock:
+        return _host_files.get(file_name)
+
+
+def _load_file_command(file_name: str, cached: Optional[CachedHostFile]) -> str:
+    # print the file signature and only transfer its content when it differs from the cached one
+    signature = cached.signature if cached else ""
+    return (
+        f"signature=$(stat -c '%i %s %y' \"{file_name}\" 2>/dev/null); printf '%s\\n' \"$signature\"; "
+        f'[ -n "$signature" ] && [ "$signature" != \'{signature}\' ] && cat "{file_name}"'
+    )
+
+
+def _update_cached_host_file(file_name: str, cached: Optional[CachedHostFile], output: str) -> str:
+    signature, _, content = output.partition("\n")
+    if not signature:
+        invalidate_host_file(file_name)
+        return ""
+    if cached is not None and signature == cached.signature:
+        content = cached.content
+    with _host_files_lock:
+        _host_files[file_name] = CachedHostFile(signature, content, time.monotonic())
+    return content
+
+
+def invalidate_host_file(file_name: Optional[str] = None) -> None:
+    # forget the cached content of a host file, or of all of them if no file is given
+    with _host_files_lock:
+        if file_name is None:
+            _host_files.clear()
+        else:
+            _host_files.pop(file_name, None)
+
+
+def load_file(file_name: str, max_age: float = 0.0) -> str:
+    # content of a file in the host computer.
+    # the content is cached and only transferred again when the file changes in the host, if the cached content was
+    # validated less than max_age seconds ago it is returned without even checking the host.
+    cached = _cached_host_file(file_name)
+    if cached is not None and time.monotonic() - cached.validated_at < max_age:
+        return cached.content
+    output = run_command(_load_file_command(file_name, cached), False, log_output=False).stdout
+    return _update_cached_host_file(file_name, cached, output)
 
 
 def upload_file(file_content: str, destination: str, check: bool = True) -> "subprocess.CompletedProcess['str']":
@@ -151,6 +261,7 @@ def upload_file(file_content: str, destination: str, check: bool = True) -> "sub
         run_command(f"sudo mv {temp_file_in_host} {destination}")
     else:
         logger.error(f"Failed to upload file: {ret.stderr}")
+    invalidate_host_file(destination)
     return ret
 
 
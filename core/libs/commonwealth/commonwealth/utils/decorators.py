@@ -1,38 +1,200 @@
+import asyncio
 import time
+from collections import OrderedDict
 from functools import wraps
-from threading import Lock
-from typing import Any, Callable, Dict
+from threading import Event, Lock, Thread
+from typing import Any, Callable, Dict, Hashable, NamedTuple, Set, Tuple
 
 
-def temporary_cache(timeout_seconds: float = 10) -> Callable[[Callable[[Any], Any]], Any]:
+class CacheInfo(NamedTuple):
+    hits: int
+    stale_hits: int
+    misses: int
+    max_size: int
+    current_size: int
+
+
+class _CacheEntry(NamedTuple):
+    value: Any
+    sample_time: float
+
+
+_KWARGS_MARK = object()
+
+
+def _cache_key(args: Tuple[Any, ...], kwargs: Dict[str, Any]) -> Hashable:
+    if not kwargs:
+        return args
+    return (*args, _KWARGS_MARK, *sorted(kwargs.items()))
+
+
+# pylint: disable=too-many-statements,too-many-locals
+def temporary_cache(
+    timeout_seconds: float = 10, max_size: int = 128, stale_while_revalidate: float = 0
+) -> Callable[[Callable[..., Any]], Any]:
     """Decorator that creates a cache for specific inputs with a configured timeout in seconds.
+    Works with both functions and coroutines, the cache is thread-safe and only one computation runs at a time
+    for each input, concurrent callers wait for it and share the result. If the caller running a coroutine
+    computation is cancelled, the ones waiting for it compute it again.
 
     Args:
         timeout_seconds (float, optional): Timeout to be used for cache invalidation. Defaults to 10.
+        max_size (int, optional): Maximum number of inputs cached, least recently used are evicted. Defaults to 128.
+        stale_while_revalidate (float, optional): For how long after the timeout an expired value can still be
+            returned while a new one is computed in background. Defaults to 0.
 
     Returns:
         Any: Return of the decorated function
     """
-    cache: Dict[Any, Any] = {}
-    last_sample_time: Dict[Any, float] = {}
+    if max_size <= 0:
+        raise ValueError("Cache size should be greater than zero.")
 
-    def inner_function(function: Callable[[Any], Any]) -> Any:
-        @wraps(function)
-        def wrapper(*args: Any) -> Any:
-            nonlocal last_sample_time
-            current_time = time.time()
-            cache_is_valid = args in last_sample_time and current_time - last_sample_time[args] < timeout_seconds
-
-            # The cache is still valid and we can return the value if exists
-            if cache_is_valid and args in cache:
-                return cache[args]
+    def inner_function(function: Callable[..., Any]) -> Any:
+        cache: "OrderedDict[Hashable, _CacheEntry]" = OrderedDict()
+        lock = Lock()
+        statistics = {"hits": 0, "stale_hits": 0, "misses": 0}
+        # Keep a reference to the background revalidations, otherwise they could be garbage collected
+        revalidations: Set[Any] = set()
+
+        def store(key: Hashable, value: Any) -> None:
+            with lock:
+                cache[key] = _CacheEntry(value, time.monotonic())
+                cache.move_to_end(key)
+                while len(cache) > max_size:
+                    cache.popitem(last=False)
+
+        def lookup(key: Hashable) -> Tuple[bool, bool, Any]:
+            """Return if there is a usable value in cache, if it needs to be revalidated and the value itself.
+            Should be called with the lock acquired."""
+            entry = cache.get(key)
+            if entry is None:
+                return False, False, None
+            age = time.monotonic() - entry.sample_time
+            if age < timeout_seconds:
+                statistics["hits"] += 1
+                cache.move_to_end(key)
+                return True, False, entry.value
+            if age < timeout_seconds + stale_while_revalidate:
+                statistics["stale_hits"] += 1
+                cache.move_to_end(key)
+                return True, True, entry.value
+            return False, False, None
+
+        def cache_info() -> CacheInfo:
+            with lock:
+                return CacheInfo(max_size=max_size, current_size=len(cache), **statistics)
+
+        def cache_clear() -> None:
+            with lock:
+                cache.clear()
+                for key in statistics:
+                    statistics[key] = 0
+
+        if asyncio.iscoroutinefunction(function):
+            in_flight_tasks: Dict[Hashable, "asyncio.Future[Any]"] = {}
+
+            async def compute(key: Hashable, args: Tuple[Any, ...], kwargs: Dict[str, Any]) -> Any:
+                future: "asyncio.Future[Any]" = asyncio.get_running_loop().create_future()
+                in_flight_tasks[key] = future
+                try:
+                    value = await function(*args, **kwargs)
+                    store(key, value)
+                    future.set_result(value)
+                    return value
+                except asyncio.CancelledError:
+                    # Waiting callers were not cancelled, they will compute it again
+                    future.cancel()
+                    raise
+                except Exception as error:
+                    future.set_exception(error)
+                    # Mark the exception as retrieved, since it may not have anyone else waiting for it
+                    future.exception()
+                    raise
+                finally:
+                    in_flight_tasks.pop(key, None)
+
+            async def revalidate(key: Hashable, args: Tuple[Any, ...], kwargs: Dict[str, Any]) -> None:
+                try:
+                    await compute(key, args, kwargs)
+                except Exception:
+                    # Stale value will be used until it expires, the caller will get the error then
+                    pass
+
+            @wraps(function)
+            async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+                key = _cache_key(args, kwargs)
+                with lock:
+                    found, should_revalidate, value = lookup(key)
+                    if not found:
+                        statistics["misses"] += 1
+
+                if found:
+                    if should_revalidate and key not in in_flight_tasks:
+                        task = asyncio.create_task(revalidate(key, args, kwargs))
+                        revalidations.add(task)
+                        task.add_done_callback(revalidations.discard)
+                    return value
+
+                while key in in_flight_tasks:
+                    in_flight = in_flight_tasks[key]
+                    try:
+                        return await asyncio.shield(in_flight)
+                    except asyncio.CancelledError:
+                        current_task = asyncio.current_task()
+                        # Only give up if we were cancelled, not the caller computing it
+                        if not in_flight.cancelled() or (current_task is not None and current_task.cancelling()):
+                            raise
+                return await compute(key, args, kwargs)
+
+            async_wrapper.cache_info = cache_info  # type: ignore
+            async_wrapper.cache_clear = cache_clear  # type: ignore
+            return async_wrapper
+
+        in_flight_events: Dict[Hashable, Event] = {}
+
+        def compute_sync(key: Hashable, args: Tuple[Any, ...], kwargs: Dict[str, Any]) -> Any:
+            try:
+                value = function(*args, **kwargs)
+                store(key, value)
+                return value
+            finally:
+                with lock:
+                    in_flight_events.pop(key).set()
 
-            # The cache is invalid or argument does not exist in cache, update it!
-            last_sample_time[args] = current_time
-            function_return = function(*args)
-            cache[args] = function_return
-            return function_return
+        def revalidate_sync(key: Hashable, args: Tuple[Any, ...], kwargs: Dict[str, Any]) -> None:
+            try:
+                compute_sync(key, args, kwargs)
+            except Exception:
+                # Stale value will be used until it expires, the caller will get the error then
+                pass
 
+        @wraps(function)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            key = _cache_key(args, kwargs)
+            while True:
+                with lock:
+                    found, should_revalidate, value = lookup(key)
+                    if found:
+                        if should_revalidate and key not in in_flight_events:
+                            in_flight_events[key] = Event()
+                            thread = Thread(target=revalidate_sync, args=(key, args, kwargs), daemon=True)
+                            thread.start()
+                        return value
+
+                    in_flight = in_flight_events.get(key)
+                    if in_flight is None:
+                        statistics["misses"] += 1
+                        in_flight_events[key] = Event()
+                        break
+
+                # Someone else is already computing it, wait and check the cache again.
+                # If the computation failed, this caller will try it by itself.
+                in_flight.wait()
+
+            return compute_sync(key, args, kwargs)
+
+        wrapper.cache_info = cache_info  # type: ignore
+        wrapper.cache_clear = cache_clear  # type: ignore
         return wrapper
 
     return inner_function
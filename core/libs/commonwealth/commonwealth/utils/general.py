@@ -1,9 +1,12 @@
+import math
 import os
+import platform
 import subprocess
 import uuid
 from enum import Enum
 from functools import cache
 from pathlib import Path
+from typing import Literal, Optional, Set, Tuple
 
 import psutil
 from loguru import logger
@@ -24,49 +27,139 @@ class HostOs(str, Enum):
     Other = "Other"
 
 
+# ELF e_machine values, named like pyelftools' get_machine_arch
+ELF_MACHINE_ARCHS = {0x03: "x86", 0x28: "ARM", 0x3E: "x64", 0xB7: "AArch64"}
+
+
 @cache
 def blueos_version() -> str:
     return os.environ.get("GIT_DESCRIBE_TAGS", "null")
 
 
+# Host facts below do not change while the process is running, so they are computed only once
+
+
+@cache
+def get_cpu_model() -> str:
+    # model of the board as reported by the kernel, e.g: "Raspberry Pi 5 Model B Rev 1.0"
+    try:
+        with open("/proc/cpuinfo", "r", encoding="utf-8") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if key.strip() == "Model":
+                    return value.strip()
+    except OSError as error:
+        logger.warning(f"Failed to read cpu information, {error}")
+    return ""
+
+
+@cache
+def get_machine_arch() -> str:
+    # kernel architecture, e.g: "aarch64"
+    return platform.machine()
+
+
 @cache
+def get_userland_arch() -> str:
+    # architecture of the userland binaries, that can differ from the kernel one (e.g: 64-bit kernel on 32-bit
+    # userland), checked from the ELF header of /usr/bin/ls. e.g: "AArch64" or "ARM"
+    try:
+        with open("/usr/bin/ls", "rb") as f:
+            header = f.read(20)
+    except OSError as error:
+        logger.warning(f"Failed to check userland architecture, {error}")
+        return ""
+    if len(header) < 20 or header[:4] != b"\x7fELF":
+        return ""
+    byteorder: Literal["little", "big"] = "little" if header[5] == 1 else "big"
+    return ELF_MACHINE_ARCHS.get(int.from_bytes(header[18:20], byteorder), "")
+
+
+def get_host_os_release() -> str:
+    # content of /etc/os-release of the host computer, it only changes on upgrades, that reboot the host.
+    # failed reads are not cached by load_file, so the host is checked again on the next call
+    os_release = load_file("/etc/os-release", max_age=math.inf)
+    if not os_release:
+        logger.warning("Failed to read host's os-release.")
+    return os_release
+
+
 def get_cpu_type() -> CpuType:
-    with open("/proc/cpuinfo", "r", encoding="utf-8") as f:
-        for line in f:
-            if "Raspberry Pi 4" in line:
-                return CpuType.PI4
-            if "Raspberry Pi 5" in line:
-                return CpuType.PI5
+    model = get_cpu_model()
+    if "Raspberry Pi 4" in model:
+        return CpuType.PI4
+    if "Raspberry Pi 5" in model:
+        return CpuType.PI5
     return CpuType.Other
 
 
-@cache
 def get_host_os() -> HostOs:
-    os_release = load_file("/etc/os-release")
-    if "bookworm" in os_release.lower():
+    os_release = get_host_os_release().lower()
+    if "bookworm" in os_release:
         return HostOs.Bookworm
-    if "bullseye" in os_release.lower():
+    if "bullseye" in os_release:
         return HostOs.Bullseye
     return HostOs.Other
 
 
-def delete_everything(path: Path) -> None:
-    if path.is_file() and not file_is_open(path):
+def delete_everything(path: Path, open_files: Optional[Set[Tuple[int, int]]] = None) -> None:
+    # Check all open files once, instead of once per file
+    if open_files is None:
+        open_files = open_files_snapshot()
+
+    if path.is_file() and not file_is_open(path, open_files):
         path.unlink()
         return
 
     for item in path.glob("*"):
         try:
-            if item.is_file() and not file_is_open(item):
+            if item.is_file() and not file_is_open(item, open_files):
                 item.unlink()
             if item.is_dir() and not item.is_symlink():
                 # Delete folder contents
-                delete_everything(item)
+                delete_everything(item, open_files)
         except Exception as exception:
             logger.warning(f"Failed to delete: {item}, {exception}")
 
 
-def file_is_open(path: Path) -> bool:
+def open_files_snapshot() -> Optional[Set[Tuple[int, int]]]:
+    # device and inode of all files currently opened by any process, based on /proc/*/fd.
+    # returns None if /proc is not available.
+    open_files: Set[Tuple[int, int]] = set()
+    try:
+        processes = [entry.path for entry in os.scandir("/proc") if entry.name.isdigit()]
+    except OSError as error:
+        logger.warning(f"Failed to list processes, {error}")
+        return None
+
+    for process in processes:
+        try:
+            with os.scandir(f"{process}/fd") as file_descriptors:
+                for file_descriptor in file_descriptors:
+                    try:
+                        stat = os.stat(file_descriptor.path)
+                    except OSError:
+                        # File descriptor was closed in the meantime
+                        continue
+                    open_files.add((stat.st_dev, stat.st_ino))
+        except OSError:
+            # Process is gone or we are not allowed to check it
+            continue
+    return open_files
+
+
+def file_is_open(path: Path, open_files: Optional[Set[Tuple[int, int]]] = None) -> bool:
+    # open_files can be a snapshot from open_files_snapshot, to avoid scanning all processes when checking many files.
+    # lsof is used if /proc is not available.
+    if open_files is None:
+        open_files = open_files_snapshot()
+    if open_files is not None:
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            return False
+        return (stat.st_dev, stat.st_ino) in open_files
+
     try:
         kernel_functions_timeout = str(2)
         result = subprocess.run(
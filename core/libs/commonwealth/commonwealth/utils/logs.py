@@ -1,12 +1,33 @@
+import gzip
 import logging
+import queue
+import shutil
+import threading
+import time
 from datetime import datetime, timezone
 from logging import LogRecord
 from pathlib import Path
 from types import FrameType
-from typing import Any, Optional, TextIO, Union
+from typing import Any, Dict, List, Mapping, Optional, TextIO, Tuple, Union
 
 from loguru import logger
 
+from commonwealth.utils.metrics import LOG_RECORDS_DROPPED
+
+# Same as loguru's default format, used when the format needs to be built dynamically
+LOG_FORMAT = (
+    "<green>{time:YYYY-MM-DD HH:mm:ss.SSS}</green> | <level>{level: <8}</level> | "
+    "<cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - <level>{message}</level>"
+)
+LOG_ROTATION_SIZE = 10 * 2**20
+LOG_QUEUE_SIZE = 10000
+LOG_BATCH_SIZE = 1000
+# Maximum number of times the same message can be logged per period, warnings and errors are never limited
+LOG_RATE_LIMIT = 100
+LOG_RATE_LIMIT_PERIOD_SECONDS = 10.0
+# Extra field of the records that report suppressed repeats, they are not limited themselves
+LOG_RATE_LIMIT_SUMMARY = "rate_limit_summary"
+
 
 class LogRotator:
     def __init__(self, period_seconds: int):
@@ -59,9 +80,151 @@ def get_new_log_path(service_name: str) -> Path:
     return service_log_folder.joinpath(f"logfile_{datetime_now}.log")
 
 
-def init_logger(service_name: str) -> None:
+class LogRateLimiter:
+    """Loguru filter that limits how many times the same message can be logged per period.
+
+    Repeated messages are identified by the place that logs them (module, function and line), so a chatty path does
+    not hide the records of others. Records with warning level or above are never limited. When the period of a
+    message with suppressed records ends, a record with the number of suppressed repeats is logged.
+    """
+
+    def __init__(
+        self, max_records: int = LOG_RATE_LIMIT, period_seconds: float = LOG_RATE_LIMIT_PERIOD_SECONDS
+    ) -> None:
+        self.max_records = max_records
+        self.period_seconds = period_seconds
+        self.dropped = 0
+        # Start of the current period, records logged and records suppressed in it, by module, function and line
+        self._periods: Dict[Tuple[str, str, int], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, record: Mapping[str, Any]) -> bool:
+        if record["level"].no >= logging.WARNING or record["extra"].get(LOG_RATE_LIMIT_SUMMARY):
+            return True
+
+        key = (record["name"], record["function"], record["line"])
+        now = time.monotonic()
+        with self._lock:
+            period = self._periods.get(key)
+            if period is None or now - period[0] >= self.period_seconds:
+                self._periods[key] = [now, 1, 0]
+                return True
+            if period[1] < self.max_records:
+                period[1] += 1
+                return True
+            if not period[2]:
+                timer = threading.Timer(period[0] + self.period_seconds - now, self._report_suppressed, (key, period))
+                timer.daemon = True
+                timer.start()
+            period[2] += 1
+            self.dropped += 1
+        LOG_RECORDS_DROPPED.inc("rate_limit")
+        return False
+
+    def _report_suppressed(self, key: Tuple[str, str, int], period: List[float]) -> None:
+        with self._lock:
+            # Records after the end of the period start a new one, so this count does not change anymore
+            suppressed = int(period[2])
+            if self._periods.get(key) is period:
+                del self._periods[key]
+        name, function, line = key
+        logger.bind(**{LOG_RATE_LIMIT_SUMMARY: True}).info(
+            f"Suppressed {suppressed} repeats of {name}:{function}:{line} in the last {self.period_seconds:g} seconds"
+        )
+
+
+class BackgroundFileSink:
+    """Loguru sink that never blocks the caller on disk writes.
+
+    Messages are added to a bounded queue and written in batches by a background thread, messages that do not fit in
+    the queue are dropped and counted. Once the log file gets bigger than rotation_size, a new one is started and the
+    previous one is compressed.
+    """
+
+    def __init__(
+        self, service_name: str, rotation_size: int = LOG_ROTATION_SIZE, max_queue_size: int = LOG_QUEUE_SIZE
+    ) -> None:
+        self.service_name = service_name
+        self.rotation_size = rotation_size
+        self.dropped = 0
+        self.path = get_new_log_path(service_name)
+        self._file = open(self.path, "a", encoding="utf-8")  # pylint: disable=consider-using-with
+        self._queue: "queue.Queue[Optional[str]]" = queue.Queue(max_queue_size)
+        self._thread = threading.Thread(target=self._run, name=f"{service_name}-logs", daemon=True)
+        self._thread.start()
+
+    def write(self, message: str) -> None:
+        try:
+            self._queue.put_nowait(message)
+        except queue.Full:
+            self.dropped += 1
+            LOG_RECORDS_DROPPED.inc("queue_full")
+
+    def stop(self) -> None:
+        """Write pending messages and stop the background thread"""
+        if not self._thread.is_alive():
+            return
+        self._queue.put(None)
+        self._thread.join()
+
+    def _rotate(self) -> None:
+        self._file.close()
+        old_path = self.path
+        self.path = get_new_log_path(self.service_name)
+        if self.path == old_path:
+            # Rotating twice in the same second
+            self.path = self.path.with_name(f"{self.path.stem}_{time.monotonic_ns()}{self.path.suffix}")
+        self._file = open(self.path, "a", encoding="utf-8")  # pylint: disable=consider-using-with
+        try:
+            with open(old_path, "rb") as source, gzip.open(f"{old_path}.gz", "wb") as destination:
+                shutil.copyfileobj(source, destination)
+            old_path.unlink()
+        except Exception as error:
+            print(f"Error: unable to compress log file {old_path}: {error}")
+
+    def _run(self) -> None:
+        running = True
+        while running:
+            batch: List[str] = []
+            message = self._queue.get()
+            while message is not None:
+                batch.append(message)
+                if len(batch) >= LOG_BATCH_SIZE:
+                    break
+                try:
+                    message = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            running = message is not None
+
+            try:
+                self._file.write("".join(batch))
+                self._file.flush()
+                if self._file.tell() > self.rotation_size:
+                    self._rotate()
+            except Exception as error:
+                self.dropped += len(batch)
+                LOG_RECORDS_DROPPED.inc("write_error", amount=len(batch))
+                print(f"Error: unable to write logs to {self.path}: {error}")
+        self._file.close()
+
+
+def init_logger(service_name: str, background: bool = True, rate_limit: Optional[int] = LOG_RATE_LIMIT) -> None:
+    """Add a file sink for the service logs.
+
+    Args:
+        service_name (str): Name of the service, used for the log folder
+        background (bool): Write logs from a background thread, compressing rotated files. If False, logs are written
+            synchronously by the thread that logs the record.
+        rate_limit (Optional[int]): Maximum number of times the same message can be logged per
+            LOG_RATE_LIMIT_PERIOD_SECONDS seconds, None disables the limit.
+    """
     try:
-        logger.add(get_new_log_path(service_name), rotation="10 MB")
+        rate_limiter: Dict[str, Any] = {"filter": LogRateLimiter(rate_limit)} if rate_limit is not None else {}
+        if not background:
+            logger.add(get_new_log_path(service_name), rotation="10 MB", compression="gz", **rate_limiter)
+            return
+        logger.add(BackgroundFileSink(service_name), colorize=False, **rate_limiter)
     except Exception as e:
         print(f"Error: unable to set logging path: {e}")
 
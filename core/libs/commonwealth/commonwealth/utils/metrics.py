@@ -0,0 +1,224 @@
+import bisect
+import math
+import time
+from threading import Lock
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Prometheus text exposition format
+METRICS_MEDIA_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+LATENCY_BUCKETS_SECONDS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS_BYTES = (100, 1000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    escaped = [value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for value in values]
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(names, escaped)) + "}"
+
+
+class Metric:
+    """Base class of metrics, with one value (or set of values) for each combination of label values."""
+
+    metric_type = ""
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._lock = Lock()
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.metric_type}"]
+        return "\n".join(lines + self.samples())
+
+
+class Counter(Metric):
+    metric_type = "counter"
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()) -> None:
+        super().__init__(name, documentation, label_names)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *label_values: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def value(self, *label_values: str) -> float:
+        return self._values.get(label_values, 0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.label_names, labels)} {_format_value(value)}" for labels, value in values
+        ]
+
+
+class Gauge(Counter):
+    metric_type = "gauge"
+
+    def dec(self, *label_values: str, amount: float = 1) -> None:
+        self.inc(*label_values, amount=-amount)
+
+
+class Histogram(Metric):
+    metric_type = "histogram"
+
+    def __init__(
+        self, name: str, documentation: str, label_names: Sequence[str] = (), buckets: Sequence[float] = ()
+    ) -> None:
+        super().__init__(name, documentation, label_names)
+        self.buckets = tuple(sorted(float(bucket) for bucket in buckets)) + (math.inf,)
+        # Observations per bucket (not cumulative), sum and count for each combination of label values
+        self._values: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, *label_values: str) -> None:
+        with self._lock:
+            if label_values not in self._values:
+                self._values[label_values] = ([0] * len(self.buckets), [0.0])
+            bucket_counts, total = self._values[label_values]
+            bucket_counts[bisect.bisect_left(self.buckets, value)] += 1
+            total[0] += value
+
+    def count(self, *label_values: str) -> int:
+        values = self._values.get(label_values)
+        return sum(values[0]) if values else 0
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = sorted((labels, (list(counts), total[0])) for labels, (counts, total) in self._values.items())
+        lines = []
+        for labels, (bucket_counts, total) in values:
+            cumulative = 0
+            for bucket, bucket_count in zip(self.buckets, bucket_counts):
+                cumulative += bucket_count
+                bucket_labels = _format_labels((*self.label_names, "le"), (*labels, _format_value(bucket)))
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            formatted_labels = _format_labels(self.label_names, labels)
+            lines.append(f"{self.name}_sum{formatted_labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{formatted_labels} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        self._metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered.")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        return "\n".join(metric.render() for metric in self._metrics.values()) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+HTTP_REQUESTS = Counter("http_requests_total", "Number of handled requests.", ("method", "route", "status"))
+HTTP_REQUEST_EXCEPTIONS = Counter(
+    "http_request_exceptions_total", "Number of requests that raised an exception.", ("method", "route")
+)
+# Route is only known once the request is routed, so requests in flight are only labeled by method
+HTTP_REQUESTS_IN_FLIGHT = Gauge("http_requests_in_flight", "Number of requests being handled.", ("method",))
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "Time spent handling requests.", ("method", "route"), LATENCY_BUCKETS_SECONDS
+)
+HTTP_RESPONSE_SIZE = Histogram(
+    "http_response_size_bytes", "Size of response bodies.", ("method", "route"), SIZE_BUCKETS_BYTES
+)
+# Log records that were not written to the service log file, by reason (rate_limit, queue_full or write_error)
+LOG_RECORDS_DROPPED = Counter("log_records_dropped_total", "Number of log records that were not written.", ("reason",))
+for _metric in (
+    HTTP_REQUESTS,
+    HTTP_REQUEST_EXCEPTIONS,
+    HTTP_REQUESTS_IN_FLIGHT,
+    HTTP_REQUEST_DURATION,
+    HTTP_RESPONSE_SIZE,
+    LOG_RECORDS_DROPPED,
+):
+    REGISTRY.register(_metric)
+
+
+async def metrics_endpoint(_request: Request) -> Response:
+    """Expose all metrics of the service in Prometheus text format."""
+    return Response(REGISTRY.render(), media_type=METRICS_MEDIA_TYPE)
+
+
+def route_label(scope: Scope) -> Optional[str]:
+    """Path template of the route that handled the request, including the prefix of mounted applications
+    (e.g: /v1.0/items/{item_id}). None if the request did not reach a route."""
+    path_format = getattr(scope.get("route"), "path_format", None)
+    if path_format is None:
+        return None
+    root_path = scope.get("root_path", "")
+    mount_prefix = root_path[len(scope.get("app_root_path", root_path)) :]
+    return f"{mount_prefix}{path_format}"
+
+
+class MetricsMiddleware:
+    """ASGI middleware that records latency, status and response size of the requests handled by each route.
+
+    It wraps the final application, so routes of mounted applications (e.g: versioned APIs) are measured too.
+    Requests that do not reach a route (e.g: not found or static files) are only counted while in flight.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_code = 500
+        size = 0
+
+        async def send_and_measure(message: Message) -> None:
+            nonlocal status_code, size
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        HTTP_REQUESTS_IN_FLIGHT.inc(method)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_and_measure)
+        except Exception:
+            route = route_label(scope)
+            if route is not None:
+                HTTP_REQUEST_EXCEPTIONS.inc(method, route)
+            raise
+        finally:
+            HTTP_REQUESTS_IN_FLIGHT.dec(method)
+            route = route_label(scope)
+            if route is not None:
+                HTTP_REQUEST_DURATION.observe(time.perf_counter() - start, method, route)
+                HTTP_RESPONSE_SIZE.observe(size, method, route)
+                HTTP_REQUESTS.inc(method, route, str(status_code))
+
+
+def add_metrics_route(app: Starlette) -> None:
+    """Add the /metrics endpoint and the middleware that measures every request to the application.
+    It should be the final application (e.g: after versioning)."""
+    app.add_route("/metrics", metrics_endpoint, include_in_schema=False)
+    app.add_middleware(MetricsMiddleware)
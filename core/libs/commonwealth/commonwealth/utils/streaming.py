@@ -1,13 +1,45 @@
 import asyncio
 import base64
 import json
+import struct
 from dataclasses import asdict, dataclass
-from typing import AsyncGenerator, Optional, Tuple
+from enum import Enum
+from typing import AsyncGenerator, Optional, Set, Tuple
 
 from fastapi import status
 
 from commonwealth.utils.apis import StackedHTTPException
 
+# Maximum number of encoded fragments waiting to be sent, a slow client will slow down the generator
+STREAM_QUEUE_SIZE = 32
+
+# Generators still running after their clients went away (detached or being cancelled), referenced until they are done
+DETACHED_STREAM_TASKS: Set["asyncio.Task[None]"] = set()
+
+# Binary frames are a fixed size header followed by the raw payload, both fragment and status follow the same
+# semantics of the JSON format. For errors the payload is the error message encoded in utf-8.
+BINARY_STREAM_MEDIA_TYPE = "application/vnd.blueos.stream"
+# fragment (int32), status (uint16), payload length (uint32), all in network order
+BINARY_FRAME_HEADER = struct.Struct("!iHI")
+
+
+class StreamFormat(str, Enum):
+    JSON = "json"
+    BINARY = "binary"
+
+
+def negotiate_stream_format(accept: Optional[str]) -> StreamFormat:
+    """Binary format is only used when requested by the client, using the Accept header."""
+    if accept and BINARY_STREAM_MEDIA_TYPE in accept:
+        return StreamFormat.BINARY
+    return StreamFormat.JSON
+
+
+def stream_media_type(stream_format: StreamFormat, json_media_type: Optional[str] = None) -> Optional[str]:
+    if stream_format == StreamFormat.BINARY:
+        return BINARY_STREAM_MEDIA_TYPE
+    return json_media_type
+
 
 @dataclass
 class StreamingResponse:
@@ -21,68 +53,116 @@ def response_line(response: StreamingResponse) -> str:
     return json.dumps(asdict(response)) + "|\n\n|"
 
 
-def streaming_timeout_exception(fragment: int) -> str:
-    return response_line(
-        StreamingResponse(fragment=fragment, data=None, status=status.HTTP_408_REQUEST_TIMEOUT, error="Timeout reached")
-    )
+def binary_frame(fragment: int, status_code: int, payload: bytes) -> bytes:
+    return BINARY_FRAME_HEADER.pack(fragment, status_code, len(payload)) + payload
+
 
+def streaming_error(
+    fragment: int, status_code: int, error: str, stream_format: StreamFormat = StreamFormat.JSON
+) -> str | bytes:
+    if stream_format == StreamFormat.BINARY:
+        return binary_frame(fragment, status_code, error.encode("utf-8"))
+    return response_line(StreamingResponse(fragment=fragment, data=None, status=status_code, error=error))
 
-def streaming_error_exception(fragment: int, error: Exception) -> str:
-    return response_line(
-        StreamingResponse(fragment=fragment, data=None, status=status.HTTP_500_INTERNAL_SERVER_ERROR, error=str(error))
-    )
 
+def streaming_timeout_exception(fragment: int, stream_format: StreamFormat = StreamFormat.JSON) -> str | bytes:
+    return streaming_error(fragment, status.HTTP_408_REQUEST_TIMEOUT, "Timeout reached", stream_format)
 
-def streaming_stack_exception(fragment: int, error: StackedHTTPException) -> str:
-    return response_line(StreamingResponse(fragment=fragment, data=None, status=error.status_code, error=error.detail))
 
+def streaming_error_exception(
+    fragment: int, error: Exception, stream_format: StreamFormat = StreamFormat.JSON
+) -> str | bytes:
+    return streaming_error(fragment, status.HTTP_500_INTERNAL_SERVER_ERROR, str(error), stream_format)
 
-def streaming_response(fragment: int, data: str | bytes) -> str:
+
+def streaming_stack_exception(
+    fragment: int, error: StackedHTTPException, stream_format: StreamFormat = StreamFormat.JSON
+) -> str | bytes:
+    return streaming_error(fragment, error.status_code, error.detail, stream_format)
+
+
+def streaming_response(
+    fragment: int, data: str | bytes, stream_format: StreamFormat = StreamFormat.JSON
+) -> str | bytes:
     buffer = data.encode("utf-8") if isinstance(data, str) else data
+    if stream_format == StreamFormat.BINARY:
+        return binary_frame(fragment, status.HTTP_200_OK, buffer)
     data_encoded = base64.b64encode(buffer).decode()
     return response_line(StreamingResponse(fragment=fragment, data=data_encoded, status=status.HTTP_200_OK))
 
 
-async def streamer(gen: AsyncGenerator[str | bytes, None], heartbeats: float = -1.0) -> AsyncGenerator[str, None]:
+async def streamer(
+    gen: AsyncGenerator[str | bytes, None],
+    heartbeats: float = -1.0,
+    stream_format: StreamFormat = StreamFormat.JSON,
+    max_queue_size: int = STREAM_QUEUE_SIZE,
+    cancel_on_disconnect: bool = False,
+) -> AsyncGenerator[str | bytes, None]:
     """
     Streamer wrapper for async generators and provide a consistent response format
-    with error handling. Data is encoded in base64 to avoid any new line jsons conflicts.
+    with error handling. Data is encoded in base64 to avoid any new line jsons conflicts,
+    unless the binary format is used, where data is sent raw in length-prefixed frames.
+    If the client goes away, the generator keeps running until its end (e.g: installs that should not be left
+    halfway), unless cancel_on_disconnect is set, which should be used for streams that only read data, like logs.
     """
 
-    async def send_heartbeat(period: float, queue: asyncio.Queue[Optional[str]]) -> None:
+    async def send_heartbeat(period: float, queue: asyncio.Queue[Optional[str | bytes]]) -> None:
         while True:
             await asyncio.sleep(period)
-            await queue.put(streaming_response(-1, "heartbeat"))
+            # No reason to pile up heartbeats if the client is not consuming the stream
+            if not queue.full():
+                queue.put_nowait(streaming_response(-1, "heartbeat", stream_format))
 
-    queue: asyncio.Queue[Optional[str]] = asyncio.Queue()
+    queue: asyncio.Queue[Optional[str | bytes]] = asyncio.Queue(maxsize=max_queue_size)
+    consumer_gone = False
 
     if heartbeats > 0:
         heartbeat_task = asyncio.create_task(send_heartbeat(heartbeats, queue))
     else:
         heartbeat_task = None
 
-    async def generator_wrapper(gen: AsyncGenerator[str | bytes, None], queue: asyncio.Queue[Optional[str]]) -> None:
+    async def publish(item: Optional[str | bytes]) -> None:
+        # Without a client the generator is only drained, nothing would consume the queue
+        if not consumer_gone:
+            await queue.put(item)
+
+    async def generator_wrapper(gen: AsyncGenerator[str | bytes, None]) -> None:
         fragment = 0
         try:
             async for data in gen:
-                await queue.put(streaming_response(fragment, data))
+                await publish(streaming_response(fragment, data, stream_format))
                 fragment += 1
         except StackedHTTPException as e:
-            await queue.put(streaming_stack_exception(fragment, e))
+            await publish(streaming_stack_exception(fragment, e, stream_format))
         except Exception as e:
-            await queue.put(streaming_error_exception(fragment, e))
+            await publish(streaming_error_exception(fragment, e, stream_format))
         finally:
             if heartbeat_task:
                 heartbeat_task.cancel()
-            await queue.put(None)
+            # The generator may have been stopped halfway when the stream is cancelled
+            await gen.aclose()
+            await publish(None)
 
-    asyncio.create_task(generator_wrapper(gen, queue))
+    generator_task = asyncio.create_task(generator_wrapper(gen))
 
-    while True:
-        item = await queue.get()
-        if item is None:
-            break
-        yield item
+    try:
+        while True:
+            item = await queue.get()
+            if item is None:
+                break
+            yield item
+    finally:
+        if heartbeat_task:
+            heartbeat_task.cancel()
+        if not generator_task.done():
+            # Nothing is sent anymore, and the generator is unblocked if it is waiting for space in the queue
+            consumer_gone = True
+            while not queue.empty():
+                queue.get_nowait()
+            if cancel_on_disconnect:
+                generator_task.cancel()
+            DETACHED_STREAM_TASKS.add(generator_task)
+            generator_task.add_done_callback(DETACHED_STREAM_TASKS.discard)
 
 
 async def _fetch_stream(
@@ -93,18 +173,23 @@ async def _fetch_stream(
             await queue.put((data, None))
     except Exception as e:
         await queue.put((None, e))
-    finally:
-        await queue.put((None, None))
+    await queue.put((None, None))
 
 
-async def timeout_streamer(gen: AsyncGenerator[str | bytes, None], timeout: int = 3) -> AsyncGenerator[str, None]:
+async def timeout_streamer(
+    gen: AsyncGenerator[str | bytes, None],
+    timeout: int = 3,
+    stream_format: StreamFormat = StreamFormat.JSON,
+    max_queue_size: int = STREAM_QUEUE_SIZE,
+) -> AsyncGenerator[str | bytes, None]:
     """
     Streamer wrapper for async generators and provide a consistent response format
     with error handling with additional timeout limit for each item iteration.
-    Data is encoded in base64 to avoid any new line jsons conflicts.
+    Data is encoded in base64 to avoid any new line jsons conflicts,
+    unless the binary format is used, where data is sent raw in length-prefixed frames.
     """
 
-    queue: asyncio.Queue[Optional[Tuple[str | bytes | None, Exception | None]]] = asyncio.Queue()
+    queue: asyncio.Queue[Optional[Tuple[str | bytes | None, Exception | None]]] = asyncio.Queue(maxsize=max_queue_size)
     task = asyncio.create_task(_fetch_stream(gen, queue))
 
     fragment = 0
@@ -116,13 +201,13 @@ async def timeout_streamer(gen: AsyncGenerator[str | bytes, None], timeout: int
                 raise error
             if data is None:
                 break
-            yield streaming_response(fragment, data)
+            yield streaming_response(fragment, data, stream_format)
             fragment += 1
     except asyncio.TimeoutError:
-        yield streaming_timeout_exception(fragment)
+        yield streaming_timeout_exception(fragment, stream_format)
     except StackedHTTPException as e:
-        yield streaming_stack_exception(fragment, e)
+        yield streaming_stack_exception(fragment, e, stream_format)
     except Exception as e:
-        yield streaming_error_exception(fragment, e)
+        yield streaming_error_exception(fragment, e, stream_format)
     finally:
         task.cancel()
@@ -0,0 +1,15 @@
+from typing import List
+
+import pytest
+
+from .. import commands
+
+
+def run_locally(command: str) -> List[str]:
+    return ["sh", "-c", command]
+
+
+@pytest.fixture
+def local_host(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Run the commands meant for the host computer on this machine instead"""
+    monkeypatch.setattr(commands, "ssh_command_with_ssh_key", run_locally)
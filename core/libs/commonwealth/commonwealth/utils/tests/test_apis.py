@@ -0,0 +1,41 @@
+import json
+from typing import List, Optional, Tuple
+
+import pytest
+from fastapi import Request
+
+from .. import apis
+
+
+def make_request(query_string: bytes, headers: Optional[List[Tuple[bytes, bytes]]] = None) -> Request:
+    scope = {"type": "http", "method": "GET", "path": "/", "query_string": query_string, "headers": headers or []}
+    return Request(scope)
+
+
+@pytest.mark.parametrize(
+    "query_string, headers, expected",
+    [
+        (b"", [], False),
+        (b"pretty", [], True),
+        (b"pretty=true", [], True),
+        (b"pretty=false", [(b"accept", b"application/json; pretty=true")], False),
+        (b"", [(b"accept", b"application/json; pretty=true")], True),
+        (b"", [(b"accept", b"application/json")], False),
+    ],
+)
+def test_pretty_json_requested(query_string: bytes, headers: List[Tuple[bytes, bytes]], expected: bool) -> None:
+    assert apis.is_pretty_json_requested(make_request(query_string, headers)) == expected
+
+
+def test_compact_json_response() -> None:
+    content = {"name": "ação", "values": [1, 2.5, None], "nested": {"ok": True}}
+
+    compact = apis.CompactJSONResponse(content).body
+    assert b" " not in compact and b"\n" not in compact
+    assert json.loads(compact) == content
+
+    token = apis.pretty_json_requested.set(True)
+    try:
+        assert apis.CompactJSONResponse(content).body == apis.PrettyJSONResponse(content).body
+    finally:
+        apis.pretty_json_requested.reset(token)
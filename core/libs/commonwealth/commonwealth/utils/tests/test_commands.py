@@ -0,0 +1,66 @@
+import pathlib
+import subprocess
+from typing import Any, List
+
+import pytest
+from loguru import logger
+
+from .. import commands
+
+
+@pytest.mark.usefixtures("local_host")
+def test_run_commands_splits_batch_output() -> None:
+    logged: List[str] = []
+    sink = logger.add(logged.append, level="INFO", format="{message}")
+
+    try:
+        results = commands.run_commands(
+            ["echo first", "printf second; echo oops >&2; exit 3", "true", "echo 'a\nb'"], False
+        )
+    finally:
+        logger.remove(sink)
+
+    assert [result.returncode for result in results] == [0, 3, 0, 0]
+    assert [result.stdout for result in results] == ["first\n", "second", "", "a\nb\n"]
+    assert [result.stderr for result in results] == ["", "oops\n", "", ""]
+    assert results[1].args[-1] == "printf second; echo oops >&2; exit 3"
+    # Each command is logged, but not the script generated to run them
+    assert len([message for message in logged if message.startswith("Host: ")]) == 4
+    assert not [message for message in logged if "blueos-batch" in message]
+
+    with pytest.raises(subprocess.CalledProcessError):
+        commands.run_commands(["true", "false"])
+
+
+@pytest.mark.usefixtures("local_host")
+def test_load_file_is_cached_until_file_changes(monkeypatch: pytest.MonkeyPatch, tmp_path: pathlib.Path) -> None:
+    executed: List[str] = []
+    run_command = commands.run_command
+
+    def recording_run_command(command: str, *args: Any, **kwargs: Any) -> "subprocess.CompletedProcess[str]":
+        result = run_command(command, *args, **kwargs)
+        executed.append(result.stdout)
+        return result
+
+    monkeypatch.setattr(commands, "run_command", recording_run_command)
+    host_file = tmp_path.joinpath("os-release")
+    host_file.write_text("bookworm\n")
+    file_name = str(host_file)
+
+    assert commands.load_file(file_name) == "bookworm\n"
+    assert commands.load_file(file_name) == "bookworm\n"
+    # Second read only transferred the file signature
+    assert len(executed) == 2 and "bookworm" not in executed[1]
+
+    assert commands.load_file(file_name, max_age=60) == "bookworm\n"
+    assert len(executed) == 2
+
+    host_file.write_text("bullseye, longer\n")
+    assert commands.load_file(file_name) == "bullseye, longer\n"
+
+    commands.invalidate_host_file(file_name)
+    assert commands.load_file(file_name, max_age=60) == "bullseye, longer\n"
+    assert len(executed) == 4
+
+    host_file.unlink()
+    assert commands.load_file(file_name) == ""
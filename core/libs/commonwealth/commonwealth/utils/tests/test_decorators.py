@@ -1,6 +1,10 @@
+import asyncio
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
+import pytest
+
 from .. import decorators
 
 CACHE_TIME = 0.3
@@ -24,3 +28,94 @@ def test_nested_settings_save_load() -> None:
 
     # Check if all cache values are invalid after waiting for a long time
     assert all(original_output[key] != cached_function(key) for key in inputs)
+
+
+def test_cache_lru_eviction_and_kwargs() -> None:
+    calls = []
+
+    @decorators.temporary_cache(timeout_seconds=10, max_size=2)
+    def tracked_function(value: int, scale: int = 1) -> int:
+        calls.append((value, scale))
+        return value * scale
+
+    assert tracked_function(1) == 1
+    assert tracked_function(2, scale=3) == 6
+    assert tracked_function(2, scale=3) == 6
+    assert tracked_function(1) == 1
+    # Third input evicts the least recently used one: (2, scale=3)
+    assert tracked_function(3) == 3
+    assert tracked_function(2, scale=3) == 6
+
+    assert calls == [(1, 1), (2, 3), (3, 1), (2, 3)]
+    info = tracked_function.cache_info()
+    assert info.hits == 2
+    assert info.misses == 4
+    assert info.current_size == 2
+
+
+def test_cache_single_flight() -> None:
+    calls = []
+
+    @decorators.temporary_cache(timeout_seconds=10)
+    def slow_function(value: int) -> int:
+        calls.append(value)
+        time.sleep(0.2)
+        return value
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(slow_function, [42] * 8))
+
+    assert results == [42] * 8
+    assert calls == [42]
+
+
+@pytest.mark.asyncio
+async def test_async_cache_single_flight_and_stale_while_revalidate() -> None:
+    calls = []
+
+    @decorators.temporary_cache(timeout_seconds=CACHE_TIME, stale_while_revalidate=10)
+    async def slow_coroutine(value: int) -> int:
+        calls.append(value)
+        await asyncio.sleep(0.1)
+        return len(calls)
+
+    assert await asyncio.gather(*[slow_coroutine(1) for _ in range(5)]) == [1] * 5
+    assert calls == [1]
+
+    # Expired values are still returned while a new one is computed in background
+    await asyncio.sleep(CACHE_WAIT_TIME)
+    assert await slow_coroutine(1) == 1
+    await asyncio.sleep(0.2)
+    assert await slow_coroutine(1) == 2
+    assert slow_coroutine.cache_info().stale_hits == 1
+
+
+@pytest.mark.asyncio
+async def test_async_cache_leader_cancellation() -> None:
+    calls = []
+
+    @decorators.temporary_cache(timeout_seconds=10)
+    async def slow_coroutine(value: int) -> int:
+        calls.append(value)
+        await asyncio.sleep(0.1)
+        return len(calls)
+
+    leader = asyncio.create_task(slow_coroutine(1))
+    await asyncio.sleep(0)
+    follower = asyncio.create_task(slow_coroutine(1))
+    await asyncio.sleep(0.05)
+    leader.cancel()
+
+    # The caller waiting for the cancelled computation is not cancelled, it computes the value again
+    assert await follower == 2
+    assert leader.cancelled()
+    assert calls == [1, 1]
+
+    # Callers waiting for a computation can still be cancelled by themselves
+    leader = asyncio.create_task(slow_coroutine(2))
+    await asyncio.sleep(0)
+    follower = asyncio.create_task(slow_coroutine(2))
+    await asyncio.sleep(0.05)
+    follower.cancel()
+    assert await leader == 3
+    assert follower.cancelled()
@@ -0,0 +1,51 @@
+import pathlib
+import time
+
+from ..DHCPServerManager import DHCPLeaseTable
+
+
+def test_lease_table(tmp_path: pathlib.Path) -> None:
+    lease_file = tmp_path.joinpath("dnsmasq.leases")
+    expires = int(time.time()) + 3600
+    lease_file.write_text(
+        f"{expires} aa:bb:cc:dd:ee:01 192.168.2.101 laptop 01:aa:bb:cc:dd:ee:01\n"
+        f"{expires} aa:bb:cc:dd:ee:02 192.168.2.102 * *\n"
+        "1 aa:bb:cc:dd:ee:03 192.168.2.103 old *\n"
+        "duid 00:01:00:01\n"
+    )
+    table = DHCPLeaseTable("eth0", lease_file)
+    table.refresh()
+
+    assert sorted(lease.ip for lease in table.leases()) == ["192.168.2.101", "192.168.2.102"]
+    laptop = table.by_mac("aa:bb:cc:dd:ee:01")
+    assert laptop is not None and laptop.hostname == "laptop" and laptop.interface == "eth0"
+    no_hostname = table.by_ip("192.168.2.102")
+    assert no_hostname is not None and no_hostname.hostname is None
+    assert table.by_ip("192.168.2.103") is None
+
+    # Unchanged leases are kept, removed ones are dropped
+    lease_file.write_text(
+        f"{expires} aa:bb:cc:dd:ee:01 192.168.2.101 laptop 01:aa:bb:cc:dd:ee:01\n"
+        f"{expires} aa:bb:cc:dd:ee:04 192.168.2.104 phone *\n"
+    )
+    table.refresh()
+    assert table.by_mac("aa:bb:cc:dd:ee:01") is laptop
+    assert table.by_mac("aa:bb:cc:dd:ee:02") is None
+    assert table.by_ip("192.168.2.104") is not None
+
+
+def test_lease_table_watch(tmp_path: pathlib.Path) -> None:
+    lease_file = tmp_path.joinpath("dnsmasq.leases")
+    table = DHCPLeaseTable("eth0", lease_file)
+    table.watch(poll_interval=0.05)
+    try:
+        assert not table.leases()
+        with open(lease_file, "w", encoding="utf-8") as file:
+            file.write("0 aa:bb:cc:dd:ee:01 192.168.2.101 laptop *\n")
+            file.flush()
+            deadline = time.monotonic() + 2
+            while table.by_ip("192.168.2.101") is None and time.monotonic() < deadline:
+                time.sleep(0.01)
+        assert table.by_ip("192.168.2.101") is not None
+    finally:
+        table.stop_watching()
@@ -0,0 +1,56 @@
+import pathlib
+from typing import Any
+
+import pytest
+
+from .. import commands, general
+
+
+def test_delete_everything_keeps_open_files(tmp_path: pathlib.Path) -> None:
+    for name in ["a.log", "b.log", "folder/c.log"]:
+        tmp_path.joinpath(name).parent.mkdir(exist_ok=True)
+        tmp_path.joinpath(name).write_text("data")
+    open_file = tmp_path.joinpath("folder/c.log")
+
+    with open(open_file, encoding="utf-8"):
+        assert general.file_is_open(open_file)
+        assert not general.file_is_open(tmp_path.joinpath("a.log"))
+        general.delete_everything(tmp_path)
+
+    assert [path for path in tmp_path.rglob("*") if path.is_file()] == [open_file]
+    assert not general.file_is_open(open_file)
+
+
+@pytest.mark.usefixtures("local_host")
+def test_host_facts_are_cached(monkeypatch: pytest.MonkeyPatch, tmp_path: pathlib.Path) -> None:
+    general.get_cpu_model.cache_clear()
+    reads = []
+
+    def counting_open(file: str, *args: Any, **kwargs: Any) -> Any:
+        reads.append(file)
+        return open(file, *args, **kwargs)  # pylint: disable=unspecified-encoding
+
+    # Only the reads done by the general module are counted
+    monkeypatch.setattr(general, "open", counting_open, raising=False)
+    for _ in range(3):
+        general.get_cpu_type()
+    assert reads.count("/proc/cpuinfo") == 1
+    general.get_cpu_model.cache_clear()
+
+    host_file = tmp_path.joinpath("os-release")
+    monkeypatch.setattr(general, "load_file", lambda _file_name, max_age: commands.load_file(str(host_file), max_age))
+    # Failures to reach the host are not cached
+    assert general.get_host_os() == general.HostOs.Other
+    host_file.write_text("VERSION_CODENAME=bookworm\n")
+    assert general.get_host_os() == general.HostOs.Bookworm
+    host_file.write_text("VERSION_CODENAME=trixie\n")
+    assert general.get_host_os() == general.HostOs.Bookworm
+    commands.invalidate_host_file(str(host_file))
+
+
+def test_userland_arch() -> None:
+    arch_mapping = {"i386": "x86", "x86_64": "x64", "armv7l": "ARM", "aarch64": "AArch64"}
+    expected = arch_mapping.get(general.get_machine_arch())
+    if expected is None:
+        pytest.skip("Unknown machine architecture")
+    assert general.get_userland_arch() in (expected, "ARM" if expected == "AArch64" else expected)
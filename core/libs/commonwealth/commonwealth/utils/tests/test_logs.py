@@ -0,0 +1,53 @@
+import gzip
+import pathlib
+import time
+from typing import List
+
+import pytest
+from loguru import logger
+
+from .. import logs, metrics
+
+
+def test_rate_limiter_suppresses_repeated_records() -> None:
+    messages: List[str] = []
+    rate_limiter = logs.LogRateLimiter(max_records=3, period_seconds=0.2)
+    dropped = metrics.LOG_RECORDS_DROPPED.value("rate_limit")
+    handler_id = logger.add(messages.append, filter=rate_limiter, format="{message}", colorize=False)
+    try:
+        for _ in range(2):
+            for i in range(10):
+                logger.info(f"record {i}")
+                logger.debug("debug")
+                logger.warning("warning")
+            time.sleep(0.3)
+    finally:
+        logger.remove(handler_id)
+
+    # Each message is limited on its own, so a chatty one does not hide the others
+    assert len([message for message in messages if message.startswith("record ")]) == 6
+    assert len([message for message in messages if message.startswith("debug")]) == 6
+    assert len([message for message in messages if message.startswith("warning")]) == 20
+    assert rate_limiter.dropped == 28
+    assert metrics.LOG_RECORDS_DROPPED.value("rate_limit") - dropped == 28
+    # Suppressed repeats are reported when the period ends
+    summaries = [message for message in messages if message.startswith("Suppressed ")]
+    assert len(summaries) == 4
+    assert all(summary.startswith("Suppressed 7 repeats of ") for summary in summaries)
+    assert len([summary for summary in summaries if ":test_rate_limiter_suppresses_repeated_records:" in summary]) == 4
+
+
+def test_background_sink_rotates_and_compresses(monkeypatch: pytest.MonkeyPatch, tmp_path: pathlib.Path) -> None:
+    monkeypatch.setattr(logs, "get_new_log_path", lambda _name: tmp_path.joinpath(f"{time.monotonic_ns()}.log"))
+    sink = logs.BackgroundFileSink("test", rotation_size=1000)
+    handler_id = logger.add(sink, colorize=False, format="{message}")
+    for i in range(100):
+        logger.info(f"message {i:03}")
+    logger.remove(handler_id)
+
+    compressed = sorted(tmp_path.glob("*.log.gz"))
+    current = sorted(tmp_path.glob("*.log"))
+    assert compressed and len(current) == 1
+    content = b"".join(gzip.open(path).read() for path in compressed) + current[0].read_bytes()
+    assert content.decode().splitlines() == [f"message {i:03}" for i in range(100)]
+    assert sink.dropped == 0
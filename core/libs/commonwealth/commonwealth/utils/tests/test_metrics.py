@@ -0,0 +1,94 @@
+from typing import Any, Dict, List, Tuple
+
+import pytest
+from fastapi import FastAPI, HTTPException
+
+from .. import metrics
+from ..apis import GenericErrorHandlingRoute
+
+
+async def call(app: Any, path: str) -> Tuple[int, bytes]:
+    messages: List[Dict[str, Any]] = []
+
+    async def receive() -> Dict[str, Any]:
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message: Dict[str, Any]) -> None:
+        messages.append(message)
+
+    scope = {"type": "http", "method": "GET", "path": path, "query_string": b"", "headers": [], "root_path": ""}
+    await app(scope, receive, send)
+    return messages[0]["status"], b"".join(message.get("body", b"") for message in messages[1:])
+
+
+def test_histogram_render() -> None:
+    histogram = metrics.Histogram("test_seconds", "Test histogram.", ("route",), (0.25, 1))
+    for value in [0.125, 0.25, 0.5, 3]:
+        histogram.observe(value, "/a")
+
+    assert histogram.render().splitlines() == [
+        "# HELP test_seconds Test histogram.",
+        "# TYPE test_seconds histogram",
+        'test_seconds_bucket{route="/a",le="0.25"} 2',
+        'test_seconds_bucket{route="/a",le="1.0"} 3',
+        'test_seconds_bucket{route="/a",le="+Inf"} 4',
+        'test_seconds_sum{route="/a"} 3.875',
+        'test_seconds_count{route="/a"} 4',
+    ]
+
+
+@pytest.mark.asyncio
+async def test_route_metrics() -> None:
+    app = FastAPI()
+    app.router.route_class = GenericErrorHandlingRoute
+
+    @app.get("/items/{item_id}")
+    async def get_item(item_id: int) -> Any:
+        if item_id == 0:
+            raise HTTPException(status_code=404, detail="Not found")
+        if item_id < 0:
+            raise ValueError("Negative")
+        return {"item": item_id}
+
+    metrics.add_metrics_route(app)
+    route = "/items/{item_id}"
+    requests_before = metrics.HTTP_REQUESTS.value("GET", route, "200")
+
+    assert (await call(app, "/items/1"))[0] == 200
+    assert (await call(app, "/items/2"))[0] == 200
+    assert (await call(app, "/items/0"))[0] == 404
+    assert (await call(app, "/items/-1"))[0] == 500
+
+    assert metrics.HTTP_REQUESTS.value("GET", route, "200") == requests_before + 2
+    assert metrics.HTTP_REQUESTS.value("GET", route, "404") >= 1
+    assert metrics.HTTP_REQUESTS.value("GET", route, "500") >= 1
+    assert metrics.HTTP_REQUEST_EXCEPTIONS.value("GET", route) >= 1
+    assert metrics.HTTP_REQUESTS_IN_FLIGHT.value("GET") == 0
+    assert metrics.HTTP_REQUEST_DURATION.count("GET", route) >= 4
+    assert metrics.HTTP_RESPONSE_SIZE.count("GET", route) >= 4
+
+    status, body = await call(app, "/metrics")
+    assert status == 200
+    assert 'http_requests_total{method="GET",route="/items/{item_id}",status="200"}' in body.decode()
+
+
+@pytest.mark.asyncio
+async def test_mounted_application_metrics() -> None:
+    # Versioned APIs mount the routers in sub applications, that do not use GenericErrorHandlingRoute
+    versioned = FastAPI()
+
+    @versioned.get("/things/{thing_id}")
+    async def get_thing(thing_id: int) -> Any:
+        return {"thing": thing_id}
+
+    app = FastAPI()
+    app.mount("/v1.0", versioned)
+    metrics.add_metrics_route(app)
+    route = "/v1.0/things/{thing_id}"
+    requests_before = metrics.HTTP_REQUESTS.value("GET", route, "200")
+
+    assert await call(app, "/v1.0/things/1") == (200, b'{"thing":1}')
+    assert (await call(app, "/v1.0/unknown"))[0] == 404
+
+    assert metrics.HTTP_REQUESTS.value("GET", route, "200") == requests_before + 1
+    assert metrics.HTTP_REQUESTS_IN_FLIGHT.value("GET") == 0
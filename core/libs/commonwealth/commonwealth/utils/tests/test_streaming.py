@@ -0,0 +1,114 @@
+import asyncio
+import base64
+import json
+from typing import AsyncGenerator, List, Tuple
+
+import pytest
+
+from ..streaming import (
+    BINARY_FRAME_HEADER,
+    DETACHED_STREAM_TASKS,
+    StreamFormat,
+    streamer,
+    timeout_streamer,
+)
+
+
+async def generate_chunks() -> AsyncGenerator[bytes, None]:
+    yield b"first|\n\n|chunk"
+    yield b"\x00\xff"
+    raise RuntimeError("broken stream")
+
+
+def decode_frames(stream: bytes) -> List[Tuple[int, int, bytes]]:
+    frames = []
+    while stream:
+        fragment, status, length = BINARY_FRAME_HEADER.unpack_from(stream)
+        payload_start = BINARY_FRAME_HEADER.size
+        frames.append((fragment, status, stream[payload_start : payload_start + length]))
+        stream = stream[payload_start + length :]
+    return frames
+
+
+@pytest.mark.asyncio
+async def test_json_streamer() -> None:
+    lines = [line async for line in streamer(generate_chunks())]
+    responses = [json.loads(str(line).removesuffix("|\n\n|")) for line in lines]
+
+    assert [response["fragment"] for response in responses] == [0, 1, 2]
+    assert base64.b64decode(responses[0]["data"]) == b"first|\n\n|chunk"
+    assert base64.b64decode(responses[1]["data"]) == b"\x00\xff"
+    assert responses[2]["status"] == 500
+    assert responses[2]["error"] == "broken stream"
+
+
+@pytest.mark.asyncio
+async def test_binary_streamer() -> None:
+    for stream in [
+        streamer(generate_chunks(), stream_format=StreamFormat.BINARY),
+        timeout_streamer(generate_chunks(), stream_format=StreamFormat.BINARY),
+    ]:
+        frames = decode_frames(b"".join([frame async for frame in stream if isinstance(frame, bytes)]))
+        assert frames == [(0, 200, b"first|\n\n|chunk"), (1, 200, b"\x00\xff"), (2, 500, b"broken stream")]
+
+
+@pytest.mark.asyncio
+async def test_streamer_backpressure() -> None:
+    produced = 0
+
+    async def fast_generator() -> AsyncGenerator[str, None]:
+        nonlocal produced
+        while True:
+            produced += 1
+            yield "data"
+
+    stream = streamer(fast_generator(), max_queue_size=4, cancel_on_disconnect=True)
+    await stream.__anext__()
+    await asyncio.sleep(0.1)
+    # The generator can not get much ahead of the client
+    assert produced <= 6
+    await stream.aclose()
+    await asyncio.sleep(0)
+    # Read only streams stop with the client
+    produced_on_close = produced
+    await asyncio.sleep(0.1)
+    assert produced == produced_on_close
+
+
+@pytest.mark.asyncio
+async def test_streamer_detached_on_disconnect() -> None:
+    finished = asyncio.Event()
+
+    async def install() -> AsyncGenerator[str, None]:
+        for _ in range(20):
+            await asyncio.sleep(0)
+            yield "progress"
+        finished.set()
+
+    stream = streamer(install(), max_queue_size=2)
+    await stream.__anext__()
+    await stream.aclose()
+    # The generator keeps running until its end without a client, instead of being left halfway
+    await asyncio.wait_for(finished.wait(), timeout=1)
+
+
+@pytest.mark.asyncio
+async def test_streamer_cancelled_with_full_queue() -> None:
+    closed = asyncio.Event()
+
+    async def logs() -> AsyncGenerator[str, None]:
+        try:
+            while True:
+                yield "line"
+        finally:
+            closed.set()
+
+    stream = streamer(logs(), max_queue_size=2, cancel_on_disconnect=True)
+    await stream.__anext__()
+    # Let the generator fill the queue, it is then waiting for the client
+    await asyncio.sleep(0.01)
+    await stream.aclose()
+    # The generator is closed and its task finishes, instead of waiting forever to send the end of the stream
+    await asyncio.wait_for(closed.wait(), timeout=1)
+    await asyncio.sleep(0)
+    assert not DETACHED_STREAM_TASKS
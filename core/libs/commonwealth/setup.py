@@ -23,6 +23,7 @@ setuptools.setup(
         "aiohttp == 3.7.4",
         "appdirs == 1.4.4",
         "loguru == 0.5.3",
+        "orjson == 3.8.3",
         "starlette == 0.27.0",
         "psutil == 5.7.2",
         "pykson == 1.0.2",
@@ -1,6 +1,7 @@
 from os import path
 
 from commonwealth.utils.apis import GenericErrorHandlingRoute, PrettyJSONResponse
+from commonwealth.utils.metrics import add_metrics_route
 from fastapi import FastAPI
 from fastapi.responses import HTMLResponse
 from fastapi.staticfiles import StaticFiles
@@ -26,6 +27,7 @@ application.include_router(endpoints_router_v1)
 application.include_router(index_router_v2)
 
 application = VersionedFastAPI(application, prefix_format="/v{major}.{minor}", enable_latest=True)
+add_metrics_route(application)
 
 
 @application.get("/", status_code=200)
@@ -1,8 +1,13 @@
-import platform
 from typing import Any, List
 
-from commonwealth.utils.commands import load_file
-from elftools.elf.elffile import ELFFile
+from commonwealth.utils.general import (
+    CpuType,
+    HostOs,
+    get_cpu_type,
+    get_host_os,
+    get_machine_arch,
+    get_userland_arch,
+)
 
 from flight_controller_detector.linux.linux_boards import LinuxFlightController
 from typedefs import Platform, Serial
@@ -14,21 +19,14 @@ class Navigator(LinuxFlightController):
     def __init__(self, **data: Any) -> None:
         name = "Navigator"
         plat = Platform.Navigator
-        if platform.machine() == "aarch64":
-            # edge case for 64-bit kernel on 32-bit userland...
-            # let's check the arch for /usr/bin/ls
-            with open("/usr/bin/ls", "rb") as f:
-                elf_file = ELFFile(f)
-                firm_arch = elf_file.get_machine_arch()
-                # from https://github.com/eliben/pyelftools/blob/main/elftools/elf/elffile.py#L513
-                if firm_arch == "AArch64":
-                    name = "Navigator64"
-                    plat = Platform.Navigator64
+        # edge case for 64-bit kernel on 32-bit userland, the userland arch is checked from /usr/bin/ls
+        if get_machine_arch() == "aarch64" and get_userland_arch() == "AArch64":
+            name = "Navigator64"
+            plat = Platform.Navigator64
         super().__init__(**data, name=name, platform=plat)
 
     def is_pi5(self) -> bool:
-        with open("/proc/cpuinfo", "r", encoding="utf-8") as f:
-            return "Raspberry Pi 5" in f.read()
+        return get_cpu_type() is CpuType.PI5
 
     def detect(self) -> bool:
         return False
@@ -68,10 +66,7 @@ class NavigatorPi4(Navigator):
     }
 
     def get_serials(self) -> List[Serial]:
-        release = "Bullseye"
-        os_release = load_file("/etc/os-release")
-        if "bookworm" in os_release.lower():
-            release = "Bookworm"
+        release = "Bookworm" if get_host_os() == HostOs.Bookworm else "Bullseye"
 
         match release:
             case "Bullseye":
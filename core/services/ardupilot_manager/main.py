@@ -2,6 +2,7 @@
 import asyncio
 import logging
 
+from commonwealth.mavlink_comm.MavlinkComm import MavlinkMessenger
 from commonwealth.utils.general import is_running_as_root
 from commonwealth.utils.logs import InterceptHandler, init_logger
 from loguru import logger
@@ -45,3 +46,4 @@ if __name__ == "__main__":
     loop.create_task(autopilot.start_mavlink_manager_watchdog())
     loop.run_until_complete(server.serve())
     loop.run_until_complete(autopilot.kill_ardupilot())
+    loop.run_until_complete(MavlinkMessenger.close_session())
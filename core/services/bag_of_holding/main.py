@@ -9,6 +9,7 @@ import dpath
 import uvicorn
 from commonwealth.utils.apis import GenericErrorHandlingRoute
 from commonwealth.utils.logs import InterceptHandler, init_logger
+from commonwealth.utils.metrics import add_metrics_route
 from fastapi import Body, FastAPI, HTTPException
 from fastapi import Path as FastPath
 from fastapi.responses import HTMLResponse, JSONResponse
@@ -96,6 +97,7 @@ async def read_data(path: str) -> JSONResponse:
 
 
 app = VersionedFastAPI(app, version="1.0.0", prefix_format="/v{major}.{minor}", enable_latest=True)
+add_metrics_route(app)
 
 
 @app.get("/")
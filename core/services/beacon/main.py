@@ -11,6 +11,7 @@ import psutil
 from commonwealth.settings.manager import Manager
 from commonwealth.utils.apis import PrettyJSONResponse
 from commonwealth.utils.logs import init_logger
+from commonwealth.utils.metrics import add_metrics_route
 from fastapi import FastAPI, Request
 from fastapi.responses import HTMLResponse
 from fastapi_versioning import VersionedFastAPI, version
@@ -319,6 +320,7 @@ def get_ip(request: Request) -> Any:
 
 
 app = VersionedFastAPI(app, version="1.0.0", prefix_format="/v{major}.{minor}", enable_latest=True)
+add_metrics_route(app)
 
 
 @app.get("/")
@@ -5,6 +5,7 @@ from typing import Any, List
 import uvicorn
 from commonwealth.utils.apis import GenericErrorHandlingRoute, PrettyJSONResponse
 from commonwealth.utils.logs import InterceptHandler, init_logger
+from commonwealth.utils.metrics import add_metrics_route
 from fastapi import FastAPI, status
 from fastapi.responses import HTMLResponse
 from fastapi_versioning import VersionedFastAPI, version
@@ -61,6 +62,7 @@ def remove_bridge(bridge: BridgeFrontendSpec) -> Any:
 
 
 app = VersionedFastAPI(app, version="1.0.0", prefix_format="/v{major}.{minor}", enable_latest=True)
+add_metrics_route(app)
 
 
 @app.get("/")
@@ -7,6 +7,7 @@ from typing import Any, Dict, List, Optional, Set, Tuple
 
 import psutil
 from commonwealth.utils.decorators import temporary_cache
+from commonwealth.utils.DHCPServerManager import DHCPLease
 from commonwealth.utils.DHCPServerManager import Dnsmasq as DHCPServerManager
 from loguru import logger
 from pyroute2 import IW, NDB, IPRoute
@@ -25,6 +26,7 @@ from typedefs import (
 
 __all__ = [
     "AddressMode",
+    "DHCPLease",
     "EthernetManager",
     "InterfaceAddress",
     "NetworkInterface",
@@ -583,6 +585,32 @@ class EthernetManager:
         logger.info(f"Adding DHCP server with gateway '{ipv4_gateway}' to interface '{interface_name}'.")
         self._dhcp_servers.append(DHCPServerManager(interface_name, ipv4_gateway))
 
+    def get_dhcp_leases(self, interface_name: Optional[str] = None) -> List[DHCPLease]:
+        """Get active leases of the DHCP servers
+
+        Args:
+            interface_name (Optional[str]): Only return leases of the DHCP server running on this interface
+
+        Returns:
+            List[DHCPLease]: Active leases
+        """
+        return [
+            lease
+            for dhcp_server in self._dhcp_servers
+            if interface_name is None or dhcp_server.interface == interface_name
+            for lease in dhcp_server.lease_table.leases()
+        ]
+
+    def get_dhcp_lease(self, mac: Optional[str] = None, ip: Optional[str] = None) -> Optional[DHCPLease]:
+        """Find an active lease of the DHCP servers by MAC or IP address"""
+        if mac is None and ip is None:
+            raise ValueError("A MAC or IP address should be provided.")
+        for dhcp_server in self._dhcp_servers:
+            lease = dhcp_server.lease_table.by_mac(mac) if mac is not None else dhcp_server.lease_table.by_ip(str(ip))
+            if lease is not None:
+                return lease
+        return None
+
     def stop(self) -> None:
         """Perform steps necessary to properly stop the manager."""
         for dhcp_server in self._dhcp_servers:
@@ -664,7 +692,8 @@ class EthernetManager:
                 logger.warning("Interface config mismatch, applying saved settings.")
                 logger.debug(f"Mismatches: {mismatches}")
                 for interface in mismatches:
-                    self.set_configuration(interface, watchdog_call=True)
+                    # Configuring may restart a DHCP server, which waits for dnsmasq, so it runs out of the event loop
+                    await asyncio.to_thread(self.set_configuration, interface, watchdog_call=True)
             priority_mismatch = self.priorities_mismatch()
             if priority_mismatch:
                 logger.warning("Interface priorities mismatch, applying saved settings.")
@@ -4,12 +4,13 @@ import asyncio
 import logging
 import os
 import sys
-from typing import Any, List
+from typing import Any, List, Optional
 
 from commonwealth.utils.apis import GenericErrorHandlingRoute, PrettyJSONResponse
 from commonwealth.utils.decorators import temporary_cache
 from commonwealth.utils.logs import InterceptHandler, init_logger
-from fastapi import Body, FastAPI
+from commonwealth.utils.metrics import add_metrics_route
+from fastapi import Body, FastAPI, HTTPException
 from fastapi.responses import HTMLResponse
 from fastapi_versioning import VersionedFastAPI, version
 from loguru import logger
@@ -18,6 +19,7 @@ from uvicorn import Config, Server
 from api.dns import DnsData
 from api.manager import (
     AddressMode,
+    DHCPLease,
     EthernetManager,
     InterfaceAddress,
     NetworkInterface,
@@ -128,6 +130,25 @@ def remove_dhcp_server(interface_name: str) -> Any:
     manager.save()
 
 
+@app.get("/dhcp/leases", response_model=List[DHCPLease], summary="Retrieve active leases of local DHCP servers.")
+@version(1, 0)
+def retrieve_dhcp_leases(interface_name: Optional[str] = None) -> Any:
+    """REST API endpoint to retrieve the devices that received an address from our DHCP servers."""
+    return manager.get_dhcp_leases(interface_name)
+
+
+@app.get("/dhcp/lease", response_model=DHCPLease, summary="Find an active lease by MAC or IP address.")
+@version(1, 0)
+def retrieve_dhcp_lease(mac: Optional[str] = None, ip: Optional[str] = None) -> Any:
+    """REST API endpoint to find the lease of a device in our DHCP servers."""
+    if mac is None and ip is None:
+        raise HTTPException(status_code=400, detail="A MAC or IP address should be provided.")
+    lease = manager.get_dhcp_lease(mac, ip)
+    if lease is None:
+        raise HTTPException(status_code=404, detail="No active lease found.")
+    return lease
+
+
 @app.post("/dynamic_ip", summary="Trigger reception of dynamic IP.")
 @version(1, 0)
 def trigger_dynamic_ip_acquisition(interface_name: str) -> Any:
@@ -156,6 +177,7 @@ app = VersionedFastAPI(
     prefix_format="/v{major}.{minor}",
     enable_latest=True,
 )
+add_metrics_route(app)
 
 
 @app.get("/")
@@ -14,6 +14,7 @@ from commonwealth.utils.apis import GenericErrorHandlingRoute
 from commonwealth.utils.commands import run_command
 from commonwealth.utils.general import delete_everything
 from commonwealth.utils.logs import InterceptHandler, init_logger
+from commonwealth.utils.metrics import add_metrics_route
 from fastapi import FastAPI, HTTPException, status
 from fastapi.responses import HTMLResponse
 from fastapi_versioning import VersionedFastAPI, version
@@ -207,6 +208,7 @@ async def environment_variables() -> Any:
 
 
 app = VersionedFastAPI(app, version="1.0.0", prefix_format="/v{major}.{minor}", enable_latest=True)
+add_metrics_route(app)
 
 
 @app.get("/")
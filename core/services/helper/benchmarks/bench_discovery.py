@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""Benchmark and regression check for the discovery of services by Helper.scan_ports.
+
+Starts stub HTTP servers on this machine, then scans them with an empty cache (cold), again without changes (warm) and
+with every service marked to be checked for changes (revalidate), like the periodic task does with extensions. For each
+scan it prints the time, the number of requests received by the stubs and the peak of memory allocated (from a
+separate traced run, since tracing slows down the scan). Stubs run in their own thread and event loop.
+
+Stub kinds:
+  plain: only a page with a title
+  registered: page and /register_service metadata, with ETag support
+  documented: page, metadata, /docs, /openapi.json and a swagger-ui page
+  slow: registered, answering every request after --slow-delay seconds
+  hanging: never answers
+
+After the scans, the detected services are compared with what each stub provides and the script exits with an error
+if they do not match, so it can be used to validate changes on discovery without BlueOS hardware.
+
+Usage: PYTHONPATH=.:../../libs/commonwealth python benchmarks/bench_discovery.py [--servers 40] [--slow 4] [--hanging 2]
+"""
+import argparse
+import asyncio
+import itertools
+import pathlib
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from typing import Any, Dict, List, Tuple
+from unittest import mock
+
+from aiohttp import web
+from loguru import logger
+
+STUB_KINDS = ["plain", "registered", "documented"]
+PHASES = ["cold", "warm", "revalidate"]
+
+
+# pylint: disable=too-many-instance-attributes
+class StubServers:
+    """Stub HTTP servers running in a background thread, counting the requests they receive"""
+
+    def __init__(self, kinds: List[str], slow_delay: float) -> None:
+        self.kinds = kinds
+        self.slow_delay = slow_delay
+        self.ports: Dict[int, str] = {}
+        self.requests: "Counter[str]" = Counter()
+        self._loop = asyncio.new_event_loop()
+        self._runners: List[web.AppRunner] = []
+        self._stop = asyncio.Event()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="stub-servers", daemon=True)
+
+    def __enter__(self) -> "StubServers":
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self._start(), self._loop).result()
+        return self
+
+    def __exit__(self, *_args: Any) -> None:
+        asyncio.run_coroutine_threadsafe(self._cleanup(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+
+    async def _start(self) -> None:
+        # The event has to be created inside the loop that waits for it
+        self._stop = asyncio.Event()
+        for index, kind in enumerate(self.kinds):
+            app = web.Application()
+            app.router.add_get("/{path:.*}", self._handler(kind, index))
+            runner = web.AppRunner(app, access_log=None)
+            await runner.setup()
+            # Helper only discovers services that listen on all interfaces
+            site = web.TCPSite(runner, "0.0.0.0", 0)
+            await site.start()
+            port = runner.addresses[0][1]
+            self.ports[port] = kind
+            self._runners.append(runner)
+
+    async def _cleanup(self) -> None:
+        self._stop.set()
+        for runner in self._runners:
+            await runner.cleanup()
+
+    def _handler(self, kind: str, index: int) -> Any:
+        name = f"{kind} {index}"
+        etag = f'"{kind}-{index}"'
+        metadata = {
+            "name": name,
+            "description": f"Stub {kind} service",
+            "icon": "mdi-test-tube",
+            "company": "Blue Robotics",
+            "version": "1.0.0",
+            "webpage": "https://github.com/bluerobotics/BlueOS",
+            "api": "/docs",
+        }
+        pages = {
+            "/": f"<html><head><title>{name}</title></head><body>{'<p>content</p>' * 1000}</body></html>",
+            "/docs": "<html><head><title>Docs</title></head></html>",
+            "/v1.0/ui/": "<html><head><title>API</title></head><body><div id='swagger-ui'></div></body></html>",
+        }
+        provided = {"/"}
+        if kind in ("registered", "documented", "slow"):
+            provided.add("/register_service")
+        if kind == "documented":
+            provided.update({"/docs", "/openapi.json", "/v1.0/ui/"})
+
+        async def handler(request: web.Request) -> web.StreamResponse:
+            self.requests[request.path] += 1
+            if kind == "hanging":
+                await self._stop.wait()
+            elif kind == "slow":
+                await asyncio.sleep(self.slow_delay)
+
+            if request.path not in provided:
+                return web.Response(status=404)
+            if request.path == "/register_service":
+                if request.headers.get("If-None-Match") == etag:
+                    return web.Response(status=304, headers={"ETag": etag})
+                return web.json_response(metadata, headers={"ETag": etag})
+            if request.path == "/openapi.json":
+                return web.json_response({"paths": {"/v1.0/ui/": {}}})
+            return web.Response(text=pages[request.path], content_type="text/html")
+
+        return handler
+
+
+def expected_services(servers: StubServers) -> Dict[int, Tuple[str, bool, List[str]]]:
+    # Title, if metadata is available and versions of the services that should be discovered
+    expected = {}
+    for index, (port, kind) in enumerate(servers.ports.items()):
+        if kind != "hanging":
+            expected[port] = (f"{kind} {index}", kind != "plain", ["/v1.0/ui/"] if kind == "documented" else [])
+    return expected
+
+
+async def scan(phase: str) -> Tuple[Any, float]:
+    # pylint: disable=import-outside-toplevel
+    from main import Helper
+
+    Helper.scan_ports.cache_clear()
+    Helper.detect_service.cache_clear()
+    if phase == "cold":
+        Helper.KNOWN_SERVICES = {}
+    elif phase == "revalidate":
+        for service in Helper.KNOWN_SERVICES.values():
+            service.revalidate = True
+
+    start = time.perf_counter()
+    services = await Helper.scan_ports()
+    return services, time.perf_counter() - start
+
+
+async def run_phases(servers: StubServers, traced: bool) -> Dict[str, Tuple[Any, float, int, int]]:
+    results = {}
+    for phase in PHASES:
+        servers.requests.clear()
+        if traced:
+            tracemalloc.start()
+        services, elapsed = await scan(phase)
+        peak = 0
+        if traced:
+            _current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+        results[phase] = (services, elapsed, sum(servers.requests.values()), peak)
+    return results
+
+
+def check_services(services: Any, expected: Dict[int, Tuple[str, bool, List[str]]]) -> List[str]:
+    errors = []
+    found = {service.port: service for service in services if service.port in expected}
+    for port, (title, has_metadata, versions) in expected.items():
+        service = found.get(port)
+        if service is None:
+            errors.append(f"{title} (port {port}) was not discovered")
+        elif (service.title, service.metadata is not None, service.versions) != (title, has_metadata, versions):
+            errors.append(
+                f"{title} (port {port}) was discovered as {service.title!r}, "
+                f"metadata: {service.metadata is not None}, versions: {service.versions}"
+            )
+    return errors
+
+
+def measure(servers: StubServers, repeat: int) -> Tuple[Dict[str, List[float]], Dict[str, Tuple[Any, float, int, int]]]:
+    """Timings of each phase over repeat runs, followed by a traced run"""
+    loop = asyncio.new_event_loop()
+    timings: Dict[str, List[float]] = {phase: [] for phase in PHASES}
+    for _ in range(repeat):
+        for phase, (_services, elapsed, _requests, _peak) in loop.run_until_complete(
+            run_phases(servers, traced=False)
+        ).items():
+            timings[phase].append(elapsed)
+    traced = loop.run_until_complete(run_phases(servers, traced=True))
+    loop.close()
+    return timings, traced
+
+
+def report(
+    servers: StubServers, timings: Dict[str, List[float]], traced: Dict[str, Tuple[Any, float, int, int]]
+) -> List[str]:
+    """Print the results of each phase, returning the errors found on the discovered services"""
+    counts = Counter(servers.kinds)
+    print(f"{len(servers.kinds)} stub servers: {', '.join(f'{counts[kind]} {kind}' for kind in counts)}")
+    errors = []
+    for phase in PHASES:
+        services, _elapsed, requests, peak = traced[phase]
+        print(
+            f"{phase:>10}: {statistics.median(timings[phase]) * 1000:8.1f} ms (median of {len(timings[phase])}),"
+            f" {requests:>4} requests, {peak / 1024:8.1f} KiB peak, {len(services)} services"
+        )
+        errors += [f"{phase}: {error}" for error in check_services(services, expected_services(servers))]
+    return errors
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--servers", type=int, default=40, help="Number of stub servers")
+    parser.add_argument("--slow", type=int, default=4, help="Number of slow stub servers")
+    parser.add_argument("--hanging", type=int, default=2, help="Number of stub servers that never answer")
+    parser.add_argument("--slow-delay", type=float, default=0.2, help="Delay of each answer of slow servers")
+    parser.add_argument("--repeat", type=int, default=5, help="Number of times each scan is measured")
+    parser.add_argument("--verbose", action="store_true", help="Show the logs of the helper service")
+    args = parser.parse_args()
+
+    regular = max(args.servers - args.slow - args.hanging, 0)
+    kinds = [
+        *itertools.islice(itertools.cycle(STUB_KINDS), regular),
+        *["slow"] * args.slow,
+        *["hanging"] * args.hanging,
+    ]
+
+    folder = pathlib.Path(tempfile.mkdtemp(prefix="bench-discovery-"))
+    # The nginx configuration of BlueOS is not available outside of it
+    with mock.patch("nginx_parser.parse_nginx_file", return_value={}):
+        # pylint: disable=import-outside-toplevel
+        from main import Helper
+    logger.remove()
+    if args.verbose:
+        logger.add(sys.stderr, level="DEBUG")
+
+    with StubServers(kinds, args.slow_delay) as servers, mock.patch.multiple(
+        Helper,
+        KNOWN_SERVICES_FILE=folder.joinpath("known_services.json"),
+        NGINX_EXTENSIONS_FOLDER=folder.joinpath("extensions"),
+        NGINX_ROUTES=None,
+        validate_nginx_config=mock.AsyncMock(return_value=True),
+        reload_nginx=mock.Mock(),
+    ):
+        # Ignore services that are not ours, but keep reading the listening ports as part of the scan
+        listening_ports = Helper.listening_ports
+        with mock.patch.object(
+            Helper,
+            "listening_ports",
+            lambda: {port: inode for port, inode in listening_ports().items() if port in servers.ports},
+        ):
+            timings, traced = measure(servers, args.repeat)
+
+    errors = report(servers, timings, traced)
+    for error in errors:
+        print(error)
+    if errors:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""Benchmark for extracting the title of service pages during discovery.
+
+Compares parsing the full page with BeautifulSoup (previous implementation, only if bs4 is installed) with the
+streaming PageHeadParser, that stops at the end of the head. Pages are generated, or loaded from a folder of saved
+.html files.
+
+Usage: PYTHONPATH=. python benchmarks/bench_page_head.py [--pages folder] [--repeat 50]
+"""
+import argparse
+import pathlib
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+from page_parser import PAGE_HEAD_MAX_BYTES, PageHeadParser
+
+CHUNK_SIZE = 4096
+
+
+def generated_pages() -> Dict[str, bytes]:
+    head = "<html><head><meta charset='utf-8'><title>Service</title><link rel='icon' href='/favicon.ico'>"
+    return {
+        "small service page": f"{head}</head><body><h1>Service</h1></body></html>".encode(),
+        # Single page applications usually ship the whole bundle inline, before the closing head
+        "spa with inline bundle": f"{head}<script>{'var a=1;' * 200_000}</script></head><body></body>".encode(),
+        "large page": f"{head}</head><body>{'<div><p>row</p></div>' * 100_000}</body></html>".encode(),
+    }
+
+
+def saved_pages(folder: pathlib.Path) -> Dict[str, bytes]:
+    return {path.name: path.read_bytes() for path in sorted(folder.glob("*.html"))}
+
+
+def full_parse(page: bytes) -> Tuple[Optional[str], int]:
+    # pylint: disable=import-outside-toplevel
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(page.decode("utf-8", errors="replace"), features="html.parser")
+    title_element = soup.find("title")
+    return (title_element.text.strip() if title_element else None), len(page)
+
+
+def streaming_parse(page: bytes) -> Tuple[Optional[str], int]:
+    parser = PageHeadParser()
+    received = 0
+    for offset in range(0, len(page), CHUNK_SIZE):
+        chunk = page[offset : offset + CHUNK_SIZE]
+        received += len(chunk)
+        if parser.consume(chunk.decode("utf-8", errors="replace")) or received >= PAGE_HEAD_MAX_BYTES:
+            break
+    parser.close()
+    return parser.title, received
+
+
+def measure(parse: Callable[[bytes], Tuple[Optional[str], int]], page: bytes, repeat: int) -> Tuple[str, int, float]:
+    start = time.process_time()
+    for _ in range(repeat):
+        title, received = parse(page)
+    elapsed = (time.process_time() - start) / repeat
+    return f"{title!r}", received, elapsed * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=pathlib.Path, help="Folder with saved .html pages")
+    parser.add_argument("--repeat", type=int, default=50, help="Number of times each page is parsed")
+    args = parser.parse_args()
+
+    pages = saved_pages(args.pages) if args.pages else generated_pages()
+    try:
+        import bs4  # pylint: disable=import-outside-toplevel,unused-import
+
+        parsers = {"beautifulsoup": full_parse, "streaming": streaming_parse}
+    except ImportError:
+        print("bs4 is not installed, skipping the full parse comparison")
+        parsers = {"streaming": streaming_parse}
+
+    for name, page in pages.items():
+        print(f"{name} ({len(page)} bytes):")
+        for parser_name, parse in parsers.items():
+            title, received, elapsed_ms = measure(parse, page, args.repeat)
+            print(f"  {parser_name:>13}: {elapsed_ms:8.3f} ms of cpu, {received:>8} bytes read, title {title}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+import asyncio
+import http.client
+import json
+import socket
+import time
+from enum import Enum
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import aiohttp
+from aiohttp.abc import AbstractResolver
+from commonwealth.utils.decorators import temporary_cache
+from commonwealth.utils.general import (
+    blueos_version,
+    local_hardware_identifier,
+    local_unique_identifier,
+)
+from fastapi.encoders import jsonable_encoder
+from loguru import logger
+from pydantic import BaseModel
+
+from server_sent_events import publish
+
+
+class Website(Enum):
+    ArduPilot = {
+        "hostname": "firmware.ardupilot.org",
+        "path": "/",
+        "port": 80,
+    }
+    AWS = {
+        "hostname": "amazon.com",
+        "path": "/",
+        "port": 80,
+    }
+    BlueOS = {
+        "hostname": "telemetry.blueos.cloud",
+        "path": "/ping/?"
+        + f"&blueos_id={local_unique_identifier()}"
+        + f"&hardware_id={local_hardware_identifier()}"
+        + f"&version={blueos_version()}",
+        "port": 443,
+    }
+    Cloudflare = {
+        "hostname": "1.1.1.1",
+        "path": "/",
+        "port": 80,
+    }
+    GitHub = {
+        "hostname": "github.com",
+        "path": "/",
+        "port": 80,
+    }
+
+
+class WebsiteStatus(BaseModel):
+    site: Website
+    online: bool
+    error: Optional[str] = None
+
+
+class CachedResolver(AbstractResolver):
+    """Resolver that keeps the addresses of hosts for ttl seconds, shared by all internet checks"""
+
+    def __init__(self, ttl: float) -> None:
+        self.ttl = ttl
+        self._cache: Dict[Tuple[str, int, int], Tuple[float, List[Dict[str, Any]]]] = {}
+
+    async def resolve(self, host: str, port: int = 0, family: int = socket.AF_INET) -> List[Dict[str, Any]]:
+        key = (host, port, family)
+        cached = self._cache.get(key)
+        if cached is not None and time.monotonic() - cached[0] < self.ttl:
+            return cached[1]
+
+        infos = await asyncio.get_running_loop().getaddrinfo(host, port, family=family, type=socket.SOCK_STREAM)
+        addresses = [
+            {
+                "hostname": host,
+                "host": address[0],
+                "port": address[1],
+                "family": address_family,
+                "proto": proto,
+                "flags": socket.AI_NUMERICHOST,
+            }
+            for address_family, _, proto, _, address in infos
+        ]
+        self._cache[key] = (time.monotonic(), addresses)
+        return addresses
+
+    def invalidate(self, host: str) -> None:
+        for key in [key for key in self._cache if key[0] == host]:
+            del self._cache[key]
+
+    async def close(self) -> None:
+        self._cache.clear()
+
+
+class InternetAccess:
+    # Internet access is checked in background with this interval, changes are pushed to the subscribers
+    CHECK_INTERVAL_SECONDS = 10.0
+    CHECK_TIMEOUT_SECONDS = 10.0
+    # Sites that need a complete HTTP request, others are checked with a TCP connection.
+    # Requests to them are done at most once per HTTP_CHECK_INTERVAL_SECONDS
+    HTTP_CHECK_SITES = {Website.BlueOS}
+    HTTP_CHECK_INTERVAL_SECONDS = 60
+    DNS_CACHE_TTL_SECONDS = 300.0
+    RESOLVER = CachedResolver(DNS_CACHE_TTL_SECONDS)
+    SESSION: Optional[aiohttp.ClientSession] = None
+    STATUS: Dict[str, WebsiteStatus] = {}
+    SUBSCRIBERS: Set["asyncio.Queue[str]"] = set()
+
+    @staticmethod
+    def session() -> aiohttp.ClientSession:
+        if InternetAccess.SESSION is None or InternetAccess.SESSION.closed:
+            InternetAccess.SESSION = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(resolver=InternetAccess.RESOLVER, use_dns_cache=False),
+                headers={"User-Agent": "python", "Accept": "*/*"},
+            )
+        return InternetAccess.SESSION
+
+    @staticmethod
+    async def check_tcp_connection(hostname: str, port: int) -> None:
+        """Connect to all addresses of hostname at the same time, succeeding on the first connection.
+        Every connection that was opened is closed before returning"""
+        addresses = await InternetAccess.RESOLVER.resolve(hostname, port, socket.AF_UNSPEC)
+        tasks = {asyncio.create_task(asyncio.open_connection(address["host"], port)) for address in addresses}
+        pending = set(tasks)
+        error: Optional[BaseException] = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                errors = [task.exception() for task in done]
+                if None in errors:
+                    return
+                error = errors[-1]
+        finally:
+            for task in pending:
+                task.cancel()
+            # Other addresses may also have connected, even while being cancelled
+            results = await asyncio.gather(*tasks, return_exceptions=True)
+            writers = [result[1] for result in results if isinstance(result, tuple)]
+            for writer in writers:
+                writer.close()
+            await asyncio.gather(*[writer.wait_closed() for writer in writers], return_exceptions=True)
+        raise error or OSError(f"No address found for {hostname}")
+
+    @staticmethod
+    @temporary_cache(timeout_seconds=HTTP_CHECK_INTERVAL_SECONDS)
+    async def check_http_access(hostname: str, port: int, path: str) -> Optional[str]:
+        """Error of a GET request to the site, None if it answered"""
+        scheme = "https" if port == http.client.HTTPS_PORT else "http"
+        try:
+            async with InternetAccess.session().get(f"{scheme}://{hostname}:{port}{path}"):
+                return None
+        except Exception as e:
+            return str(e) or type(e).__name__
+
+    @staticmethod
+    @temporary_cache(timeout_seconds=1)
+    async def check_website(site: Website) -> WebsiteStatus:
+        hostname = str(site.value["hostname"])
+        port = int(str(site.value["port"]))
+        path = str(site.value["path"])
+
+        website_status = WebsiteStatus(site=site, online=False)
+        try:
+            if site in InternetAccess.HTTP_CHECK_SITES:
+                website_status.error = await asyncio.wait_for(
+                    InternetAccess.check_http_access(hostname, port, path), InternetAccess.CHECK_TIMEOUT_SECONDS
+                )
+            else:
+                await asyncio.wait_for(
+                    InternetAccess.check_tcp_connection(hostname, port), InternetAccess.CHECK_TIMEOUT_SECONDS
+                )
+        except asyncio.TimeoutError:
+            website_status.error = "Timeout"
+        except Exception as e:
+            website_status.error = str(e) or type(e).__name__
+
+        log_msg = f"Running check_website for '{hostname}:{port}'"
+        if website_status.error is None:
+            logger.debug(f"{log_msg}: Online.")
+            website_status.online = True
+        else:
+            logger.warning(f"{log_msg}: Offline: {website_status.error}.")
+            # Addresses may have changed
+            InternetAccess.RESOLVER.invalidate(hostname)
+
+        return website_status
+
+    @staticmethod
+    @temporary_cache(timeout_seconds=5)
+    async def check_internet_access() -> Dict[str, WebsiteStatus]:
+        status_list = await asyncio.gather(*[InternetAccess.check_website(site) for site in Website])
+        return {status.site.name: status for status in status_list}
+
+    @staticmethod
+    def status_snapshot() -> str:
+        return json.dumps(jsonable_encoder(InternetAccess.STATUS))
+
+    @staticmethod
+    async def update_status() -> Dict[str, WebsiteStatus]:
+        """Check internet access and send the new status to the subscribers if it changed"""
+        status: Dict[str, WebsiteStatus] = await InternetAccess.check_internet_access()
+        changed = jsonable_encoder(status) != jsonable_encoder(InternetAccess.STATUS)
+        InternetAccess.STATUS = status
+        if changed:
+            publish(InternetAccess.SUBSCRIBERS, InternetAccess.status_snapshot(), InternetAccess.status_snapshot)
+        return status
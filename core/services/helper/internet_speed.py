@@ -0,0 +1,230 @@
+import asyncio
+import math
+import time
+from datetime import datetime
+from enum import Enum
+from typing import Any, Callable, Dict, Optional, Set
+from urllib.parse import urlparse
+
+import psutil
+from fastapi import HTTPException
+from pydantic import BaseModel
+from speedtest import Speedtest
+
+from server_sent_events import publish
+
+SPEED_TEST: Optional[Speedtest] = None
+# Speed tests block while running, they run in a thread, one at a time
+SPEED_TEST_LOCK = asyncio.Lock()
+SPEED_TEST_PROGRESS_INTERVAL_SECONDS = 0.5
+SPEED_TEST_PROGRESS: Optional["SpeedTestProgress"] = None
+SPEED_TEST_SUBSCRIBERS: Set["asyncio.Queue[str]"] = set()
+# Keep a reference to the running test, since it is not cancelled when the client disconnects
+SPEED_TEST_TASKS: Set["asyncio.Task[Any]"] = set()
+
+
+class SpeedtestServer(BaseModel):
+    url: str
+    lat: str
+    lon: str
+    name: str
+    country: str
+    cc: str
+    sponsor: str
+    id: str
+    host: str
+    d: float
+    latency: float
+
+
+class SpeedtestClient(BaseModel):
+    ip: str
+    lat: str
+    lon: str
+    isp: str
+    isprating: str
+    rating: str
+    ispdlavg: str
+    ispulavg: str
+    loggedin: str
+    country: str
+
+
+class SpeedTestResult(BaseModel):
+    download: float
+    upload: float
+    ping: float
+    server: SpeedtestServer
+    timestamp: datetime
+    bytes_sent: int
+    bytes_received: int
+    share: Optional[str] = None
+    client: SpeedtestClient
+
+
+class SpeedTestStage(str, Enum):
+    BestServer = "best_server"
+    Download = "download"
+    Upload = "upload"
+
+
+class SpeedTestProgress(BaseModel):
+    stage: SpeedTestStage
+    # Fraction of the requests of the stage that are finished
+    progress: float
+    # Estimated from the network interfaces counters, in bits per second
+    throughput: Optional[float]
+    finished: bool = False
+
+
+class LocalSpeedtest(Speedtest):  # type: ignore
+    """Speedtest against a pardal instance, it does not need internet access"""
+
+    UPLOAD_SIZES = [262144, 524288, 1048576, 7340032]
+    DOWNLOAD_SIZES = [350, 500, 750, 1000, 1500, 2000, 2500, 3000, 3500, 4000]
+    UPLOAD_MAX = 20
+
+    def __init__(self, pardal_url: str, source_address: Optional[str] = None) -> None:
+        self.pardal_url = pardal_url.rstrip("/")
+        super().__init__(source_address=source_address)
+
+    def get_config(self) -> Dict[str, Any]:
+        # Same structure of the configuration downloaded from speedtest.net
+        upload_count = math.ceil(LocalSpeedtest.UPLOAD_MAX / len(LocalSpeedtest.UPLOAD_SIZES))
+        config: Dict[str, Any] = self.config
+        config.update(
+            {
+                "client": {
+                    "ip": "127.0.0.1",
+                    "lat": "0",
+                    "lon": "0",
+                    "isp": "Local",
+                    "isprating": "0",
+                    "rating": "0",
+                    "ispdlavg": "0",
+                    "ispulavg": "0",
+                    "loggedin": "0",
+                    "country": "Local",
+                },
+                "ignore_servers": [],
+                "sizes": {"upload": LocalSpeedtest.UPLOAD_SIZES, "download": LocalSpeedtest.DOWNLOAD_SIZES},
+                "counts": {"upload": upload_count, "download": 4},
+                "threads": {"upload": 4, "download": 8},
+                "length": {"upload": 10, "download": 10},
+                "upload_max": upload_count * len(LocalSpeedtest.UPLOAD_SIZES),
+            }
+        )
+        return config
+
+    def server(self) -> Dict[str, Any]:
+        # Pardal provides the same files of speedtest.net servers on /speedtest
+        return {
+            "url": f"{self.pardal_url}/speedtest/upload.php",
+            "lat": "0",
+            "lon": "0",
+            "name": "Pardal",
+            "country": "Local",
+            "cc": "",
+            "sponsor": "BlueOS",
+            "id": "0",
+            "host": urlparse(self.pardal_url).netloc,
+            "d": 0.0,
+        }
+
+
+def initialize_speed_test() -> None:
+    # pylint: disable=global-statement
+    global SPEED_TEST
+    try:
+        SPEED_TEST = Speedtest(secure=True)
+    except Exception:
+        # When starting, the system may not be connected to the internet
+        pass
+
+
+def current_speed_test() -> Speedtest:
+    if not SPEED_TEST:
+        raise RuntimeError("SPEED_TEST not initialized, initialize server search.")
+    return SPEED_TEST
+
+
+def speed_test_snapshot() -> Optional[str]:
+    """Progress of the last speed test, None if no test was started yet"""
+    return SPEED_TEST_PROGRESS.json() if SPEED_TEST_PROGRESS else None
+
+
+def publish_speed_test_progress(progress: SpeedTestProgress) -> None:
+    # pylint: disable=global-statement
+    global SPEED_TEST_PROGRESS
+    SPEED_TEST_PROGRESS = progress
+    publish(SPEED_TEST_SUBSCRIBERS, progress.json(), progress.json)
+
+
+async def track_speed_test(
+    stage: SpeedTestStage, function: Callable[[Callable[..., None]], Any], counter: Optional[str]
+) -> Any:
+    try:
+        # Number of finished and total requests, updated by speedtest-cli threads
+        requests = [0, 0]
+
+        def callback(_current: int, total: int, start: bool = False, end: bool = False) -> None:
+            requests[1] = total
+            if end and not start:
+                requests[0] += 1
+
+        task = asyncio.create_task(asyncio.to_thread(function, callback))
+        last_bytes = getattr(psutil.net_io_counters(), counter) if counter else 0
+        last_time = time.monotonic()
+        while not task.done():
+            await asyncio.wait({task}, timeout=SPEED_TEST_PROGRESS_INTERVAL_SECONDS)
+            throughput = None
+            if counter:
+                current_bytes, current_time = getattr(psutil.net_io_counters(), counter), time.monotonic()
+                throughput = (current_bytes - last_bytes) * 8 / max(current_time - last_time, 1e-6)
+                last_bytes, last_time = current_bytes, current_time
+            finished_requests, total_requests = requests
+            publish_speed_test_progress(
+                SpeedTestProgress(
+                    stage=stage,
+                    progress=1.0 if task.done() else finished_requests / total_requests if total_requests else 0.0,
+                    throughput=throughput,
+                    finished=task.done(),
+                )
+            )
+        return task.result()
+    finally:
+        SPEED_TEST_LOCK.release()
+
+
+async def run_speed_test(
+    stage: SpeedTestStage, function: Callable[[Callable[..., None]], Any], counter: Optional[str] = None
+) -> Any:
+    """Run a blocking speedtest-cli function in a thread, publishing its progress.
+    counter is the attribute of psutil.net_io_counters used to estimate the throughput."""
+    if SPEED_TEST_LOCK.locked():
+        raise HTTPException(status_code=409, detail="A speed test is already running.")
+    # The lock is not held by anyone, so this does not wait
+    await SPEED_TEST_LOCK.acquire()
+    # The test keeps running if the client disconnects, the lock is released when it really finishes
+    task = asyncio.create_task(track_speed_test(stage, function, counter))
+    SPEED_TEST_TASKS.add(task)
+    task.add_done_callback(SPEED_TEST_TASKS.discard)
+    return await asyncio.shield(task)
+
+
+async def find_best_server(interface_addr: Optional[str], pardal_url: Optional[str]) -> Speedtest:
+    """Find the best server and keep the speed test used for it, previous results are dropped"""
+
+    def find(_callback: Callable[..., None]) -> Speedtest:
+        if pardal_url:
+            speed_test = LocalSpeedtest(pardal_url, source_address=interface_addr)
+            speed_test.get_best_server([speed_test.server()])
+        else:
+            speed_test = Speedtest(secure=True, source_address=interface_addr)
+            speed_test.get_best_server()
+        return speed_test
+
+    # pylint: disable=global-statement
+    global SPEED_TEST
+    SPEED_TEST = await run_speed_test(SpeedTestStage.BestServer, find)
+    return SPEED_TEST
@@ -1,46 +1,56 @@
 #!/usr/bin/env python3
 
 import asyncio
-import gzip
+import codecs
+import hashlib
 import http.client
 import json
 import logging
+import os
 import re
+import shutil
+import signal
 import socket
-import subprocess
-from concurrent import futures
-from datetime import datetime
-from enum import Enum
 from functools import cache
-from io import BytesIO
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Set, Union
-from urllib.parse import urlparse
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple, Union
 from uuid import UUID
 
+import aiohttp
+import appdirs
 import psutil
-from bs4 import BeautifulSoup
-from commonwealth.utils.apis import GenericErrorHandlingRoute, PrettyJSONResponse
-from commonwealth.utils.decorators import temporary_cache
-from commonwealth.utils.general import (
-    blueos_version,
-    local_hardware_identifier,
-    local_unique_identifier,
+from commonwealth.settings.files import write_file_atomically
+from commonwealth.utils.apis import (
+    CompactJSONResponse,
+    GenericErrorHandlingRoute,
+    PrettyJSONResponse,
 )
+from commonwealth.utils.decorators import temporary_cache
 from commonwealth.utils.logs import InterceptHandler, init_logger
+from commonwealth.utils.metrics import add_metrics_route
 from fastapi import FastAPI, HTTPException
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, StreamingResponse
 from fastapi_versioning import VersionedFastAPI, version
 from loguru import logger
 from pydantic import BaseModel
-from speedtest import Speedtest
 from uvicorn import Config, Server
 
+from internet_access import InternetAccess, WebsiteStatus
+from internet_speed import (
+    SPEED_TEST_SUBSCRIBERS,
+    SpeedTestResult,
+    SpeedTestStage,
+    current_speed_test,
+    find_best_server,
+    initialize_speed_test,
+    run_speed_test,
+    speed_test_snapshot,
+)
 from nginx_parser import parse_nginx_file
+from page_parser import PAGE_HEAD_MAX_BYTES, PageHeadParser, TextSearch
+from server_sent_events import publish, server_sent_events
 
 SERVICE_NAME = "helper"
-SPEED_TEST: Optional[Speedtest] = None
-
 logging.basicConfig(handlers=[InterceptHandler()], level=logging.DEBUG)
 try:
     init_logger(SERVICE_NAME)
@@ -49,48 +59,7 @@ except Exception as logger_e:
 
 logger.info("Starting Helper")
 
-try:
-    SPEED_TEST = Speedtest(secure=True)
-except Exception:
-    # When starting, the system may not be connected to the internet
-    pass
-
-
-class Website(Enum):
-    ArduPilot = {
-        "hostname": "firmware.ardupilot.org",
-        "path": "/",
-        "port": 80,
-    }
-    AWS = {
-        "hostname": "amazon.com",
-        "path": "/",
-        "port": 80,
-    }
-    BlueOS = {
-        "hostname": "telemetry.blueos.cloud",
-        "path": "/ping/?"
-        + f"&blueos_id={local_unique_identifier()}"
-        + f"&hardware_id={local_hardware_identifier()}"
-        + f"&version={blueos_version()}",
-        "port": 443,
-    }
-    Cloudflare = {
-        "hostname": "1.1.1.1",
-        "path": "/",
-        "port": 80,
-    }
-    GitHub = {
-        "hostname": "github.com",
-        "path": "/",
-        "port": 80,
-    }
-
-
-class WebsiteStatus(BaseModel):
-    site: Website
-    online: bool
-    error: Optional[str] = None
+initialize_speed_test()
 
 
 class ServiceMetadata(BaseModel):
@@ -118,6 +87,7 @@ class ServiceInfo(BaseModel):
     port: int
     path: Optional[str]
     metadata: Optional[ServiceMetadata]
+    favicon: Optional[str] = None
 
     def __hash__(self) -> int:
         return hash(self.port)
@@ -128,43 +98,37 @@ class ServiceInfo(BaseModel):
         return False
 
 
-class SpeedtestServer(BaseModel):
-    url: str
-    lat: str
-    lon: str
-    name: str
-    country: str
-    cc: str
-    sponsor: str
-    id: str
-    host: str
-    d: float
-    latency: float
-
-
-class SpeedtestClient(BaseModel):
-    ip: str
-    lat: str
-    lon: str
-    isp: str
-    isprating: str
-    rating: str
-    ispdlavg: str
-    ispulavg: str
-    loggedin: str
-    country: str
-
-
-class SpeedTestResult(BaseModel):
-    download: float
-    upload: float
-    ping: float
-    server: SpeedtestServer
-    timestamp: datetime
-    bytes_sent: int
-    bytes_received: int
-    share: Optional[str] = None
-    client: SpeedtestClient
+class ServiceFingerprint(BaseModel):
+    """Cheap to get summary of the /register_service answer of a service, used to check if it changed"""
+
+    status: Optional[int]
+    body_hash: Optional[str]
+    etag: Optional[str]
+    last_modified: Optional[str]
+
+    def matches(self, other: "ServiceFingerprint") -> bool:
+        return self.status == other.status and self.body_hash == other.body_hash
+
+
+class KnownService(BaseModel):
+    info: ServiceInfo
+    # Inode of the listening socket, it changes when the service is restarted
+    socket_inode: int
+    # None when a request of the detection failed, the service is then detected again and not persisted
+    fingerprint: Optional[ServiceFingerprint]
+    # Whether the service should be checked for changes in the next scan
+    revalidate: bool = False
+
+
+class ServicesChange(BaseModel):
+    # When set, added has the complete list of services and the client should drop the ones it knows
+    snapshot: bool = False
+    added: List[ServiceInfo] = []
+    removed: List[int] = []
+    changed: List[ServiceInfo] = []
+
+    def is_empty(self) -> bool:
+        return not (self.snapshot or self.added or self.removed or self.changed)
 
 
 class SimpleHttpResponse(BaseModel):
@@ -173,6 +137,8 @@ class SimpleHttpResponse(BaseModel):
     as_json: Optional[Union[List[Any], Dict[Any, Any]]]
     error: Optional[str]
     timeout: bool
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
 
 
 class Helper:
@@ -212,7 +178,10 @@ class Helper:
         5555,  # DGB server
         2770,  # NGINX
     }
-    KNOWN_SERVICES: Set[ServiceInfo] = set()
+    # Services found on previous scans by port, persisted to skip probing them again when helper restarts
+    KNOWN_SERVICES: Dict[int, KnownService] = {}
+    KNOWN_SERVICES_FILE = Path(appdirs.user_config_dir(SERVICE_NAME), "known_services.json")
+    BOOT_ID_FILE = Path("/proc/sys/kernel/random/boot_id")
     # Whether we should or not keep a BlueOS system service when it's TCP port is not alive.
     # If 'False', when a service dies, it is not returned as an available service
     KEEP_BLUEOS_SERVICES_ALIVE = False
@@ -220,81 +189,78 @@ class Helper:
     PERIODICALLY_RESCAN_ALL_SERVICES = False
     # Wether or not we should rescan periodically just the 3rdparty services (extensions)
     PERIODICALLY_RESCAN_3RDPARTY_SERVICES = True
+    # Sockets of the system, format described in https://www.kernel.org/doc/Documentation/networking/proc_net_tcp.txt
+    PROC_NET_TCP_FILES = {socket.AF_INET: Path("/proc/net/tcp"), socket.AF_INET6: Path("/proc/net/tcp6")}
+    PROC_NET_TCP_LISTEN_STATE = "0A"
+    # Maximum number of services being detected at the same time, and the time a scan can take before giving up
+    # on services that did not answer yet (they are detected again on the next scan)
+    SCAN_CONCURRENCY = 8
+    SCAN_TIMEOUT_SECONDS = 5.0
+    DETECTION_REQUEST_TIMEOUT_SECONDS = 1.0
+    # Pages are streamed in chunks of this size, and only read until what we need is found
+    PAGE_CHUNK_SIZE = 4096
+    DOCUMENT_SEARCH_MAX_BYTES = 64 * 1024
+    HTTP_SESSION: Optional[aiohttp.ClientSession] = None
+    NGINX_CONFIG_FILE = Path("/home/pi/tools/nginx/nginx.conf")
+    NGINX_EXTENSIONS_FOLDER = Path("/home/pi/tools/nginx/extensions")
+    NGINX_PID_FILE = Path("/var/run/nginx.pid")
+    # Port and content of the extension routes in the nginx extensions folder by name, loaded from disk on first use
+    NGINX_ROUTES: Optional[Dict[str, Tuple[int, str]]] = None
+    # Last routes rejected by nginx, they are not tried again until something changes
+    REJECTED_NGINX_ROUTES: Optional[Dict[str, Tuple[int, str]]] = None
+    # Services are scanned in background with this interval, changes are pushed to the subscribers
+    SERVICES_SCAN_INTERVAL_SECONDS = 3.0
+    # Last list of valid services sent to the subscribers, by port
+    PUBLISHED_SERVICES: Dict[int, ServiceInfo] = {}
+    SERVICES_SUBSCRIBERS: Set["asyncio.Queue[str]"] = set()
 
     @staticmethod
-    # pylint: disable=too-many-arguments,too-many-branches,too-many-locals
-    def simple_http_request(
-        host: str,
-        port: int = http.client.HTTP_PORT,
+    def http_session() -> aiohttp.ClientSession:
+        """Session shared by all local requests, so connections to the services are kept alive between requests"""
+        if Helper.HTTP_SESSION is None or Helper.HTTP_SESSION.closed:
+            Helper.HTTP_SESSION = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=Helper.SCAN_CONCURRENCY),
+                headers={"User-Agent": "python", "Accept": "*/*"},
+            )
+        return Helper.HTTP_SESSION
+
+    @staticmethod
+    async def local_http_request(
+        port: int,
         path: str = "/",
         timeout: Optional[float] = None,
-        method: str = "GET",
         try_json: bool = False,
-        follow_redirects: int = 0,
+        headers: Optional[Dict[str, str]] = None,
     ) -> SimpleHttpResponse:
-        """This function is a simple wrappper around http.client to make convenient requests and get the answer
-        knowing that it will never raise"""
-
-        conn: Optional[Union[http.client.HTTPConnection, http.client.HTTPSConnection]] = None
+        """Make a request to a service running on this machine, knowing that it will never raise.
+        Redirects are followed"""
         request_response = SimpleHttpResponse(status=None, decoded_data=None, as_json=None, timeout=False, error=None)
-
-        # Based on requests library
-        headers = {
-            "User-Agent": "python",
-            "Accept-Encoding": "gzip, deflate",
-            "Accept": "*/*",
-        }
-        # Prepare the header for json request
-        if try_json:
-            headers["Accept"] = "application/json"
+        headers = {**(headers or {}), "Accept": "application/json"} if try_json else headers or {}
 
         try:
-            # Make the connection and the request
-            if port == http.client.HTTPS_PORT:
-                conn = http.client.HTTPSConnection(host, port, timeout=timeout)
-            else:
-                conn = http.client.HTTPConnection(host, port, timeout=timeout)
-
-            conn.request(method, path, headers=headers)
-            response = conn.getresponse()
-
-            # Follow redirects if required
-            location_header = response.getheader("location")
-            if follow_redirects > 0 and location_header is not None:
-                url = urlparse(location_header)
-                return Helper.simple_http_request(
-                    host=url.hostname or host,
-                    port=url.port or port,
-                    path=url.path or path,  # note: ignoring params, query and fragment
-                    timeout=timeout,
-                    method=method,
-                    try_json=try_json,
-                    follow_redirects=follow_redirects - 1,
-                )
-
-            # Decode the data
-            request_response.status = response.status
-            if response.status == http.client.OK:
-                encoding = response.headers.get_content_charset() or "utf-8"
-                if response.getheader("Content-Encoding") == "gzip":
-                    buffer = BytesIO(response.read())
-                    with gzip.GzipFile(fileobj=buffer) as file:
-                        decompressed_data = file.read()
-                else:
-                    decompressed_data = response.read()
-
-                request_response.decoded_data = decompressed_data.decode(encoding)
-
-                # Interpret it as json
-                if try_json:
-                    request_response.as_json = json.loads(request_response.decoded_data)
-
-        except socket.timeout as e:
-            logger.warning(e)
+            async with Helper.http_session().get(
+                f"http://127.0.0.1:{port}{path}",
+                headers=headers,
+                timeout=aiohttp.ClientTimeout(total=timeout),
+                max_redirects=10,
+            ) as response:
+                request_response.status = response.status
+                request_response.etag = response.headers.get("ETag")
+                request_response.last_modified = response.headers.get("Last-Modified")
+                if response.status == http.client.OK:
+                    data = await response.read()
+                    request_response.decoded_data = data.decode(response.charset or "utf-8")
+
+                    # Interpret it as json
+                    if try_json:
+                        request_response.as_json = json.loads(request_response.decoded_data)
+
+        except asyncio.TimeoutError as e:
+            logger.warning(f"Timeout requesting {path} from port {port}")
             request_response.timeout = True
             request_response.error = str(e)
 
-        except (http.client.HTTPException, socket.error, json.JSONDecodeError) as e:
+        except (aiohttp.ClientError, json.JSONDecodeError, UnicodeDecodeError) as e:
             logger.warning(e)
             request_response.error = str(e)
 
@@ -302,48 +268,139 @@ class Helper:
             logger.exception(e)
             request_response.error = str(e)
 
-        finally:
-            if conn:
-                conn.close()
-
         return request_response
 
+    @staticmethod
+    async def read_local_page(
+        port: int,
+        path: str,
+        timeout: float,
+        consume: Optional[Callable[[str], bool]] = None,
+        max_bytes: int = PAGE_HEAD_MAX_BYTES,
+    ) -> Optional[int]:
+        """Stream a page from a service running on this machine to consume, until it returns True or max_bytes are
+        read. Without consume, only the status is checked. Returns the status, None if the request failed"""
+        try:
+            async with Helper.http_session().get(
+                f"http://127.0.0.1:{port}{path}", timeout=aiohttp.ClientTimeout(total=timeout), max_redirects=10
+            ) as response:
+                if response.status != http.client.OK or consume is None:
+                    return response.status
+                decoder = codecs.getincrementaldecoder(response.charset or "utf-8")(errors="replace")
+                received = 0
+                async for chunk in response.content.iter_chunked(Helper.PAGE_CHUNK_SIZE):
+                    received += len(chunk)
+                    if consume(decoder.decode(chunk)) or received >= max_bytes:
+                        break
+                return response.status
+
+        except asyncio.TimeoutError:
+            logger.warning(f"Timeout requesting {path} from port {port}")
+        except (aiohttp.ClientError, LookupError) as e:
+            logger.warning(e)
+        except Exception as e:
+            logger.exception(e)
+        return None
+
+    @staticmethod
+    async def provides_swagger_ui(port: int, path: str) -> Optional[bool]:
+        """None if the request failed"""
+        search = TextSearch("swagger-ui")
+        status = await Helper.read_local_page(
+            port,
+            path,
+            Helper.DETECTION_REQUEST_TIMEOUT_SECONDS,
+            search.consume,
+            Helper.DOCUMENT_SEARCH_MAX_BYTES,
+        )
+        if status is None:
+            return None
+        return status == http.client.OK and search.found
+
+    @staticmethod
+    async def detect_api_versions(port: int, api_path: str) -> Optional[List[str]]:
+        """Versions that provide a swagger-ui, None if any request failed"""
+        response = await Helper.local_http_request(
+            port, api_path, timeout=Helper.DETECTION_REQUEST_TIMEOUT_SECONDS, try_json=True
+        )
+        if response.status is None:
+            return None
+
+        # Skip until we find the expected data. The expected data is like:
+        # {
+        #     "paths": {
+        #         "v1.0.0": ...,
+        #         "v2.0.0": ...,
+        #     }
+        # }
+        response_as_json = response.as_json
+        if response.status != http.client.OK or response_as_json is None or not isinstance(response_as_json, dict):
+            return []
+        version_paths = [str(version_path) for version_path in response_as_json.get("paths", {}).keys()]
+
+        # Check all available versions for the ones that provide a swagger-ui
+        provides_swagger_ui = await asyncio.gather(
+            *[Helper.provides_swagger_ui(port, version_path) for version_path in version_paths]
+        )
+        if None in provides_swagger_ui:
+            return None
+        return [version_path for version_path, valid in zip(version_paths, provides_swagger_ui) if valid]
+
     @staticmethod
     @temporary_cache(timeout_seconds=1)  # a temporary cache helps us deal with changes in metadata
-    def detect_service(port: int) -> ServiceInfo:
-        path = port_to_service_map.get(port)
-        info = ServiceInfo(valid=False, title="Unknown", documentation_url="", versions=[], port=port, path=path)
+    async def detect_service(port: int) -> Tuple[ServiceInfo, Optional[ServiceFingerprint]]:
+        """Detect the service and get the fingerprint of the /register_service answer used for it.
+        The fingerprint is None if any request failed, since the detection may be incomplete"""
+        info = ServiceInfo(
+            valid=False,
+            title="Unknown",
+            documentation_url="",
+            versions=[],
+            port=port,
+            path=port_to_service_map.get(port),
+        )
+        timeout = Helper.DETECTION_REQUEST_TIMEOUT_SECONDS
 
-        response = Helper.simple_http_request(
-            "127.0.0.1", port=port, path="/", timeout=1.0, method="GET", follow_redirects=10
+        # Only the head of the page is needed for the title and favicon
+        page_head = PageHeadParser()
+        status, metadata_response = await asyncio.gather(
+            Helper.read_local_page(port, "/", timeout, page_head.consume),
+            Helper.local_http_request(port, "/register_service", timeout=timeout, try_json=True),
         )
+        fingerprint = Helper.fingerprint(metadata_response)
         log_msg = f"Detecting service at port {port}"
-        if response.status == http.client.BAD_REQUEST or response.decoded_data is None:
+        if status is None:
+            logger.debug(f"{log_msg}: No answer")
+            return info, None
+        if status != http.client.OK:
             # If not valid web server, documentation will not be available
-            logger.debug(f"{log_msg}: Invalid: {response.status} - {response.decoded_data!r}")
-            return info
+            logger.debug(f"{log_msg}: Invalid: {status}")
+            return info, fingerprint
 
         info.valid = True
         try:
-            soup = BeautifulSoup(response.decoded_data, features="html.parser")
-            title_element = soup.find("title")
-            info.title = title_element.text.strip() if title_element else "Unknown"
+            page_head.close()
+            info.title = page_head.title or "Unknown"
+            info.favicon = page_head.favicon
             log_msg = f"{log_msg}: {info.title}"
         except Exception as e:
             logger.warning(f"Failed parsing the service title: {e}")
 
-        # Try to get the metadata from the service
-        response = Helper.simple_http_request(
-            "127.0.0.1",
-            port=port,
-            path="/register_service",
-            timeout=1.0,
-            method="GET",
-            try_json=True,
-            follow_redirects=10,
+        # Documentation candidates are independent, so they are requested at the same time
+        documentation_statuses = await asyncio.gather(
+            *[
+                Helper.read_local_page(port, documentation_path, timeout)
+                for documentation_path in Helper.DOCS_CANDIDATE_URLS
+            ]
         )
-        response_as_json = response.as_json
-        if response.status == http.client.OK and response_as_json is not None and isinstance(response_as_json, dict):
+
+        # Try to get the metadata from the service
+        response_as_json = metadata_response.as_json
+        if (
+            metadata_response.status == http.client.OK
+            and response_as_json is not None
+            and isinstance(response_as_json, dict)
+        ):
             try:
                 info.metadata = ServiceMetadata.parse_obj(response_as_json)
                 info.metadata.sanitized_name = re.sub(r"[^a-z0-9]", "", info.metadata.name.lower())
@@ -352,141 +409,267 @@ class Helper:
         else:
             logger.debug(f"No metadata received from {info.title} (port {port})")
 
-        # Try to get the documentation links
-        for documentation_path in Helper.DOCS_CANDIDATE_URLS:
-            # Skip until we find a valid documentation path
-            response = Helper.simple_http_request(
-                "127.0.0.1", port=port, path=documentation_path, timeout=1.0, method="GET", follow_redirects=10
-            )
-            if response.status != http.client.OK:
+        # Use the first valid documentation path and get the versions from its main openapi json description files
+        complete = None not in documentation_statuses
+        for documentation_path, documentation_status in zip(Helper.DOCS_CANDIDATE_URLS, documentation_statuses):
+            if documentation_status != http.client.OK:
                 continue
             info.documentation_url = documentation_path
-
-            # Get main openapi json description file
-            for api_path in Helper.API_CANDIDATE_URLS:
-                response = Helper.simple_http_request(
-                    "127.0.0.1", port=port, path=api_path, timeout=1.0, method="GET", try_json=True, follow_redirects=10
-                )
-
-                # Skip until we find the expected data. The expected data is like:
-                # {
-                #     "paths": {
-                #         "v1.0.0": ...,
-                #         "v2.0.0": ...,
-                #     }
-                # }
-                response_as_json = response.as_json
-                if (
-                    response.status != http.client.OK
-                    or response_as_json is None
-                    or not isinstance(response_as_json, dict)
-                ):
-                    continue
-                version_paths = response_as_json.get("paths", {}).keys()
-
-                # Check all available versions for the ones that provide a swagger-ui
-                for version_path in version_paths:
-                    response = Helper.simple_http_request(
-                        "127.0.0.1", port=port, path=str(version_path), timeout=1.0, method="GET", follow_redirects=10
-                    )
-                    if (
-                        response.status == http.client.OK
-                        and response.decoded_data is not None
-                        and "swagger-ui" in response.decoded_data
-                    ):
-                        info.versions += [version_path]
-
-            # Since we have at least found one info.documentation_path, we finish here
+            versions = await asyncio.gather(
+                *[Helper.detect_api_versions(port, api_path) for api_path in Helper.API_CANDIDATE_URLS]
+            )
+            complete = complete and None not in versions
+            info.versions = [version_path for api_versions in versions for version_path in api_versions or []]
             break
 
         logger.debug(f"{log_msg}: Valid.")
-        return info
+        return info, fingerprint if complete else None
 
     @staticmethod
-    @temporary_cache(timeout_seconds=3)
-    def scan_ports() -> List[ServiceInfo]:
-        # Get TCP ports that are listen and can be accessed by external users (like server in 0.0.0.0, as described by the LOCALSERVER_CANDIDATES)
-        ports = {
-            connection.laddr.port
+    def fingerprint(response: SimpleHttpResponse) -> Optional[ServiceFingerprint]:
+        """Fingerprint of a /register_service answer, None if the request failed"""
+        if response.status is None:
+            return None
+        body_hash = None
+        if response.decoded_data is not None:
+            body_hash = hashlib.sha256(response.decoded_data.encode("utf-8")).hexdigest()
+        return ServiceFingerprint(
+            status=response.status, body_hash=body_hash, etag=response.etag, last_modified=response.last_modified
+        )
+
+    @staticmethod
+    async def service_fingerprint(port: int, previous: ServiceFingerprint) -> Optional[ServiceFingerprint]:
+        """Get the fingerprint of a service using conditional headers, None if the request failed"""
+        headers = {}
+        if previous.etag is not None:
+            headers["If-None-Match"] = previous.etag
+        if previous.last_modified is not None:
+            headers["If-Modified-Since"] = previous.last_modified
+
+        response = await Helper.local_http_request(
+            port, "/register_service", timeout=Helper.DETECTION_REQUEST_TIMEOUT_SECONDS, headers=headers
+        )
+        if response.status == http.client.NOT_MODIFIED:
+            return previous
+        return Helper.fingerprint(response)
+
+    @staticmethod
+    async def discover_service(port: int, socket_inode: int) -> KnownService:
+        """Detect the service running on port, services already known are only detected again if their
+        fingerprint changed. Services that did not answer all requests are checked again on the next scan"""
+        known = Helper.KNOWN_SERVICES.get(port)
+        if known is not None and known.fingerprint is not None:
+            fingerprint = await Helper.service_fingerprint(port, known.fingerprint)
+            if fingerprint is None:
+                return known.copy(update={"revalidate": True})
+            if fingerprint.matches(known.fingerprint):
+                return KnownService(info=known.info, socket_inode=socket_inode, fingerprint=fingerprint)
+            logger.debug(f"Service at port {port} changed, detecting it again")
+
+        info, detected_fingerprint = await Helper.detect_service(port)
+        return KnownService(
+            info=info,
+            socket_inode=socket_inode,
+            fingerprint=detected_fingerprint,
+            revalidate=detected_fingerprint is None,
+        )
+
+    @staticmethod
+    def boot_id() -> str:
+        try:
+            return Helper.BOOT_ID_FILE.read_text(encoding="utf-8").strip()
+        except OSError:
+            return ""
+
+    @staticmethod
+    def load_known_services() -> None:
+        try:
+            data = json.loads(Helper.KNOWN_SERVICES_FILE.read_text(encoding="utf-8"))
+            services = [KnownService.parse_obj(service) for service in data["services"]]
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            logger.warning(f"Ignoring invalid known services file {Helper.KNOWN_SERVICES_FILE}: {e}")
+            return
+
+        # Socket inodes are only meaningful during the same boot, services from a previous one are checked for changes
+        same_boot = data.get("boot_id") == Helper.boot_id()
+        for service in services:
+            service.revalidate = not same_boot
+        Helper.KNOWN_SERVICES = {service.info.port: service for service in services}
+        logger.info(f"Loaded {len(services)} known services from {Helper.KNOWN_SERVICES_FILE}")
+
+    @staticmethod
+    def save_known_services() -> None:
+        # Services with incomplete detections are detected again after a restart
+        services = [
+            service.dict(exclude={"revalidate"})
+            for _, service in sorted(Helper.KNOWN_SERVICES.items())
+            if service.fingerprint is not None
+        ]
+        content = json.dumps({"boot_id": Helper.boot_id(), "services": services}, indent=2)
+        try:
+            # Nothing is written if the known services did not change
+            write_file_atomically(Helper.KNOWN_SERVICES_FILE, content)
+        except OSError as e:
+            logger.warning(f"Failed to save known services to {Helper.KNOWN_SERVICES_FILE}: {e}")
+
+    @staticmethod
+    def decode_proc_net_address(family: int, address: str) -> Tuple[str, int]:
+        """Decode addresses from /proc/net/tcp{,6} files, like '0100007F:0050' for 127.0.0.1:80.
+        Addresses are stored as 32 bits words in host byte order"""
+        ip_hex, port_hex = address.split(":")
+        packed = b"".join(bytes.fromhex(ip_hex[i : i + 8])[::-1] for i in range(0, len(ip_hex), 8))
+        return socket.inet_ntop(family, packed), int(port_hex, 16)
+
+    @staticmethod
+    def listening_ports() -> Dict[int, int]:
+        """TCP ports that are listening and can be accessed by external users (like server in 0.0.0.0, as described
+        by the LOCALSERVER_CANDIDATES), with the inode of their sockets. Reading /proc/net directly avoids checking
+        the file descriptors of every process, as done by psutil.net_connections"""
+        ports: Dict[int, int] = {}
+        try:
+            for family, proc_file in Helper.PROC_NET_TCP_FILES.items():
+                with open(proc_file, "r", encoding="utf-8") as f:
+                    # Skip header
+                    next(f, None)
+                    for line in f:
+                        fields = line.split()
+                        if len(fields) < 10 or fields[3] != Helper.PROC_NET_TCP_LISTEN_STATE:
+                            continue
+                        ip, port = Helper.decode_proc_net_address(family, fields[1])
+                        if ip in Helper.LOCALSERVER_CANDIDATES:
+                            ports[port] = int(fields[9])
+            return ports
+        except (OSError, ValueError) as e:
+            logger.warning(f"Failed to read listening ports from /proc/net, falling back to psutil: {e}")
+
+        # Socket inodes are not available, services will only be checked for changes periodically
+        return {
+            connection.laddr.port: 0
             for connection in psutil.net_connections("tcp")
             if connection.status == psutil.CONN_LISTEN and connection.laddr.ip in Helper.LOCALSERVER_CANDIDATES
         }
 
+    @staticmethod
+    @temporary_cache(timeout_seconds=3)
+    async def scan_ports() -> List[ServiceInfo]:
+        ports = Helper.listening_ports()
+
         # If a known service is not within the detected ports, we remove it from the known services
         if Helper.KEEP_BLUEOS_SERVICES_ALIVE:
             Helper.KNOWN_SERVICES = {
-                service
-                for service in Helper.KNOWN_SERVICES
-                if service.port in ports or service.port in Helper.BLUEOS_SYSTEM_SERVICES_PORTS
+                port: service
+                for port, service in Helper.KNOWN_SERVICES.items()
+                if port in ports or port in Helper.BLUEOS_SYSTEM_SERVICES_PORTS
             }
         else:
-            Helper.KNOWN_SERVICES = {service for service in Helper.KNOWN_SERVICES if service.port in ports}
-
-        # Filter out ports we want to skip, as well as the ports from services we already know, assuming the services don't change,
-        known_ports = {service.port for service in Helper.KNOWN_SERVICES}
-        ports.difference_update(Helper.SKIP_PORTS, known_ports)
+            Helper.KNOWN_SERVICES = {port: service for port, service in Helper.KNOWN_SERVICES.items() if port in ports}
+
+        # Filter out ports we want to skip, as well as the ports from known services that were not restarted and do
+        # not need to be checked for changes
+        ports_to_check = {
+            port: socket_inode
+            for port, socket_inode in ports.items()
+            if port not in Helper.SKIP_PORTS
+            and (
+                port not in Helper.KNOWN_SERVICES
+                or Helper.KNOWN_SERVICES[port].revalidate
+                or Helper.KNOWN_SERVICES[port].socket_inode != socket_inode
+            )
+        }
 
-        # The detect_services run several of requests sequentially, so we are capping the amount of executors to lower the peaks on the CPU usage
-        with futures.ThreadPoolExecutor(max_workers=2) as executor:
-            tasks = [executor.submit(Helper.detect_service, port) for port in ports]
-            services = {task.result() for task in futures.as_completed(tasks)}
+        # Services are detected concurrently, capped to lower the peaks on the CPU usage
+        semaphore = asyncio.Semaphore(Helper.SCAN_CONCURRENCY)
 
-        # Update our known services cache
-        Helper.KNOWN_SERVICES.update(services)
-        Helper.update_nginx(services)
-        return [service for service in Helper.KNOWN_SERVICES if service.valid]
+        async def discover(port: int, socket_inode: int) -> KnownService:
+            async with semaphore:
+                return await Helper.discover_service(port, socket_inode)
 
-    @staticmethod
-    @temporary_cache(timeout_seconds=1)
-    def check_website(site: Website) -> WebsiteStatus:
-        hostname = str(site.value["hostname"])
-        port = int(str(site.value["port"]))
-        path = str(site.value["path"])
-
-        response = Helper.simple_http_request(hostname, port=port, path=path, timeout=10, method="GET")
-        website_status = WebsiteStatus(site=site, online=False)
-
-        log_msg = f"Running check_website for '{hostname}:{port}'"
-        if response.error is None:
-            logger.debug(f"{log_msg}: Online.")
-            website_status.online = True
-        else:
-            logger.warning(f"{log_msg}: Offline: {website_status.error}.")
-            website_status.error = response.error
+        if ports_to_check:
+            tasks = {
+                asyncio.create_task(discover(port, socket_inode)): port for port, socket_inode in ports_to_check.items()
+            }
+            done, pending = await asyncio.wait(tasks, timeout=Helper.SCAN_TIMEOUT_SECONDS)
+            for task in pending:
+                task.cancel()
+            if pending:
+                logger.warning(f"Scan timed out detecting services at ports: {sorted(tasks[task] for task in pending)}")
+                # Let the cancelled detections finish, otherwise the next scan could wait on their cached results
+                await asyncio.wait(pending)
+            for task in done:
+                port = tasks[task]
+                if task.cancelled():
+                    logger.warning(f"Detection of service at port {port} was cancelled")
+                    continue
+                if task.exception() is not None:
+                    logger.error(f"Failed to detect service at port {port}: {task.exception()}")
+                    continue
+                # Update our known services cache
+                Helper.KNOWN_SERVICES[port] = task.result()
 
-        return website_status
+        await Helper.update_nginx(set(ports))
+        Helper.save_known_services()
+        services = [service.info for service in Helper.KNOWN_SERVICES.values() if service.info.valid]
+        Helper.publish_services(services)
+        return services
 
     @staticmethod
-    def reload_nginx() -> None:
-        with open("/var/run/nginx.pid", "r", encoding="utf-8") as f:
-            pid = int(f.readline())
-            # kill -HUP is the right way of doing a graceful reload in Nginx
-            subprocess.run(["kill", "-HUP", f"{pid}"], check=False)
+    def services_snapshot() -> str:
+        return ServicesChange(snapshot=True, added=list(Helper.PUBLISHED_SERVICES.values())).json()
 
     @staticmethod
-    def update_nginx(services: Set[ServiceInfo]) -> None:
-        changed = 0
-        for service in services:
-            if service.metadata:
-                if Helper.setup_nginx_route(service.metadata, service.port):
-                    changed += 1
-        if changed:
-            Helper.reload_nginx()
+    def publish_services(services: List[ServiceInfo]) -> None:
+        """Send what changed since the last published list of services to all subscribers"""
+        current = {service.port: service for service in services}
+        previous = Helper.PUBLISHED_SERVICES
+        # ServiceInfo equality only considers the port
+        change = ServicesChange(
+            added=[service for port, service in current.items() if port not in previous],
+            removed=[port for port in previous if port not in current],
+            changed=[
+                service
+                for port, service in current.items()
+                if port in previous and previous[port].dict() != service.dict()
+            ],
+        )
+        Helper.PUBLISHED_SERVICES = current
+        if not change.is_empty():
+            publish(Helper.SERVICES_SUBSCRIBERS, change.json(), Helper.services_snapshot)
 
     @staticmethod
-    @temporary_cache(timeout_seconds=5)
-    def check_internet_access() -> Dict[str, WebsiteStatus]:
-        # 10 concurrent executors is fine here because its a very short/light task
-        with futures.ThreadPoolExecutor(max_workers=10) as executor:
-            tasks = [executor.submit(Helper.check_website, site) for site in Website]
-            status_list = [task.result() for task in futures.as_completed(tasks)]
+    def reload_nginx() -> None:
+        try:
+            pid = int(Helper.NGINX_PID_FILE.read_text(encoding="utf-8").strip())
+            # SIGHUP is the right way of doing a graceful reload in Nginx
+            os.kill(pid, signal.SIGHUP)
+        except (OSError, ValueError) as e:
+            logger.error(f"Failed to reload nginx: {e}")
 
-        return {status.site.name: status for status in status_list}
+    @staticmethod
+    async def validate_nginx_config() -> bool:
+        nginx = shutil.which("nginx")
+        if nginx is None:
+            logger.warning("Nginx binary not found, skipping configuration validation.")
+            return True
+        process = await asyncio.create_subprocess_exec(
+            nginx,
+            "-t",
+            "-q",
+            "-c",
+            str(Helper.NGINX_CONFIG_FILE),
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        _, stderr = await process.communicate()
+        if process.returncode != 0:
+            logger.error(f"Invalid nginx configuration: {stderr.decode(errors='replace').strip()}")
+            return False
+        return True
 
     @staticmethod
-    def setup_nginx_route(metadata: ServiceMetadata, port: int) -> bool:
-        name = metadata.sanitized_name
-        text = f"""
+    def nginx_route(name: str, port: int) -> str:
+        return f"""
         location /extensionv2/{name}/ {{
         proxy_pass http://127.0.0.1:{port}/;
         proxy_set_header Host $host;
@@ -495,19 +678,71 @@ class Helper:
         proxy_set_header X-Forwarded-Proto $scheme;
         }}
         """
-        filename = f"/home/pi/tools/nginx/extensions/{name}.conf"
-        Path.mkdir(Path("/home/pi/tools/nginx/extensions/"), parents=True, exist_ok=True)
+
+    @staticmethod
+    def load_nginx_routes() -> Dict[str, Tuple[int, str]]:
+        routes: Dict[str, Tuple[int, str]] = {}
+        for route_file in Helper.NGINX_EXTENSIONS_FOLDER.glob("*.conf"):
+            try:
+                text = route_file.read_text(encoding="utf-8")
+            except OSError as e:
+                logger.warning(f"Failed to read nginx route {route_file}: {e}")
+                continue
+            match = re.search(r"proxy_pass http://127\.0\.0\.1:(\d+)/", text)
+            routes[route_file.stem] = (int(match.group(1)) if match else 0, text)
+        return routes
+
+    @staticmethod
+    def write_nginx_routes(current: Dict[str, Tuple[int, str]], target: Dict[str, Tuple[int, str]]) -> None:
+        """Change the route files from current to target, only touching the files that differ"""
+        for name, route in target.items():
+            if current.get(name) != route:
+                logger.info(f"Updating nginx route for {name}")
+                write_file_atomically(Helper.NGINX_EXTENSIONS_FOLDER.joinpath(f"{name}.conf"), route[1])
+        for name in current.keys() - target.keys():
+            logger.info(f"Removing nginx route for {name}")
+            Helper.NGINX_EXTENSIONS_FOLDER.joinpath(f"{name}.conf").unlink(missing_ok=True)
+
+    @staticmethod
+    async def update_nginx(listening_ports: Set[int]) -> None:
+        """Make the nginx extension routes match the known services with metadata. Routes of services that are gone
+        are removed. Nothing is read or written when the routes did not change"""
+        if Helper.NGINX_ROUTES is None:
+            Helper.NGINX_EXTENSIONS_FOLDER.mkdir(parents=True, exist_ok=True)
+            Helper.NGINX_ROUTES = Helper.load_nginx_routes()
+        applied = Helper.NGINX_ROUTES
+
+        desired: Dict[str, Tuple[int, str]] = {}
+        for port, service in sorted(Helper.KNOWN_SERVICES.items()):
+            name = service.info.metadata.sanitized_name if service.info.metadata else None
+            if name:
+                desired[name] = (port, Helper.nginx_route(name, port))
+        # Keep the routes of services that are still running but were not detected yet (e.g: the scan timed out)
+        undetected_ports = listening_ports - Helper.KNOWN_SERVICES.keys()
+        for name, route in applied.items():
+            if name not in desired and route[0] in undetected_ports:
+                desired[name] = route
+
+        if desired in (applied, Helper.REJECTED_NGINX_ROUTES):
+            return
+
         try:
-            with open(filename, "r", encoding="utf-8") as f:
-                if f.read() == text:
-                    return False
-        except Exception as e:
-            logging.info(f"file '{filename}' not found ({e}):, a new one will be created")
-        with open(filename, "w", encoding="utf-8") as f:
-            logging.info(f"updating nginx route for {name}")
-            f.write(text)
-            logging.info(f"file updated: {filename}")
-        return True
+            Helper.write_nginx_routes(applied, desired)
+            valid = await Helper.validate_nginx_config()
+            if not valid:
+                logger.error("Restoring previous nginx routes.")
+                Helper.write_nginx_routes(desired, applied)
+                Helper.REJECTED_NGINX_ROUTES = desired
+                return
+        except OSError as e:
+            logger.error(f"Failed to update nginx routes: {e}")
+            # Files may be partially updated, check them again on the next scan
+            Helper.NGINX_ROUTES = None
+            return
+
+        Helper.NGINX_ROUTES = desired
+        Helper.REJECTED_NGINX_ROUTES = None
+        Helper.reload_nginx()
 
 
 fast_api_app = FastAPI(
@@ -521,12 +756,27 @@ fast_api_app.router.route_class = GenericErrorHandlingRoute
 @fast_api_app.get(
     "/web_services",
     response_model=List[ServiceInfo],
+    response_class=CompactJSONResponse,
     summary="Retrieve web services found.",
 )
 @version(1, 0)
-def web_services() -> Any:
+async def web_services() -> Any:
     """REST API endpoint to retrieve web services running."""
-    return Helper.scan_ports()
+    return await Helper.scan_ports()
+
+
+@fast_api_app.get(
+    "/web_services/events",
+    response_class=StreamingResponse,
+    summary="Server-sent events with the web services found and the changes on them.",
+)
+@version(1, 0)
+async def web_services_events() -> StreamingResponse:
+    """The first event has the complete list of services, following ones only what was added, removed or changed.
+    Services are scanned in background, so all clients share the same scans."""
+    # Make sure that the first event has the current services
+    await Helper.scan_ports()
+    return server_sent_events(Helper.SERVICES_SUBSCRIBERS, Helper.services_snapshot, "services")
 
 
 @fast_api_app.get(
@@ -535,8 +785,23 @@ def web_services() -> Any:
     summary="Used to check if some websites are available or if there is internet access.",
 )
 @version(1, 0)
-def check_internet_access() -> Any:
-    return Helper.check_internet_access()
+async def check_internet_access() -> Any:
+    # Internet access is checked in background, this only waits for it before the first check
+    if not InternetAccess.STATUS:
+        return await InternetAccess.update_status()
+    return InternetAccess.STATUS
+
+
+@fast_api_app.get(
+    "/check_internet_access/events",
+    response_class=StreamingResponse,
+    summary="Server-sent events with the status of the websites every time it changes.",
+)
+@version(1, 0)
+async def check_internet_access_events() -> StreamingResponse:
+    if not InternetAccess.STATUS:
+        await InternetAccess.update_status()
+    return server_sent_events(InternetAccess.SUBSCRIBERS, InternetAccess.status_snapshot, "internet_access")
 
 
 @fast_api_app.get(
@@ -579,13 +844,11 @@ def software_id() -> Any:
     summary="Check internet best server for test from BlueOS.",
 )
 @version(1, 0)
-async def internet_best_server(interface_addr: Optional[str] = None) -> Any:
-    # Since we are finding a new server, clear previous results
-    # pylint: disable=global-statement
-    global SPEED_TEST
-    SPEED_TEST = Speedtest(secure=True, source_address=interface_addr)
-    SPEED_TEST.get_best_server()
-    return SPEED_TEST.results.dict()
+async def internet_best_server(interface_addr: Optional[str] = None, pardal_url: Optional[str] = None) -> Any:
+    """Use pardal_url (e.g: http://127.0.0.1:9120) to test against a local pardal instance instead of
+    speedtest.net servers."""
+    speed_test = await find_best_server(interface_addr, pardal_url)
+    return speed_test.results.dict()
 
 
 @fast_api_app.get(
@@ -595,10 +858,9 @@ async def internet_best_server(interface_addr: Optional[str] = None) -> Any:
 )
 @version(1, 0)
 async def internet_download_speed() -> Any:
-    if not SPEED_TEST:
-        raise RuntimeError("SPEED_TEST not initialized, initialize server search.")
-    SPEED_TEST.download()
-    return SPEED_TEST.results.dict()
+    speed_test = current_speed_test()
+    await run_speed_test(SpeedTestStage.Download, lambda callback: speed_test.download(callback=callback), "bytes_recv")
+    return speed_test.results.dict()
 
 
 @fast_api_app.get(
@@ -608,10 +870,23 @@ async def internet_download_speed() -> Any:
 )
 @version(1, 0)
 async def internet_upload_speed() -> Any:
-    if not SPEED_TEST:
-        raise RuntimeError("SPEED_TEST not initialized, initialize server search.")
-    SPEED_TEST.upload(pre_allocate=False)
-    return SPEED_TEST.results.dict()
+    speed_test = current_speed_test()
+    await run_speed_test(
+        SpeedTestStage.Upload,
+        lambda callback: speed_test.upload(callback=callback, pre_allocate=False),
+        "bytes_sent",
+    )
+    return speed_test.results.dict()
+
+
+@fast_api_app.get(
+    "/internet_test_events",
+    response_class=StreamingResponse,
+    summary="Server-sent events with the progress of the running speed test.",
+)
+@version(1, 0)
+async def internet_test_events() -> StreamingResponse:
+    return server_sent_events(SPEED_TEST_SUBSCRIBERS, speed_test_snapshot, "speed_test")
 
 
 @fast_api_app.get(
@@ -621,9 +896,7 @@ async def internet_upload_speed() -> Any:
 )
 @version(1, 0)
 async def internet_test_previous_result() -> Any:
-    if not SPEED_TEST:
-        raise RuntimeError("SPEED_TEST not initialized, initialize server search.")
-    return SPEED_TEST.results.dict()
+    return current_speed_test().results.dict()
 
 
 @fast_api_app.get(
@@ -640,19 +913,37 @@ async def ping(host: str, interface_addr: Optional[str] = None) -> bool:
     return process.returncode == 0
 
 
+async def scan_services_periodically() -> None:
+    while True:
+        try:
+            await Helper.scan_ports()
+        except Exception as e:
+            logger.exception(f"Failed to scan services: {e}")
+        await asyncio.sleep(Helper.SERVICES_SCAN_INTERVAL_SECONDS)
+
+
+async def monitor_internet_access() -> None:
+    while True:
+        try:
+            await InternetAccess.update_status()
+        except Exception as e:
+            logger.exception(f"Failed to check internet access: {e}")
+        await asyncio.sleep(InternetAccess.CHECK_INTERVAL_SECONDS)
+
+
 async def periodic() -> None:
     while True:
         await asyncio.sleep(60)
-        Helper.check_internet_access()
 
         # Clear the known ports cache and re-scan it
         if Helper.PERIODICALLY_RESCAN_ALL_SERVICES:
             Helper.KNOWN_SERVICES.clear()
-        # To get changes in the metadata of extensions, we clear the cache for them to force a rescan
+        # To get changes in the metadata of extensions, they are checked for changes in the next scan, only the ones
+        # that changed are detected again
         elif Helper.PERIODICALLY_RESCAN_3RDPARTY_SERVICES:
-            Helper.KNOWN_SERVICES = {
-                service for service in Helper.KNOWN_SERVICES if service.port in Helper.BLUEOS_SYSTEM_SERVICES_PORTS
-            }
+            for port, service in Helper.KNOWN_SERVICES.items():
+                if port not in Helper.BLUEOS_SYSTEM_SERVICES_PORTS:
+                    service.revalidate = True
 
 
 app = VersionedFastAPI(
@@ -661,6 +952,7 @@ app = VersionedFastAPI(
     prefix_format="/v{major}.{minor}",
     enable_latest=True,
 )
+add_metrics_route(app)
 
 
 @app.get("/")
@@ -678,6 +970,7 @@ async def root() -> HTMLResponse:
 port_to_service_map: Dict[int, str] = parse_nginx_file("/home/pi/tools/nginx/nginx.conf")
 
 if __name__ == "__main__":
+    Helper.load_known_services()
     loop = asyncio.new_event_loop()
 
     # Running uvicorn with log disabled so loguru can handle it
@@ -685,4 +978,6 @@ if __name__ == "__main__":
     server = Server(config)
 
     loop.create_task(periodic())
+    loop.create_task(scan_services_periodically())
+    loop.create_task(monitor_internet_access())
     loop.run_until_complete(server.serve())
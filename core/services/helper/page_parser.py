@@ -0,0 +1,73 @@
+from html.parser import HTMLParser
+from typing import List, Optional, Tuple
+
+# Pages are only read until the end of their head, but never more than this
+PAGE_HEAD_MAX_BYTES = 16 * 1024
+# Link relations used for favicons, e.g: rel="icon", rel="shortcut icon" or rel="apple-touch-icon"
+FAVICON_RELS = {"icon", "apple-touch-icon"}
+
+
+class PageHeadParser(HTMLParser):
+    """Incremental parser for the head of html pages, it gets the title and the favicon of the page.
+
+    Data can be fed in chunks as it is received, consume returns True when the head is over (on </head> or <body>),
+    so the rest of the page does not need to be received or parsed.
+    """
+
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=True)
+        self.title: Optional[str] = None
+        self.favicon: Optional[str] = None
+        self.done = False
+        self._title_parts: Optional[List[str]] = None
+
+    def consume(self, data: str) -> bool:
+        if not self.done:
+            self.feed(data)
+        return self.done
+
+    def handle_starttag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]) -> None:
+        if tag == "title" and self.title is None:
+            self._title_parts = []
+        elif tag == "link" and self.favicon is None:
+            attributes = dict(attrs)
+            if FAVICON_RELS.intersection((attributes.get("rel") or "").lower().split()):
+                self.favicon = attributes.get("href")
+        elif tag == "body":
+            self.done = True
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag == "title":
+            self._finish_title()
+        elif tag == "head":
+            self.done = True
+
+    def handle_data(self, data: str) -> None:
+        if self._title_parts is not None:
+            self._title_parts.append(data)
+
+    def close(self) -> None:
+        super().close()
+        # Page was truncated in the middle of the title
+        self._finish_title()
+
+    def _finish_title(self) -> None:
+        if self._title_parts is not None:
+            self.title = "".join(self._title_parts).strip()
+            self._title_parts = None
+
+
+class TextSearch:
+    """Incremental search for a text in data received in chunks"""
+
+    def __init__(self, text: str) -> None:
+        self.text = text
+        self.found = False
+        self._tail = ""
+
+    def consume(self, data: str) -> bool:
+        # Keep the end of the previous chunk, the text may be split between chunks
+        window = self._tail + data
+        self.found = self.found or self.text in window
+        self._tail = window[-(len(self.text) - 1) :] if len(self.text) > 1 else ""
+        return self.found
@@ -0,0 +1,47 @@
+import asyncio
+from typing import AsyncGenerator, Callable, Optional, Set
+
+from fastapi.responses import StreamingResponse
+
+# Comments are sent after this time without events, to keep the connection alive through proxies
+EVENTS_KEEPALIVE_SECONDS = 15.0
+SUBSCRIBER_QUEUE_SIZE = 16
+
+
+def publish(subscribers: Set["asyncio.Queue[str]"], data: str, snapshot: Callable[[], str]) -> None:
+    for queue in subscribers:
+        try:
+            queue.put_nowait(data)
+        except asyncio.QueueFull:
+            # The client is not keeping up, replace what it did not receive yet by the complete state
+            while not queue.empty():
+                queue.get_nowait()
+            queue.put_nowait(snapshot())
+
+
+def server_sent_events(
+    subscribers: Set["asyncio.Queue[str]"], snapshot: Callable[[], Optional[str]], event: str
+) -> StreamingResponse:
+    """Stream the complete state (if any) followed by the changes published to subscribers"""
+
+    async def events() -> AsyncGenerator[str, None]:
+        # Subscribe only once the body is sent, so responses that are never sent do not leave a queue behind
+        queue: "asyncio.Queue[str]" = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        current = snapshot()
+        if current is not None:
+            queue.put_nowait(current)
+        subscribers.add(queue)
+        try:
+            while True:
+                try:
+                    data = await asyncio.wait_for(queue.get(), timeout=EVENTS_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"event: {event}\ndata: {data}\n\n"
+        finally:
+            subscribers.discard(queue)
+
+    # Nginx should not buffer the events
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return StreamingResponse(events(), media_type="text/event-stream", headers=headers)
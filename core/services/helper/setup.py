@@ -10,7 +10,8 @@ setup(
     py_modules=[],
     install_requires=[
         "aiofiles == 0.6.0",
-        "beautifulsoup4 == 4.9.3",
+        "aiohttp == 3.7.4",
+        "appdirs == 1.4.4",
         "commonwealth == 0.1.0",
         "fastapi == 0.105.0",
         # Enforce anyio fastapi subdependency to avoid conflict with starlette
@@ -0,0 +1,71 @@
+from typing import List
+
+from page_parser import PageHeadParser, TextSearch
+
+PAGE = (
+    "<html><head><meta charset='utf-8'><title> Cool &amp; Extension </title>"
+    "<link rel='shortcut icon' href='/favicon.ico'></head><body><p>content</p></body></html>"
+)
+
+
+def chunks(data: str, size: int) -> List[str]:
+    return [data[i : i + size] for i in range(0, len(data), size)]
+
+
+def test_page_head_parser_chunks() -> None:
+    # Title and tags are split between chunks on every possible position
+    for size in range(1, len(PAGE) + 1):
+        parser = PageHeadParser()
+        done = False
+        for chunk in chunks(PAGE, size):
+            done = parser.consume(chunk)
+            if done:
+                break
+        parser.close()
+        assert done, size
+        assert parser.title == "Cool & Extension", size
+        assert parser.favicon == "/favicon.ico", size
+
+
+def test_page_head_parser_stops_at_body() -> None:
+    parser = PageHeadParser()
+    assert not parser.consume("<html><head><title>Service</title>")
+    assert parser.consume("<body><title>Other</title>")
+    # Nothing is parsed after the head
+    assert parser.consume("<link rel='icon' href='/late.png'>")
+    parser.close()
+    assert parser.title == "Service"
+    assert parser.favicon is None
+
+
+def test_page_head_parser_truncated() -> None:
+    # Pages may be cut in the middle of the title when they are too big
+    parser = PageHeadParser()
+    assert not parser.consume("<html><head><title>Truncated ti")
+    parser.close()
+    assert parser.title == "Truncated ti"
+
+    parser = PageHeadParser()
+    assert not parser.consume("<html><head><meta charset='utf-8'>")
+    parser.close()
+    assert parser.title is None
+    assert parser.favicon is None
+
+
+def test_text_search_split_between_chunks() -> None:
+    for size in range(1, len(PAGE) + 1):
+        search = TextSearch("favicon.ico")
+        found = [search.consume(chunk) for chunk in chunks(PAGE, size)]
+        assert search.found, size
+        # Once found, it stays found
+        assert found[found.index(True) :] == [True] * (len(found) - found.index(True)), size
+
+    search = TextSearch("swagger-ui")
+    assert not search.consume("<div id='swagger")
+    assert not search.consume("")
+    assert search.consume("-ui'></div>")
+
+    search = TextSearch("swagger-ui")
+    for chunk in ["swagger", "-", "u", "x"]:
+        assert not search.consume(chunk)
+    assert not search.found
@@ -1,6 +1,7 @@
 from os import path
 
 from commonwealth.utils.apis import GenericErrorHandlingRoute
+from commonwealth.utils.metrics import add_metrics_route
 from fastapi import FastAPI
 from fastapi.responses import RedirectResponse
 from fastapi.staticfiles import StaticFiles
@@ -34,6 +35,7 @@ application.include_router(jobs_router_v2)
 application.include_router(manifest_router_v2)
 
 application = VersionedFastAPI(application, prefix_format="/v{major}.{minor}", enable_latest=True)
+add_metrics_route(application)
 
 
 @application.get("/", status_code=200)
@@ -47,7 +47,7 @@ async def log_containers(container_name: str, timeout: Optional[int] = None) ->
     if timeout is not None:
         return StreamingResponse(timeout_streamer(stream, timeout=timeout), media_type="text/plain")
 
-    return StreamingResponse(streamer(stream, heartbeats=0.1), media_type="text/plain")
+    return StreamingResponse(streamer(stream, heartbeats=0.1, cancel_on_disconnect=True), media_type="text/plain")
 
 
 @index_router_v1.get("/stats", status_code=status.HTTP_200_OK)
@@ -1,8 +1,13 @@
 from functools import wraps
 from typing import Any, Callable, Optional, Tuple
 
-from commonwealth.utils.streaming import streamer, timeout_streamer
-from fastapi import APIRouter, HTTPException, status
+from commonwealth.utils.streaming import (
+    negotiate_stream_format,
+    stream_media_type,
+    streamer,
+    timeout_streamer,
+)
+from fastapi import APIRouter, Header, HTTPException, status
 from fastapi.responses import StreamingResponse
 from fastapi_versioning import versioned_api_route
 
@@ -51,17 +56,26 @@ async def fetch_container(container_name: str) -> ContainerModel:
 
 @container_router_v2.get("/{container_name}/log", status_code=status.HTTP_200_OK)
 @container_to_http_exception
-async def fetch_log_by_container_name(container_name: str, timeout: Optional[int] = None) -> StreamingResponse:
+async def fetch_log_by_container_name(
+    container_name: str, timeout: Optional[int] = None, accept: Optional[str] = Header(default=None)
+) -> StreamingResponse:
     """
     Fetch logs of a given container.
     If timeout is provided, the stream will be closed after no log line is received for the given timeout.
+    Clients accepting application/vnd.blueos.stream receive binary frames instead of base64 encoded JSON.
     """
     stream = ContainerManager.get_container_log_by_name(container_name)
+    stream_format = negotiate_stream_format(accept)
+    media_type = stream_media_type(stream_format, "text/plain")
 
     if timeout is not None:
-        return StreamingResponse(timeout_streamer(stream, timeout=timeout), media_type="text/plain")
+        return StreamingResponse(
+            timeout_streamer(stream, timeout=timeout, stream_format=stream_format), media_type=media_type
+        )
 
-    return StreamingResponse(streamer(stream, heartbeats=0.1), media_type="text/plain")
+    return StreamingResponse(
+        streamer(stream, heartbeats=0.1, stream_format=stream_format, cancel_on_disconnect=True), media_type=media_type
+    )
 
 
 @container_router_v2.get("/stats", status_code=status.HTTP_200_OK)
@@ -2,10 +2,11 @@
 
 import asyncio
 from enum import Enum
-from typing import Dict, List, Tuple, Union
+from typing import Dict, List, Optional, Set, Tuple, Union
 
 import pynmea2
 from commonwealth.mavlink_comm.MavlinkComm import MavlinkMessenger
+from commonwealth.mavlink_comm.MavlinkSendQueue import MavlinkSendQueue
 from commonwealth.settings.manager import Manager
 from loguru import logger
 from pydantic import BaseModel, conint
@@ -14,6 +15,24 @@ from nmea_injector.exceptions import UnsupportedSocketKind
 from nmea_injector.MavlinkNMEA import MavlinkGpsInput, parse_mavlink_from_sentence
 from nmea_injector.settings import NmeaInjectorSettingsSpecV1, SettingsV1
 
+# Send queues of the open connections, and the ones being closed together with their connection
+SEND_QUEUES: Set[MavlinkSendQueue] = set()
+CLOSING_TASKS: Set["asyncio.Task[None]"] = set()
+
+
+def open_send_queue(mavlink2rest: MavlinkMessenger) -> MavlinkSendQueue:
+    # GPS data is only useful while fresh, if mavlink2rest can't keep up there is no reason to send old positions
+    send_queue = MavlinkSendQueue(mavlink2rest, coalesce_types=["GPS_INPUT"])
+    SEND_QUEUES.add(send_queue)
+    return send_queue
+
+
+def close_send_queue(send_queue: MavlinkSendQueue) -> None:
+    SEND_QUEUES.discard(send_queue)
+    task = asyncio.get_running_loop().create_task(send_queue.close())
+    CLOSING_TASKS.add(task)
+    task.add_done_callback(CLOSING_TASKS.discard)
+
 
 class SocketKind(str, Enum):
     """Available server sockets"""
@@ -58,38 +77,46 @@ class TcpNmeaProtocol(asyncio.Protocol):
     def __init__(self, component_id: int) -> None:
         self.mavlink2rest = MavlinkMessenger()
         self.mavlink2rest.set_component_id(component_id)
+        self.send_queue = open_send_queue(self.mavlink2rest)
 
     def connection_made(self, transport: asyncio.BaseTransport) -> None:
         """Behavior when a new connection is stablished."""
         logger.debug(f"New TCP connection with {transport.get_extra_info('peername')}.")
         self.transport = transport
 
+    def connection_lost(self, exc: Optional[Exception]) -> None:
+        close_send_queue(self.send_queue)
+
     def data_received(self, data: bytes) -> None:
         """What happens when data is received from a client socket."""
         message = data.decode()
         logger.info(f"Message received for component {self.mavlink2rest.component_id}: {message}")
         mavlink_package = TrafficController.parse_mavlink_package(message)
-        asyncio.create_task(TrafficController.forward_message(mavlink_package, self.mavlink2rest))
-        logger.info("Successfully forwarded mavlink coordinates package.")
+        TrafficController.forward_message(mavlink_package, self.send_queue)
+        logger.info("Successfully queued mavlink coordinates package.")
 
 
 class UdpNmeaProtocol(asyncio.DatagramProtocol):
     def __init__(self, component_id: int) -> None:
         self.mavlink2rest = MavlinkMessenger()
         self.mavlink2rest.set_component_id(component_id)
+        self.send_queue = open_send_queue(self.mavlink2rest)
 
     def connection_made(self, transport: asyncio.BaseTransport) -> None:
         """Behavior when a new connection is stablished."""
         logger.debug(f"New UDP connection with {transport.get_extra_info('peername')}.")
         self.transport = transport
 
+    def connection_lost(self, exc: Optional[Exception]) -> None:
+        close_send_queue(self.send_queue)
+
     def datagram_received(self, data: bytes, addr: Tuple[str, int]) -> None:
         """What happens when data is received from a client socket."""
         message = data.decode()
         logger.info(f"Message received for component {self.mavlink2rest.component_id}: {message}")
         mavlink_package = TrafficController.parse_mavlink_package(message)
-        asyncio.create_task(TrafficController.forward_message(mavlink_package, self.mavlink2rest))
-        logger.info("Successfully forwarded mavlink coordinates package.")
+        TrafficController.forward_message(mavlink_package, self.send_queue)
+        logger.info("Successfully queued mavlink coordinates package.")
 
 
 class TrafficController:
@@ -144,9 +171,18 @@ class TrafficController:
         return parse_mavlink_from_sentence(nmea_sentence)
 
     @staticmethod
-    async def forward_message(message: MavlinkGpsInput, mavlink2rest: MavlinkMessenger) -> None:
+    def forward_message(message: MavlinkGpsInput, send_queue: MavlinkSendQueue) -> None:
         """Forward Mavlink message package to Mavlink2Rest, on the specified component ID."""
-        await mavlink2rest.send_mavlink_message(message.dict())
+        send_queue.put(message.dict())
+
+    async def close(self) -> None:
+        """Close all server sockets and the send queues of their connections, without changing the settings."""
+        for server_socket in self._socks.values():
+            server_socket.close()
+        self._socks.clear()
+        send_queues = list(SEND_QUEUES)
+        SEND_QUEUES.clear()
+        await asyncio.gather(*[send_queue.close() for send_queue in send_queues], *CLOSING_TASKS)
 
     def __del__(self) -> None:
         for server_socket in self._socks.values():
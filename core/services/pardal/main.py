@@ -63,6 +63,28 @@ async def post_file(request: web.Request) -> web.Response:
     return web.Response(status=200)
 
 
+# Files used by speedtest-cli, so speed tests can run against pardal without internet access
+# pylint: disable=unused-argument
+async def speedtest_latency(request: web.Request) -> web.Response:
+    return web.Response(text="test=test\n")
+
+
+async def speedtest_random_file(request: web.Request) -> web.StreamResponse:
+    # Roughly the size of the images served by speedtest.net servers
+    size = 2 * int(request.match_info["size"]) ** 2
+
+    response = web.StreamResponse(status=200)
+    response.headers["Content-Length"] = str(size)
+    response.content_type = "image/jpeg"
+    await response.prepare(request)
+
+    for data_chunk in generate_random_data(size):
+        await response.write(bytes(data_chunk))
+
+    await response.write_eof()
+    return response
+
+
 # pylint: disable=unused-argument
 async def root(request: web.Request) -> web.Response:
     html_content = """
@@ -82,4 +104,7 @@ app.add_routes([web.get("/ws", websocket_echo)])
 app.router.add_get("/", root, name="root")
 app.router.add_get("/get_file", get_file, name="get_file")
 app.router.add_post("/post_file", post_file, name="post_file")
+app.router.add_get("/speedtest/latency.txt", speedtest_latency, name="speedtest_latency")
+app.router.add_get(r"/speedtest/random{size:\d+}x{other_size:\d+}.jpg", speedtest_random_file, name="speedtest_random")
+app.router.add_post("/speedtest/upload.php", post_file, name="speedtest_upload")
 web.run_app(app, path="0.0.0.0", port=args.port)
@@ -4,8 +4,10 @@ import asyncio
 import logging
 from typing import Any, List
 
+from commonwealth.mavlink_comm.MavlinkComm import MavlinkMessenger
 from commonwealth.utils.apis import GenericErrorHandlingRoute, PrettyJSONResponse
 from commonwealth.utils.logs import InterceptHandler, init_logger
+from commonwealth.utils.metrics import add_metrics_route
 from fastapi import FastAPI, status
 from fastapi.responses import HTMLResponse
 from fastapi_versioning import VersionedFastAPI, version
@@ -52,6 +54,7 @@ def set_sensor(sensor_settings: dict[str, Any]) -> Any:
 
 
 app = VersionedFastAPI(app, version="1.0.0", prefix_format="/v{major}.{minor}", enable_latest=True)
+add_metrics_route(app)
 
 
 @app.get("/")
@@ -88,3 +91,5 @@ if __name__ == "__main__":
 
     loop.create_task(sensor_manager())
     loop.run_until_complete(server.serve())
+    loop.run_until_complete(ping_manager.close())
+    loop.run_until_complete(MavlinkMessenger.close_session())
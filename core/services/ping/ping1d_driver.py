@@ -49,6 +49,9 @@ class Ping1DDriver(PingDriver):
                 await asyncio.sleep(5)
                 self.bridge = Bridge(self.ping.port, self.baud, "0.0.0.0", 0, self.port, automatic_disconnect=False)
 
+    async def close(self) -> None:
+        await self.mavlink_driver.close()
+
     def save_settings(self) -> None:
         self.manager.load()  # re-load as other sensors could have changed it
         new_setting_item = Ping1dSettingsSpecV1.new(self.ping.get_hw_or_eth_info(), self.mavlink_driver.should_run)
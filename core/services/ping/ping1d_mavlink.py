@@ -19,6 +19,7 @@ from brping import (
     PingParser,
 )
 from commonwealth.mavlink_comm.MavlinkComm import MavlinkMessenger
+from commonwealth.mavlink_comm.MavlinkSendQueue import MavlinkSendQueue
 from loguru import logger
 
 ## The minimum interval time for distance updates to the autopilot
@@ -36,10 +37,15 @@ class Ping1DMavlinkDriver:
         self.ping1d_io.setblocking(False)
         ## Parser to decode incoming PingMessage
         self.parser = PingParser()
+        ## Only the latest distance is relevant for the autopilot, older pending ones are replaced
+        self.send_queue = MavlinkSendQueue(self.mavlink2rest, coalesce_types=["DISTANCE_SENSOR"])
 
     def set_should_run(self, should_run: bool) -> None:
         self.should_run = should_run
 
+    async def close(self) -> None:
+        await self.send_queue.close()
+
     @staticmethod
     def distance_message(time_boot_ms: int, distance_cm: int, device_id: int, confidence: int) -> Dict[str, Any]:
         return {
@@ -61,7 +67,7 @@ class Ping1DMavlinkDriver:
     ## Send distance_sensor message to autopilot
     async def send_distance_data(self, distance: int, deviceid: int, confidence: int) -> None:
         logger.info(f"sending {distance} ({confidence})")
-        await self.mavlink2rest.send_mavlink_message(
+        self.send_queue.put(
             self.distance_message(
                 int((time.time() - self.time_since_boot) * 1000), int(distance / 10), deviceid, confidence
             )
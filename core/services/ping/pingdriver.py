@@ -73,6 +73,9 @@ class PingDriver:
         if self.bridge:
             self.bridge.stop()
 
+    async def close(self) -> None:
+        """Release the resources that depend on the event loop, called after the driver is stopped"""
+
     def update_settings(self, sensor_settings: Dict[str, Any]) -> None:
         if "mavlink_driver" in sensor_settings:
             self.set_mavlink_driver_running(sensor_settings["mavlink_driver"])
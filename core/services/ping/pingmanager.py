@@ -17,13 +17,26 @@ class PingManager:
         self.connecting_ports: Set[int] = set()
         self.ping1d_base_port: int = 9090
         self.ping360_base_port: int = 9092
+        # Keep a reference to drivers being closed, otherwise the task could be garbage collected
+        self.closing_tasks: Set["asyncio.Task[None]"] = set()
 
     def stop_driver_at_port(self, port: SysFS | str) -> None:
         """Stops the driver instance running for port "port" """
         ping_at_port = [ping for ping in self.drivers if port in [ping.port, ping.ethernet_discovery_info]]
         if ping_at_port:
-            self.drivers[ping_at_port[0]].stop()
-            del self.drivers[ping_at_port[0]]
+            driver = self.drivers.pop(ping_at_port[0])
+            driver.stop()
+            task = asyncio.get_running_loop().create_task(driver.close())
+            self.closing_tasks.add(task)
+            task.add_done_callback(self.closing_tasks.discard)
+
+    async def close(self) -> None:
+        """Stop all drivers, dropping the messages they did not send yet"""
+        drivers = list(self.drivers.values())
+        self.drivers.clear()
+        for driver in drivers:
+            driver.stop()
+        await asyncio.gather(*[driver.close() for driver in drivers], *self.closing_tasks)
 
     async def register_ethernet_ping360(self, ping: PingDeviceDescriptor) -> None:
         if ping not in self.drivers:
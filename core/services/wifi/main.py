@@ -12,6 +12,7 @@ from commonwealth.utils.apis import (
     StackedHTTPException,
 )
 from commonwealth.utils.logs import InterceptHandler, init_logger
+from commonwealth.utils.metrics import add_metrics_route
 from fastapi import FastAPI, HTTPException, status
 from fastapi.staticfiles import StaticFiles
 from fastapi_versioning import VersionedFastAPI, version
@@ -164,6 +165,7 @@ def get_hotspot_credentials() -> Any:
 
 
 app = VersionedFastAPI(app, version="1.0.0", prefix_format="/v{major}.{minor}", enable_latest=True)
+add_metrics_route(app)
 app.mount("/", StaticFiles(directory=str(FRONTEND_FOLDER), html=True))
 
 